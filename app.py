@@ -1,19 +1,30 @@
+import logging
+import os
 import sys
+import time
+
+# Reference point for the startup timings, taken before the heavy imports
+STARTED = time.perf_counter()
+
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QVBoxLayout, QWidget, QLabel
 )
-from db_setup import EQUIPMENT_MANAGER, AREA_CODE_MANAGER, DEVICE_TYPE_MANAGER
+from PySide6.QtCore import QTimer, Signal
+from db_notify import ChangeListener
+from db_classes import AreaCode, DeviceType, Equipment
+from db_setup import get_engine, EQUIPMENT_MANAGER, AREA_CODE_MANAGER, DEVICE_TYPE_MANAGER
+from service_client import RemoteManager
+from diagnostics_page import DiagnosticsPanel
 from equipment_entry_page import EquipmentEntryPage
+from home_page import HomePage
 from import_equipment_page import ImportEquipmentPage
-from qt_table import AreaCodeTable, DeviceTypeTable
+from qt_table import AreaCodeTable, ChangeDispatcher, DeviceTypeTable
+from qt_workers import db_executor
 
-class HomePage(QWidget):
-    def __init__(self):
-        super().__init__()
-        layout = QVBoxLayout()
-        label = QLabel("Home Page")
-        layout.addWidget(label)
-        self.setLayout(layout)
+logger = logging.getLogger(__name__)
+
+def elapsed_ms() -> float:
+    return (time.perf_counter() - STARTED) * 1000
 
 class SettingsPage(QWidget):
     def __init__(self):
@@ -21,37 +32,178 @@ class SettingsPage(QWidget):
         layout = QVBoxLayout()
         label = QLabel("Settings Page")
         layout.addWidget(label)
+        self.diagnostics = DiagnosticsPanel()
+        layout.addWidget(self.diagnostics)
         self.setLayout(layout)
 
+class LazyTabWidget(QTabWidget):
+    """
+    A tab widget whose pages are built by factories the first time their tab is shown.
+
+    Until then each tab holds an empty placeholder, so opening the window costs the same
+    however many pages and rows there are. Tabs added with ``prefetch=True`` are built one
+    per event loop iteration once :meth:`start_prefetch` is called, ahead of being opened.
+    """
+
+    # The title of a page that was built and how long building it took in milliseconds
+    page_created = Signal(str, float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.factories = {}
+        self.pages = {}
+        self.prefetch_queue = []
+        self.currentChanged.connect(self.materialize)
+
+    def add_lazy_tab(self, factory, title: str, prefetch: bool = False) -> int:
+        """
+        Adds a tab whose page is built by calling ``factory`` when it is first needed.
+
+        Args:
+            factory (Callable): Returns the page widget.
+            title (str): The tab title.
+            prefetch (bool): Whether to build the page in the background before it is opened.
+
+        Returns:
+            int: The index of the new tab.
+        """
+        placeholder = QWidget()
+        layout = QVBoxLayout(placeholder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.factories[placeholder] = (title, factory)
+        if prefetch:
+            self.prefetch_queue.append(placeholder)
+        return self.addTab(placeholder, title)
+
+    def materialize(self, index: int):
+        """
+        Builds the page of a tab if it has not been built yet.
+        """
+        placeholder = self.widget(index)
+        if placeholder not in self.factories:
+            return
+        title, factory = self.factories.pop(placeholder)
+        started = time.perf_counter()
+        page = factory()
+        placeholder.layout().addWidget(page)
+        self.pages[title] = page
+        self.page_created.emit(title, (time.perf_counter() - started) * 1000)
+
+    def page(self, title: str) -> QWidget:
+        """
+        Returns the page of a tab by title, building it if needed.
+        """
+        if title not in self.pages:
+            for index in range(self.count()):
+                if self.tabText(index) == title:
+                    self.materialize(index)
+        return self.pages.get(title)
+
+    def start_prefetch(self):
+        QTimer.singleShot(0, self._prefetch_next)
+
+    def _prefetch_next(self):
+        # Build one page per iteration so input and painting stay responsive in between
+        while self.prefetch_queue:
+            placeholder = self.prefetch_queue.pop(0)
+            if placeholder in self.factories:
+                self.materialize(self.indexOf(placeholder))
+                break
+        if self.prefetch_queue:
+            QTimer.singleShot(0, self._prefetch_next)
+
 class MainWindow(QMainWindow):
+    # Emitted once, with the milliseconds from startup to the first paint of the window
+    first_painted = Signal(float)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Main Window")
         self.setGeometry(1000, 200, 720, 480)
+        self.first_paint_ms = None
 
-        # Create tabs
-        self.tab_widget = QTabWidget()
+        # Create tabs, every page but the first is built when it is first opened
+        self.tab_widget = LazyTabWidget()
         self.home_page = HomePage()
-        self.settings_page = SettingsPage()
-        self.import_equipment_page = ImportEquipmentPage(EQUIPMENT_MANAGER)
-        self.equipment_entry_page = EquipmentEntryPage(EQUIPMENT_MANAGER, AREA_CODE_MANAGER, DEVICE_TYPE_MANAGER)
-        self.area_code_table = AreaCodeTable()
-        self.device_type_table = DeviceTypeTable()
-
+        self.home_page.result_activated.connect(self.show_result)
+        self.home_page.filter_activated.connect(self.show_filtered)
         self.tab_widget.addTab(self.home_page, "Home")
-        self.tab_widget.addTab(self.settings_page, "Settings")
-        self.tab_widget.addTab(self.import_equipment_page, "Import Equipment")
-        self.tab_widget.addTab(self.equipment_entry_page, "Enter Equipment")
-        self.tab_widget.addTab(self.area_code_table, "Area Codes")
-        self.tab_widget.addTab(self.device_type_table, "Device Types")
+        self.tab_widget.add_lazy_tab(SettingsPage, "Settings")
+        self.tab_widget.add_lazy_tab(lambda: ImportEquipmentPage(EQUIPMENT_MANAGER), "Import Equipment")
+        self.tab_widget.add_lazy_tab(
+            lambda: EquipmentEntryPage(EQUIPMENT_MANAGER),
+            "Enter Equipment",
+        )
+        # The reference tables are small and opened often, load them once the window is up
+        self.tab_widget.add_lazy_tab(AreaCodeTable, "Area Codes", prefetch=True)
+        self.tab_widget.add_lazy_tab(DeviceTypeTable, "Device Types", prefetch=True)
+        self.tab_widget.page_created.connect(lambda title, ms: logger.info("Built the %s tab in %.1f ms", title, ms))
 
         # Add tabs to the main window
         self.setCentralWidget(self.tab_widget)
 
+    # The tab showing the rows of each searchable model
+    RESULT_TABS = {Equipment: "Enter Equipment", AreaCode: "Area Codes", DeviceType: "Device Types"}
+
+    def show_result(self, model, obj_id: int, title: str):
+        """
+        Opens the tab of a global search result and selects its row.
+        """
+        tab_title = self.RESULT_TABS.get(model)
+        page = self.tab_widget.page(tab_title) if tab_title else None
+        if page is None:
+            return
+        # The equipment page wraps its table
+        table = getattr(page, "table", page)
+        self.show_tab(tab_title)
+        table.show_row(obj_id, title)
+
+    def show_filtered(self, column: str, value):
+        """
+        Opens the equipment tab filtered to the rows whose ``column`` shows exactly ``value``,
+        or no value when it is None.
+        """
+        tab_title = self.RESULT_TABS[Equipment]
+        page = self.tab_widget.page(tab_title)
+        self.show_tab(tab_title)
+        page.table.show_group(column, value)
+
+    def show_tab(self, title: str):
+        for index in range(self.tab_widget.count()):
+            if self.tab_widget.tabText(index) == title:
+                self.tab_widget.setCurrentIndex(index)
+
+    def closeEvent(self, event):
+        super().closeEvent(event)
+        if event.isAccepted():
+            # Hiding the tables saves their queued edits, then let the saves and queries finish
+            self.hide()
+            if not db_executor().wait_for_done():
+                logger.warning("Quitting with database tasks still running")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_ms is None:
+            self.first_paint_ms = elapsed_ms()
+            logger.info("First window paint %.1f ms after startup", self.first_paint_ms)
+            self.first_painted.emit(self.first_paint_ms)
+
 def main():
+    # SADIEWARE_TIMING=1 logs the time to the first paint and the time taken to build each tab
+    logging.basicConfig(level=logging.INFO if os.environ.get("SADIEWARE_TIMING") else logging.WARNING)
     app = QApplication(sys.argv)
     main_window = MainWindow()
+    main_window.first_painted.connect(lambda ms: main_window.tab_widget.start_prefetch())
     main_window.show()
+
+    # Refresh open tables when other clients change rows, clients of the service see them
+    # when their tables are synced instead
+    engine = get_engine()
+    if not isinstance(EQUIPMENT_MANAGER, RemoteManager) and engine.dialect.name == "postgresql":
+        dispatcher = ChangeDispatcher([EQUIPMENT_MANAGER, AREA_CODE_MANAGER, DEVICE_TYPE_MANAGER])
+        listener = ChangeListener(engine, dispatcher.changes_received.emit, on_reconnect=dispatcher.reload_requested.emit)
+        listener.start()
+        app.aboutToQuit.connect(listener.stop)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
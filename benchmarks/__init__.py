@@ -0,0 +1,5 @@
+"""
+Performance benchmarks of the managers, the table widgets and the importer, run with
+``python -m benchmarks``. Results are written as JSON and can be checked against a
+baseline run with the thresholds in ``thresholds.json``.
+"""
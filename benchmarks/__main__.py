@@ -0,0 +1,140 @@
+"""
+Runs the benchmark suite on freshly generated data.
+
+    python -m benchmarks --database sqlite --scale 1k
+    python -m benchmarks --database postgres --database-url postgresql+psycopg2://... --scale 100k
+    python -m benchmarks --scale 1k --baseline benchmarks/results/sqlite-1k.json
+
+The suite DROPS AND RECREATES the tables of the database it runs on. SQLite runs use a
+temporary file, PostgreSQL runs need a dedicated database given by ``--database-url`` or
+``SADIEWARE_BENCHMARK_URL``. Qt benchmarks run offscreen unless ``QT_QPA_PLATFORM`` is set.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_URL_ENV = "SADIEWARE_BENCHMARK_URL"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "thresholds.json")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Times the application's hot paths.")
+    parser.add_argument("--database", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--database-url", help=f"The database to run on, defaults to ${BENCHMARK_URL_ENV} for postgres.")
+    parser.add_argument("--scale", default="1k", help="Equipment rows: 1k, 100k, 1m or a row count.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the data generator.")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Run only these benchmarks.")
+    parser.add_argument("--skip", nargs="+", metavar="NAME", default=[], help="Do not run these benchmarks.")
+    parser.add_argument("--repeat", type=int, help="Timed iterations per benchmark, overriding each benchmark's default.")
+    parser.add_argument("--output", help="The results file, defaults to benchmarks/results/<database>-<scale>.json.")
+    parser.add_argument("--baseline", help="A previous results file to check for regressions.")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="The regression thresholds file.")
+    return parser.parse_args(argv)
+
+
+def database_url(args, temp_dir: str) -> str:
+    if args.database_url:
+        return args.database_url
+    if args.database == "sqlite":
+        return "sqlite:///" + os.path.join(temp_dir, "benchmark.db")
+    url = os.environ.get(BENCHMARK_URL_ENV)
+    if not url:
+        sys.exit(f"Running on postgres needs --database-url or ${BENCHMARK_URL_ENV}, the suite drops its tables.")
+    return url
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    temp_dir = tempfile.TemporaryDirectory(prefix="sadieware-bench-")
+    # The application reads its database from the environment, set it before the engine exists
+    os.environ["SADIEWARE_DATABASE_URL"] = database_url(args, temp_dir.name)
+    # Tables are timed loading from the database, not from a snapshot of an earlier run
+    os.environ["SADIEWARE_SNAPSHOT_DIR"] = ""
+
+    import sqlalchemy
+    from benchmarks.datagen import DEFAULT_SEED, DataGenerator, scale_rows
+    from benchmarks.suite import BENCHMARKS, BenchmarkContext, find_regressions, load_thresholds, run_benchmark
+    from db_classes import Base
+    from db_setup import create_schema, get_engine
+
+    unknown = set(args.only or []) - BENCHMARKS.keys()
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}. Available: {', '.join(BENCHMARKS)}.")
+    names = [name for name in (args.only or BENCHMARKS) if name not in args.skip]
+    # Read the baseline first, it may be the results file this run overwrites
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    seed = DEFAULT_SEED if args.seed is None else args.seed
+    generator = DataGenerator(scale_rows(args.scale), seed)
+
+    engine = get_engine()
+    print(f"Generating {generator.equipment_rows} equipment rows on {engine.dialect.name}...", flush=True)
+    started = time.perf_counter()
+    Base.metadata.drop_all(engine)
+    create_schema(engine)
+    generator.populate(engine)
+    print(f"Generated in {time.perf_counter() - started:.1f}s", flush=True)
+
+    results = {
+        "meta": {
+            "database": engine.dialect.name,
+            "server_version": ".".join(map(str, engine.dialect.server_version_info or ())),
+            "scale": args.scale.lower(),
+            "seed": seed,
+            "equipment_rows": generator.equipment_rows,
+            "device_types": generator.device_types,
+            "area_codes": generator.area_codes,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        },
+        "benchmarks": {},
+    }
+    context = BenchmarkContext(engine, generator)
+    try:
+        for name in names:
+            result = run_benchmark(BENCHMARKS[name], context, args.repeat)
+            results["benchmarks"][name] = result
+            print(f"{name:<24} {result['median_ms']:>10.2f} ms {result['per_operation_ms']:>10.3f} ms/op {result['statements']:>7} statements", flush=True)
+    finally:
+        context.close()
+        engine.dispose()
+        temp_dir.cleanup()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['database']}-{results['meta']['scale']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Wrote {output}")
+
+    if baseline:
+        regressions = find_regressions(results, baseline, load_thresholds(args.thresholds))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
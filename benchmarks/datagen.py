@@ -0,0 +1,147 @@
+import csv
+import random
+from typing import Iterator
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from db_classes import *
+
+# Number of equipment rows for each named scale
+SCALES = {
+    "1k": 1_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+DEFAULT_SEED = 1234
+
+# Rows per INSERT statement, keeps memory flat at the 1m scale
+INSERT_CHUNK_SIZE = 10_000
+
+WORDS = [
+    "pump", "valve", "motor", "sensor", "conveyor", "mixer", "boiler", "filter", "fan", "compressor",
+    "heater", "chiller", "press", "drive", "scale", "robot", "tank", "feeder", "dryer", "panel",
+]
+MANUFACTURERS = ["Siemens", "Rockwell", "ABB", "Schneider", "Omron", "Mitsubishi", "Honeywell", "Emerson", "Yokogawa", "Beckhoff"]
+VENDORS = ["Grainger", "McMaster", "Motion", "Applied", "Kaman", "Wesco", "Graybar", "Border States"]
+
+
+def scale_rows(scale: str) -> int:
+    """
+    Returns the number of equipment rows of a named scale, or of a plain row count such as ``"2500"``.
+
+    Raises:
+        ValueError: If the scale is neither a known name nor a positive number.
+    """
+    rows = SCALES.get(scale.lower())
+    if rows is None:
+        try:
+            rows = int(scale)
+        except ValueError:
+            rows = 0
+    if rows <= 0:
+        raise ValueError(f"Unknown scale '{scale}', expected one of {', '.join(SCALES)} or a row count.")
+    return rows
+
+
+def reference_counts(equipment_rows: int) -> tuple[int, int]:
+    """
+    Returns the number of device types and area codes generated for a number of equipment rows.
+    """
+    return max(10, equipment_rows // 100), max(10, equipment_rows // 50)
+
+
+def device_type_name(index: int) -> str:
+    return f"DT-{index:05d}"
+
+
+def area_code_name(index: int) -> str:
+    return f"AC-{index:05d}"
+
+
+def equipment_name(index: int) -> str:
+    return f"EQ-{index:07d}"
+
+
+class DataGenerator:
+    """
+    Generates the same synthetic device types, area codes and equipment for the same seed.
+
+    Every value is drawn from one seeded random generator in a fixed order, so two runs with
+    the same seed and scale produce identical tables on any database. Ids are assigned in
+    insertion order starting at 1, which the equipment foreign keys rely on.
+    """
+
+    def __init__(self, equipment_rows: int, seed: int = DEFAULT_SEED):
+        self.equipment_rows = equipment_rows
+        self.device_types, self.area_codes = reference_counts(equipment_rows)
+        self.seed = seed
+
+    def device_type_records(self) -> Iterator[dict]:
+        for index in range(self.device_types):
+            yield {"device_type": device_type_name(index), "description": f"Device type {index}"}
+
+    def area_code_records(self) -> Iterator[dict]:
+        for index in range(self.area_codes):
+            yield {"area_code": area_code_name(index), "description": f"Area {index}"}
+
+    def equipment_records(self, start: int = 0, count: int = None, rng: random.Random = None) -> Iterator[dict]:
+        """
+        Yields equipment records with foreign keys as ids.
+
+        Args:
+            start (int): The index of the first record, names are unique per index.
+            count (int): The number of records, defaults to the generator's equipment rows.
+            rng (random.Random): The random generator, defaults to one seeded with the seed.
+        """
+        rng = rng or random.Random(self.seed)
+        count = self.equipment_rows if count is None else count
+        for index in range(start, start + count):
+            words = rng.sample(WORDS, 3)
+            yield {
+                "name": equipment_name(index),
+                "application": f"{words[0].title()} {words[1]} {index}",
+                "device_type_id": rng.randrange(self.device_types) + 1,
+                # One in ten pieces of equipment has no area code
+                "area_code_id": rng.randrange(self.area_codes) + 1 if rng.random() >= 0.1 else None,
+                "specs_description": " ".join(rng.choices(WORDS, k=6)),
+                "manufacturer": rng.choice(MANUFACTURERS),
+                "vendor": rng.choice(VENDORS) if rng.random() >= 0.2 else None,
+            }
+
+    def populate(self, engine: Engine):
+        """
+        Inserts the generated rows into empty tables, in one transaction.
+        """
+        with engine.begin() as connection:
+            connection.execute(insert(DeviceType.__table__), list(self.device_type_records()))
+            connection.execute(insert(AreaCode.__table__), list(self.area_code_records()))
+            chunk = []
+            for record in self.equipment_records():
+                chunk.append(record)
+                if len(chunk) >= INSERT_CHUNK_SIZE:
+                    connection.execute(insert(Equipment.__table__), chunk)
+                    chunk = []
+            if chunk:
+                connection.execute(insert(Equipment.__table__), chunk)
+
+    def write_import_file(self, path: str, rows: int, start: int):
+        """
+        Writes an equipment import CSV with foreign keys given by name, the way users export
+        them from a spreadsheet.
+
+        Args:
+            path (str): The CSV file to write.
+            rows (int): The number of rows.
+            start (int): The index of the first row, use one past the populated rows to avoid
+                name clashes.
+        """
+        rng = random.Random(self.seed + start)
+        labels = Equipment._fields_map
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(labels.keys())
+            for record in self.equipment_records(start, rows, rng):
+                record["device_type_id"] = device_type_name(record["device_type_id"] - 1)
+                if record["area_code_id"] is not None:
+                    record["area_code_id"] = area_code_name(record["area_code_id"] - 1)
+                writer.writerow(record[field] or "" for field in labels.values())
@@ -0,0 +1,403 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable
+from sqlalchemy import event, insert, select
+from sqlalchemy.engine import Engine
+from benchmarks.datagen import DataGenerator
+from db_classes import *
+
+# Operations timed per iteration of the write benchmarks
+WRITE_OPERATIONS = 100
+
+# Rows per iteration of the import benchmark
+IMPORT_ROWS = 5000
+
+# Longest wait for the table model's background queries
+QT_TIMEOUT = 120.0
+
+
+class Benchmark:
+    """
+    One timed hot path.
+
+    ``setup`` receives the :class:`BenchmarkContext`, prepares whatever the benchmark needs
+    outside of the timings and returns the operation to time. The operation is called once
+    to warm up and then ``repeat`` times.
+    """
+
+    def __init__(self, name: str, setup: Callable, operations: int = 1, repeat: int = 5, qt: bool = False):
+        self.name = name
+        self.setup = setup
+        self.operations = operations
+        self.repeat = repeat
+        self.qt = qt
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str = None, operations: int = 1, repeat: int = 5, qt: bool = False):
+    """
+    Registers a benchmark setup function under ``name``, defaulting to the function's name.
+    """
+
+    def register(setup):
+        BENCHMARKS[name or setup.__name__] = Benchmark(name or setup.__name__, setup, operations, repeat, qt)
+        return setup
+
+    return register
+
+
+class BenchmarkContext:
+    """
+    The database, managers and data shared by the benchmarks of one run.
+
+    Args:
+        engine (Engine): The application's engine, with freshly generated data.
+        generator (DataGenerator): The generator that populated the database.
+    """
+
+    def __init__(self, engine: Engine, generator: DataGenerator):
+        import db_setup
+
+        self.engine = engine
+        self.generator = generator
+        self.equipment_manager = db_setup.EQUIPMENT_MANAGER
+        self.device_type_manager = db_setup.DEVICE_TYPE_MANAGER
+        self.area_code_manager = db_setup.AREA_CODE_MANAGER
+        self.statements = 0
+        self.next_index = generator.equipment_rows
+        # Iterations of the running benchmark including the warm-up, for setups that
+        # prepare data for every iteration
+        self.iterations = 0
+        self._app = None
+        self._widgets = []
+        self._temp_dir = tempfile.TemporaryDirectory(prefix="sadieware-bench-")
+        event.listen(engine, "before_cursor_execute", self._count_statement)
+
+    def _count_statement(self, *args):
+        self.statements += 1
+
+    def allocate(self, rows: int) -> int:
+        """
+        Reserves ``rows`` equipment indexes that are not used by any row yet, returning the first.
+        """
+        start = self.next_index
+        self.next_index += rows
+        return start
+
+    def insert_equipment(self, rows: int) -> list[int]:
+        """
+        Inserts new equipment rows outside of the timings, returning their ids.
+        """
+        records = list(self.generator.equipment_records(self.allocate(rows), rows))
+        with self.engine.begin() as connection:
+            connection.execute(insert(Equipment.__table__), records)
+            return list(connection.execute(select(Equipment.id).order_by(Equipment.id.desc()).limit(rows)).scalars())
+
+    def temp_path(self, name: str) -> str:
+        return os.path.join(self._temp_dir.name, name)
+
+    def app(self):
+        """
+        Returns the QApplication, created on first use. Set ``QT_QPA_PLATFORM=offscreen``
+        to run without a display.
+        """
+        if self._app is None:
+            from PySide6.QtWidgets import QApplication
+
+            self._app = QApplication.instance() or QApplication([])
+        return self._app
+
+    def show(self, widget):
+        """
+        Shows a widget until the running benchmark ends.
+        """
+        widget.resize(1200, 800)
+        widget.show()
+        self._widgets.append(widget)
+        return widget
+
+    def release_widgets(self):
+        """
+        Deletes the widgets of the last benchmark, so their models stop listening for changes.
+        """
+        from PySide6.QtCore import QCoreApplication, QEvent
+
+        for widget in self._widgets:
+            widget.close()
+            widget.deleteLater()
+        self._widgets.clear()
+        QCoreApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def wait_until(self, condition: Callable[[], bool], timeout: float = QT_TIMEOUT):
+        """
+        Processes Qt events until ``condition`` returns True.
+
+        Raises:
+            TimeoutError: If the condition is still False after ``timeout`` seconds.
+        """
+        app = self.app()
+        deadline = time.perf_counter() + timeout
+        app.processEvents()
+        while not condition():
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"Gave up waiting after {timeout:.0f}s.")
+            time.sleep(0.0005)
+            app.processEvents()
+
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self._count_statement)
+        self._temp_dir.cleanup()
+
+
+def run_benchmark(benchmark: Benchmark, context: BenchmarkContext, repeat: int = None) -> dict:
+    """
+    Times one benchmark, returning its result entry.
+
+    Returns:
+        dict: The median, minimum and maximum time per iteration in milliseconds, the
+        median time per operation and the number of SQL statements per iteration.
+    """
+    repeat = repeat or benchmark.repeat
+    context.iterations = repeat + 1
+    if benchmark.qt:
+        context.app()
+    operation = benchmark.setup(context)
+    timings = []
+    statements = []
+    try:
+        operation()
+        for _ in range(repeat):
+            before = context.statements
+            started = time.perf_counter()
+            operation()
+            timings.append((time.perf_counter() - started) * 1000)
+            statements.append(context.statements - before)
+    finally:
+        if benchmark.qt:
+            context.release_widgets()
+    median = statistics.median(timings)
+    return {
+        "median_ms": round(median, 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "per_operation_ms": round(median / benchmark.operations, 4),
+        "operations": benchmark.operations,
+        "iterations": len(timings),
+        "statements": max(statements),
+    }
+
+
+def wait_for_model(context: BenchmarkContext, table):
+    context.wait_until(lambda: not table.table_model.is_busy())
+
+
+def equipment_table(context: BenchmarkContext):
+    from qt_table import SimpleTable
+    from qt_table_dialog import EquipmentDialog
+
+    table = context.show(SimpleTable(context.equipment_manager, "Equipment", dialog_class=EquipmentDialog))
+    wait_for_model(context, table)
+    return table
+
+
+@benchmark(repeat=3)
+def create_pairs_for_table(context: BenchmarkContext):
+    return context.equipment_manager.create_pairs_for_table
+
+
+@benchmark(repeat=3)
+def table_data(context: BenchmarkContext):
+    return context.equipment_manager.table_data
+
+
+@benchmark(repeat=20)
+def first_page(context: BenchmarkContext):
+    return lambda: context.equipment_manager.query(limit=200)
+
+
+@benchmark(repeat=10)
+def search(context: BenchmarkContext):
+    return lambda: context.equipment_manager.query(search="pump", limit=200)
+
+
+@benchmark(repeat=10)
+def count(context: BenchmarkContext):
+    return context.equipment_manager.count
+
+
+@benchmark(repeat=20)
+def summary(context: BenchmarkContext):
+    from db_summary import EquipmentSummary
+
+    return EquipmentSummary(context.equipment_manager).totals
+
+
+@benchmark(repeat=10, qt=True)
+def load_data(context: BenchmarkContext):
+    table = equipment_table(context)
+
+    def operation():
+        table.load_data()
+        wait_for_model(context, table)
+
+    return operation
+
+
+@benchmark(repeat=10, qt=True)
+def filter_table(context: BenchmarkContext):
+    table = equipment_table(context)
+    # Alternate the search so every iteration queries
+    terms = iter(["pump", "valve"] * 1000)
+
+    def operation():
+        table.search_bar.setText(next(terms))
+        table.filter_table()
+        wait_for_model(context, table)
+
+    return operation
+
+
+@benchmark(repeat=10, qt=True)
+def sort_table(context: BenchmarkContext):
+    from PySide6.QtCore import Qt
+
+    table = equipment_table(context)
+    orders = iter([Qt.DescendingOrder, Qt.AscendingOrder] * 1000)
+
+    def operation():
+        table.table_model.sort(1, next(orders))
+        wait_for_model(context, table)
+
+    return operation
+
+
+def new_equipment(context: BenchmarkContext, count: int) -> list:
+    return [Equipment(**record) for record in context.generator.equipment_records(context.allocate(count), count)]
+
+
+@benchmark(operations=WRITE_OPERATIONS)
+def validate(context: BenchmarkContext):
+    manager = context.equipment_manager
+    objs = new_equipment(context, WRITE_OPERATIONS)
+
+    def operation():
+        for obj in objs:
+            manager.validate(obj)
+
+    return operation
+
+
+@benchmark(operations=WRITE_OPERATIONS)
+def check_uniqueness(context: BenchmarkContext):
+    from db_managers import get_unique_fields
+
+    manager = context.equipment_manager
+    unique_fields = get_unique_fields(manager.model)
+    objs = new_equipment(context, WRITE_OPERATIONS)
+
+    def operation():
+        for obj in objs:
+            manager.check_uniqueness(obj, unique_fields)
+
+    return operation
+
+
+@benchmark(operations=WRITE_OPERATIONS)
+def add(context: BenchmarkContext):
+    manager = context.equipment_manager
+
+    def operation():
+        for obj in new_equipment(context, WRITE_OPERATIONS):
+            manager.add(obj)
+
+    return operation
+
+
+@benchmark(operations=WRITE_OPERATIONS)
+def update(context: BenchmarkContext):
+    manager = context.equipment_manager
+    ids = context.insert_equipment(WRITE_OPERATIONS)
+    versions = iter(range(1_000_000))
+
+    def operation():
+        version = next(versions)
+        for obj_id in ids:
+            manager.update(obj_id, {"specs_description": f"Revision {version}"})
+
+    return operation
+
+
+@benchmark(operations=WRITE_OPERATIONS)
+def delete(context: BenchmarkContext):
+    manager = context.equipment_manager
+    ids = context.insert_equipment(WRITE_OPERATIONS * context.iterations)
+
+    def operation():
+        for _ in range(WRITE_OPERATIONS):
+            manager.delete(ids.pop())
+
+    return operation
+
+
+@benchmark(name="import", operations=IMPORT_ROWS, repeat=3)
+def import_equipment(context: BenchmarkContext):
+    from db_import import EquipmentImporter
+
+    importer = EquipmentImporter(context.equipment_manager)
+    # Every iteration imports new names, the files are written before the timings start
+    paths = []
+    for _ in range(context.iterations):
+        start = context.allocate(IMPORT_ROWS)
+        paths.append(context.temp_path(f"import-{start}.csv"))
+        context.generator.write_import_file(paths[-1], IMPORT_ROWS, start)
+
+    def operation():
+        result = importer.run(paths.pop())
+        if result.rows_imported != IMPORT_ROWS:
+            raise RuntimeError(f"Imported {result.rows_imported} of {IMPORT_ROWS} rows: {result.errors[:3]}")
+
+    return operation
+
+
+def load_thresholds(path: str) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def find_regressions(results: dict, baseline: dict, thresholds: dict) -> list[str]:
+    """
+    Compares a run with a baseline run of the same database and scale.
+
+    A benchmark regresses when its median time exceeds the baseline's by more than its
+    ``time_ratio`` and by at least ``min_delta_ms``, or when it runs more SQL statements
+    than the baseline allows by ``statements_ratio``. Benchmarks missing from either run
+    are not compared.
+
+    Returns:
+        list[str]: One message per regression, empty if there are none.
+
+    Raises:
+        ValueError: If the runs used different databases or scales.
+    """
+    for key in ("database", "scale", "seed"):
+        if results["meta"][key] != baseline["meta"][key]:
+            raise ValueError(f"Cannot compare runs with different {key}: {results['meta'][key]} and {baseline['meta'][key]}.")
+
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if reference is None:
+            continue
+        limits = {**thresholds["default"], **thresholds.get("benchmarks", {}).get(name, {})}
+        median, allowed = result["median_ms"], reference["median_ms"] * limits["time_ratio"]
+        if median > allowed and median - reference["median_ms"] >= limits["min_delta_ms"]:
+            regressions.append(f"{name}: {median:.1f} ms, baseline {reference['median_ms']:.1f} ms (limit {allowed:.1f} ms)")
+        allowed_statements = reference["statements"] * limits["statements_ratio"]
+        if result["statements"] > allowed_statements:
+            regressions.append(f"{name}: {result['statements']} statements, baseline {reference['statements']}")
+    return regressions
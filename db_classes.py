@@ -1,17 +1,90 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+import logging
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index, event, func, literal_column
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+logger = logging.getLogger(__name__)
+
 # Define the base class
 Base = declarative_base()
 
+def create_trigram_extension(target, connection, **kw):
+    """
+    Creates the pg_trgm extension on PostgreSQL. Servers without it, or where the user may
+    not create it, get the tables without their trigram indexes.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    if connection.exec_driver_sql("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'").first() is None:
+        logger.warning("The pg_trgm extension is not available, creating the tables without trigram indexes")
+        return
+    try:
+        with connection.begin_nested():
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DBAPIError as e:
+        logger.warning("Could not create the pg_trgm extension, creating the tables without trigram indexes: %s", e.orig)
+
+def has_trigram_extension(ddl, target, bind, **kw) -> bool:
+    return bind is not None and bind.exec_driver_sql("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'").first() is not None
+
+# Trigram indexes let PostgreSQL serve case-insensitive substring searches (ILIKE '%...%')
+event.listen(Base.metadata, "before_create", create_trigram_extension)
+
+def trigram_indexes(table_name: str, *fields: str) -> tuple:
+    """
+    Returns GIN trigram indexes over the given text fields, created on PostgreSQL only and
+    only if the pg_trgm extension is installed.
+    """
+    return tuple(
+        Index(
+            f"ix_{table_name}_{field}_trgm",
+            field,
+            postgresql_using="gin",
+            postgresql_ops={field: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql", callable_=has_trigram_extension)
+        for field in fields
+    )
+
 class BaseBase(Base):
     __abstract__ = True
     _fields: list[str] = []
 
+    # Set to the database's clock on every insert and update, so clients can fetch only the
+    # rows changed since they last synced (see snapshot_cache). Inserts also set it in the
+    # statement, since SQLite cannot give the column a server default when it is added later.
+    updated_at = Column(
+        DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now(), nullable=False, index=True
+    )
+    # Incremented by every update, so an update can require the version its values were
+    # read at and fail instead of overwriting someone else's change
+    version = Column(Integer, default=1, server_default="1", onupdate=literal_column("version") + 1, nullable=False)
+
+# Records the rows deleted from the other tables, so clients that synced before a delete
+# learn about it (see snapshot_cache)
+class DeletedRow(Base):
+    __tablename__ = "deleted_rows"
+    __table_args__ = (Index("ix_deleted_rows_table_name_deleted_at", "table_name", "deleted_at"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+# Equipment counts by each value of the summarized fields, kept up to date by triggers on
+# the equipments table (see db_summary). Foreign keys are counted by id, as text, and a
+# missing value is counted under the empty string.
+class EquipmentCount(Base):
+    __tablename__ = "equipment_counts"
+
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
 # Define the DeviceType class
 class DeviceType(BaseBase):
     __tablename__ = "device_types"
+    __table_args__ = trigram_indexes("device_types", "device_type", "description")
     _fields = [
         "id",
         "device_type",
@@ -33,6 +106,7 @@ class DeviceType(BaseBase):
 # Define the AreaCode class
 class AreaCode(BaseBase):
     __tablename__ = "area_codes"
+    __table_args__ = trigram_indexes("area_codes", "area_code", "description")
     _fields = [
         "id",
         "area_code",
@@ -54,6 +128,9 @@ class AreaCode(BaseBase):
 # Define the Equipment class
 class Equipment(BaseBase):
     __tablename__ = "equipments"
+    __table_args__ = trigram_indexes(
+        "equipments", "name", "application", "specs_description", "manufacturer", "vendor"
+    )
     _fields = [
         "id",
         "name",
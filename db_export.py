@@ -0,0 +1,173 @@
+import csv
+import datetime
+import os
+import time
+from typing import Callable
+from db_managers import TableManager
+from db_metrics import instrumented
+
+# File extensions an export can be written as, with their display names
+EXPORT_FORMATS = {".csv": "CSV", ".parquet": "Parquet"}
+
+
+class ExportProgress:
+    def __init__(self, path: str, total_rows: int = None):
+        self.path = path
+        self.total_rows = total_rows
+        self.rows_written = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.elapsed if self.elapsed else 0.0
+
+
+class CsvExportWriter:
+    def __init__(self, path: str, headers: list[str], columns: list):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write(self, rows: list[tuple]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """
+    Writes each chunk of rows as one Parquet row group, with column types taken from the
+    table columns so every row group has the same schema, even one where a column is all NULL.
+
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+
+    def __init__(self, path: str, headers: list[str], columns: list):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Exporting .parquet files requires pyarrow, install it with 'pip install pyarrow'.") from e
+
+        self.pyarrow = pyarrow
+        arrow_types = {
+            int: pyarrow.int64(),
+            float: pyarrow.float64(),
+            bool: pyarrow.bool_(),
+            str: pyarrow.string(),
+            datetime.date: pyarrow.date32(),
+            datetime.datetime: pyarrow.timestamp("us"),
+        }
+        fields = []
+        # Columns of any other type are written as their text
+        self.as_text = []
+        for header, column in zip(headers, columns):
+            try:
+                arrow_type = arrow_types.get(column.type.python_type)
+            except NotImplementedError:
+                arrow_type = None
+            self.as_text.append(arrow_type is None)
+            fields.append(pyarrow.field(header, arrow_type or pyarrow.string()))
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, rows: list[tuple]):
+        arrays = []
+        for index, (field, as_text) in enumerate(zip(self.schema, self.as_text)):
+            values = [row[index] for row in rows]
+            if as_text:
+                values = [None if value is None else str(value) for value in values]
+            arrays.append(self.pyarrow.array(values, type=field.type))
+        self.writer.write_batch(self.pyarrow.record_batch(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_WRITERS = {".csv": CsvExportWriter, ".parquet": ParquetExportWriter}
+
+
+class TableExporter:
+    """
+    Exports a manager's table as shown, with related names and the table's search and sort,
+    to a CSV or Parquet file.
+
+    Rows are streamed from the database and written a chunk at a time, so memory use stays
+    flat however many rows match. The file is written under a temporary name and only
+    replaces ``path`` once the export is complete, a cancelled or failed export leaves no
+    partial file behind.
+    """
+
+    def __init__(self, manager: TableManager, chunk_size: int = 5000):
+        self.manager = manager
+        self.chunk_size = chunk_size
+
+    @instrumented
+    def run(
+        self,
+        path: str,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        progress: Callable[[ExportProgress], None] = None,
+        cancelled: Callable[[], bool] = None,
+        equals: dict = None,
+    ) -> ExportProgress:
+        """
+        Exports the rows matching a search, reporting progress after every chunk.
+
+        Args:
+            path (str): The path to a ``.csv`` or ``.parquet`` file.
+            search (str): Case-insensitive substring to match, see :meth:`BaseManager.query`.
+            column (str): The label or field name to search in, defaults to all columns.
+            sort_column (str): The label or field name to sort by, defaults to ``id``.
+            descending (bool): Whether to sort in descending order.
+            progress (Callable): Called with the running :class:`ExportProgress` after each chunk.
+            cancelled (Callable): Polled between chunks, the export stops when it returns True.
+            equals (dict): Exact values to match, see :meth:`BaseManager.equals_clause`.
+
+        Returns:
+            ExportProgress: The final counts.
+
+        Raises:
+            ValueError: If the file type is not supported.
+            ImportError: If a Parquet file is requested and pyarrow is not installed.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        writer_class = EXPORT_WRITERS.get(extension)
+        if writer_class is None:
+            raise ValueError(f"Unsupported file type '{extension}', expected .csv or .parquet.")
+
+        result = ExportProgress(path, self.manager.count(search, column, equals))
+        temp_path = path + ".part"
+        writer = writer_class(temp_path, self.manager.schema.labels, self.manager.table_columns())
+        completed = False
+        try:
+            chunks = self.manager.stream_rows(search, column, sort_column, descending, self.chunk_size, equals)
+            try:
+                for rows in chunks:
+                    if cancelled and cancelled():
+                        result.cancelled = True
+                        break
+                    writer.write(rows)
+                    result.rows_written += len(rows)
+                    result.elapsed = time.perf_counter() - result.started
+                    if progress:
+                        progress(result)
+            finally:
+                # Closes the cursor and the session of a cancelled export right away
+                chunks.close()
+            completed = not result.cancelled
+        finally:
+            writer.close()
+            if completed:
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+        result.elapsed = time.perf_counter() - result.started
+        return result
@@ -0,0 +1,245 @@
+import csv
+import os
+import time
+from typing import Callable, Iterator
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from db_classes import *
+from db_managers import ChangeEvent, EquipmentManager, get_reference_cache
+
+
+class ImportRowError:
+    def __init__(self, row_number: int, message: str):
+        self.row_number = row_number
+        self.message = message
+
+    def __repr__(self):
+        return f"ImportRowError(row_number={self.row_number!r}, message={self.message!r})"
+
+
+class ImportProgress:
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.errors: list[ImportRowError] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path: str, chunk_size: int = 1000) -> Iterator[list[tuple[int, dict]]]:
+    """
+    Streams a CSV or XLSX file as chunks of ``(row_number, record)`` pairs.
+
+    The first row is the header. Row numbers are 1-based and count the header, so they
+    match what a spreadsheet program shows. Only one chunk is held in memory at a time.
+
+    Args:
+        path (str): The path to a ``.csv`` or ``.xlsx`` file.
+        chunk_size (int): The number of records per chunk.
+
+    Raises:
+        ValueError: If the file type is not supported.
+        ImportError: If an XLSX file is given and openpyxl is not installed.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        rows = _read_csv(path)
+    elif extension == ".xlsx":
+        rows = _read_xlsx(path)
+    else:
+        raise ValueError(f"Unsupported file type '{extension}', expected .csv or .xlsx.")
+
+    chunk = []
+    for row_number, record in rows:
+        chunk.append((row_number, record))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _read_csv(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for row_number, record in enumerate(csv.DictReader(file), start=2):
+            yield row_number, record
+
+
+def _read_xlsx(path: str):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ImportError("Importing .xlsx files requires openpyxl, install it with 'pip install openpyxl'.") from e
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            yield row_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+class EquipmentImporter:
+    """
+    Imports equipment records in bulk with set-based validation.
+
+    Each chunk costs one name lookup per foreign key, one validation query and a
+    single multi-row INSERT, all inside one transaction per chunk. Invalid rows are
+    reported and skipped, and the rest of the chunk is still imported. The manager's
+    listeners receive one insert event per chunk.
+    """
+
+    def __init__(self, manager: EquipmentManager, chunk_size: int = 1000):
+        self.manager = manager
+        self.model = manager.model
+        self.chunk_size = chunk_size
+        # Accept both the human-readable labels and the field names as headers
+        self.headers = {}
+        for field_name in manager.schema.editable_fields:
+            self.headers[manager.schema.field_to_label[field_name].lower()] = field_name
+            self.headers[field_name.lower()] = field_name
+        # Foreign keys are given by name, the same names the equipment table shows
+        self.lookups = {
+            field_name: (name_column, name_column.class_.id, f"{manager.schema.field_to_label[field_name]} '{{value}}' does not exist.")
+            for field_name, name_column in manager.related_names.items()
+        }
+
+    def run(self, path: str, progress: Callable[[ImportProgress], None] = None, cancelled: Callable[[], bool] = None) -> ImportProgress:
+        """
+        Imports a file chunk by chunk, reporting progress after every chunk.
+
+        Args:
+            path (str): The path to a ``.csv`` or ``.xlsx`` file.
+            progress (Callable): Called with the running :class:`ImportProgress` after each chunk.
+            cancelled (Callable): Polled between chunks, the import stops when it returns True.
+
+        Returns:
+            ImportProgress: The final counts and per-row errors.
+        """
+        result = ImportProgress()
+        with self.open_session() as session:
+            for chunk in read_rows(path, self.chunk_size):
+                if cancelled and cancelled():
+                    result.cancelled = True
+                    break
+                ids, errors = self.import_chunk(session, chunk)
+                result.errors.extend(errors)
+                result.rows_imported += len(ids)
+                result.rows_read += len(chunk)
+                result.elapsed = time.perf_counter() - result.started
+                if progress:
+                    progress(result)
+        result.elapsed = time.perf_counter() - result.started
+        return result
+
+    def open_session(self) -> Session:
+        """
+        Opens the session the chunks of one import are written with.
+        """
+        return self.manager.session_factory()
+
+    def import_chunk(self, session: Session, chunk: list[tuple[int, dict]]) -> tuple[list[int], list[ImportRowError]]:
+        """
+        Validates and inserts one chunk of ``(row_number, record)`` pairs, returning the
+        ids of the rows imported and the errors of the rows that were not.
+        """
+        records, errors = self.prepare_chunk(session, chunk)
+        ids = self.insert_chunk(session, records, errors)
+        return ids, errors
+
+    def prepare_chunk(self, session: Session, chunk: list[tuple[int, dict]]):
+        """
+        Converts and validates one chunk, returning the insertable records and the row errors.
+        """
+        candidates = [(row_number, self.to_record(raw)) for row_number, raw in chunk]
+        errors = []
+
+        # Resolve foreign key names from the reference cache, or with one query per key for
+        # the whole chunk for models that are not cached
+        for field_name, (name_column, id_column, message) in self.lookups.items():
+            names = {record[field_name] for _, record in candidates if record.get(field_name) is not None}
+            cache = get_reference_cache(name_column.class_, self.manager.session_factory)
+            if not names:
+                ids = {}
+            elif cache is not None and cache.name_field == name_column.key:
+                ids = cache.ids_by_name(names)
+            else:
+                ids = dict(session.execute(select(name_column, id_column).where(name_column.in_(names))).all())
+            resolved = []
+            for row_number, record in candidates:
+                name = record.get(field_name)
+                if name is not None and name not in ids:
+                    errors.append(ImportRowError(row_number, message.format(value=name)))
+                    continue
+                if name is not None:
+                    record[field_name] = ids[name]
+                resolved.append((row_number, record))
+            candidates = resolved
+
+        # Check required and unique fields for the whole chunk with one query, earlier
+        # chunks are already committed so duplicates across chunks are caught too
+        invalid = set()
+        for error in self.manager.validate_many([record for _, record in candidates], session=session):
+            errors.append(ImportRowError(candidates[error.index][0], str(error)))
+            invalid.add(error.index)
+        candidates = [candidate for index, candidate in enumerate(candidates) if index not in invalid]
+
+        errors.sort(key=lambda error: error.row_number)
+        return candidates, errors
+
+    def insert_chunk(self, session: Session, records: list[tuple[int, dict]], errors: list[ImportRowError]) -> list[int]:
+        """
+        Inserts the validated records of one chunk in a single transaction, returning their ids.
+
+        If the database rejects the chunk, because another client wrote a conflicting row
+        after validation, the records are inserted again one by one in savepoints, so only
+        the conflicting rows are reported and the rest are still imported.
+        """
+        if not records:
+            return []
+        table = self.model.__table__
+        try:
+            # Core insert on the table keeps the whole chunk in one executemany
+            statement = insert(table).returning(table.c.id)
+            ids = list(session.execute(statement, [record for _, record in records]).scalars())
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            ids = self.insert_rows(session, records, errors)
+        self.manager.emit_change(ChangeEvent.INSERT, ids)
+        return ids
+
+    def insert_rows(self, session: Session, records: list[tuple[int, dict]], errors: list[ImportRowError]) -> list[int]:
+        """
+        Inserts records one by one in one transaction, reporting the rows the database rejects.
+        """
+        table = self.model.__table__
+        ids = []
+        for row_number, record in records:
+            try:
+                with session.begin_nested():
+                    ids.append(session.execute(insert(table).returning(table.c.id), record).scalar_one())
+            except IntegrityError as e:
+                errors.append(ImportRowError(row_number, f"Rejected by the database: {e.orig}"))
+        session.commit()
+        errors.sort(key=lambda error: error.row_number)
+        return ids
+
+    def to_record(self, raw: dict) -> dict:
+        record = {}
+        for header, value in raw.items():
+            field_name = self.headers.get((header or "").strip().lower())
+            if field_name is None or field_name == "id":
+                continue
+            if value is not None:
+                value = str(value).strip() or None
+            record[field_name] = value
+        return record
@@ -1,24 +1,731 @@
-from typing import Any, Dict
-from sqlalchemy.orm import Session
+import copy
+import datetime
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Dict, Iterator
+from sqlalchemy import Select, String, and_, cast, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session, joinedload
 from db_classes import *
+from db_metrics import instrumented
+from db_schema import ModelSchema, get_schema
+
+logger = logging.getLogger(__name__)
 
 class ValidationError(Exception):
-    pass
+    def __init__(self, message: str = "", field: str = None, index: int = None):
+        super().__init__(message)
+        self.field = field
+        self.index = index
+
+
+class BatchValidationError(ValidationError):
+    """
+    Raised when validation finds more than one violation, the message lists all of them.
+    """
+
+    def __init__(self, errors: list[ValidationError]):
+        super().__init__("\n".join(str(error) for error in errors))
+        self.errors = errors
+
+
+class ConflictError(ValidationError):
+    """
+    Raised when an update requires a version of a row that is no longer current, because
+    someone else changed or deleted the row since it was read.
+    """
+
+    def __init__(self, message: str, current_version: int = None):
+        super().__init__(message)
+        self.current_version = current_version
+
+
+def raise_errors(errors: list[ValidationError]):
+    """
+    Raises the only error of a list, or a BatchValidationError if there are several.
+    """
+    if len(errors) == 1:
+        raise errors[0]
+    if errors:
+        raise BatchValidationError(errors)
+
+
+def get_value(obj, field: str):
+    """
+    Reads a field from a model instance or from a dictionary of field names to values.
+    """
+    if isinstance(obj, dict):
+        return obj.get(field)
+    return getattr(obj, field, None)
+
+
+class ChangeEvent:
+    """
+    Describes rows of one model that were inserted, updated or deleted by a manager.
 
-class BaseManager:
-    def __init__(self, session: Session, model: BaseBase):
-        self.session = session
+    ``rows`` maps each affected id to its new table row (see :meth:`BaseManager.query`)
+    and is empty for deletions. A ``reload`` event has no ids, any row may have changed.
+    """
+
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+    RELOAD = "reload"
+
+    def __init__(self, model, op: str, ids: list[int], rows: dict[int, tuple] = None):
         self.model = model
+        self.op = op
+        self.ids = ids
+        self.rows = rows or {}
+
+    def __repr__(self):
+        return f"ChangeEvent({self.model.__name__}, {self.op!r}, ids={self.ids!r})"
+
+
+class TableData:
+    """
+    A read-only table as a tuple of row tuples, with the headers and fields stored once.
+
+    Rows hold the values of ``fields`` in order, so a table costs one tuple per row instead
+    of an ORM object or a ``(field, value)`` pair per cell.
+    """
+
+    __slots__ = ("headers", "fields", "rows")
+
+    def __init__(self, headers: list[str], fields: list[str], rows: tuple[tuple, ...]):
+        self.headers = headers
+        self.fields = fields
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def column(self, field: str) -> list:
+        """
+        Returns the values of one field, by field name or header.
+        """
+        index = self.fields.index(field) if field in self.fields else self.headers.index(field)
+        return [row[index] for row in self.rows]
+
+    def pairs(self) -> Iterator[Iterator[tuple[str, Any]]]:
+        """
+        Yields every row as ``(field, value)`` pairs.
+        """
+        for row in self.rows:
+            yield zip(self.fields, row)
+
+
+# How far back each sync looks before its watermark, see BaseManager.table_changes
+SYNC_OVERLAP = datetime.timedelta(minutes=5)
 
-    def validate(self, obj):
-        # Check for unique constraints
-        unique_fields = get_unique_fields(self.model)
-        self.check_uniqueness(obj, unique_fields)
+# How long the tombstones of deleted rows are kept. Clients that last synced before that
+# get every row again, see BaseManager.table_changes
+DELETED_ROW_RETENTION = datetime.timedelta(days=30)
+
+# Seconds between two prunings of a table's old tombstones by one process
+PRUNE_INTERVAL = 3600.0
+
+# When each table's tombstones were last pruned, by time.monotonic()
+_last_pruned: Dict[str, float] = {}
+
+# The most rows refreshed one by one when the rows they refer to change, more reload the table
+REFERENCE_CHANGE_ROWS = 10_000
+
+
+class TableChanges:
+    """
+    The rows of a table changed since a sync watermark, see :meth:`BaseManager.table_changes`.
+
+    ``rows`` are table rows as :meth:`BaseManager.query` returns them. A ``full`` result
+    holds every row of the table instead, and ``deleted`` is empty, rows missing from it
+    were deleted.
+    """
+
+    def __init__(self, watermark: datetime.datetime, rows: list[tuple], deleted: list[int], full: bool = False):
+        self.watermark = watermark
+        self.rows = rows
+        self.deleted = deleted
+        self.full = full
+
+    def __repr__(self):
+        return f"TableChanges(watermark={self.watermark!r}, rows={len(self.rows)}, deleted={len(self.deleted)}, full={self.full})"
+
+
+class RowUpdates:
+    """
+    The outcome of :meth:`BaseManager.update_rows`. ``saved`` maps the ids of the saved rows
+    to their stored values with the new ``version``, ``errors`` maps the ids of the rows
+    that were not saved to their ValidationError or ConflictError.
+    """
+
+    def __init__(self):
+        self.saved: dict[int, dict] = {}
+        self.errors: dict[int, ValidationError] = {}
+
+    def __repr__(self):
+        return f"RowUpdates(saved={len(self.saved)}, errors={len(self.errors)})"
+
+
+class ReferenceCache:
+    """
+    A process-wide in-memory copy of a small lookup table of one database, indexed by id
+    and by name.
+
+    The whole table is loaded on first use and served from memory afterwards. Writes made
+    through the table's manager invalidate it. Changes made by other clients are noticed by
+    a version check, run at most every ``check_interval`` seconds and whenever a lookup
+    misses. The check compares the row count and highest id, which change with inserts and
+    deletes, and the sum of the row versions and latest ``updated_at``, which change with
+    every update. On PostgreSQL, remote updates also invalidate it
+    through the change notifications (see db_notify).
+
+    Cached objects are detached and shared between threads, they must not be modified.
+    """
+
+    def __init__(self, model, name_field: str, session_factory: Callable[[], Session], check_interval: float = 5.0):
+        self.model = model
+        self.name_field = name_field
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.by_id: Dict[int, Any] = None
+        self.by_name: Dict[str, Any] = {}
+        self.version = None
+        self.checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.version_checks = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit, miss, load and version check counters.
+        """
+        return {"hits": self.hits, "misses": self.misses, "loads": self.loads, "version_checks": self.version_checks}
+
+    def invalidate(self):
+        """
+        Drops the cached rows, the next lookup loads the table again.
+        """
+        with self.lock:
+            self.by_id = None
+
+    @instrumented
+    def refresh(self, force_check: bool = False) -> Dict[int, Any]:
+        """
+        Returns the rows by id, loading the table if it is not cached or its version changed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.by_id is not None and not force_check and now - self.checked < self.check_interval:
+                self.hits += 1
+                return self.by_id
+            with self.session_factory() as session:
+                version = tuple(
+                    session.query(
+                        func.count(self.model.id), func.max(self.model.id), func.sum(self.model.version), func.max(self.model.updated_at)
+                    ).one()
+                )
+                self.version_checks += 1
+                self.checked = now
+                if self.by_id is not None and version == self.version:
+                    self.hits += 1
+                    return self.by_id
+                self.misses += 1
+                self.loads += 1
+                objs = session.query(self.model).all()
+            self.by_id = {obj.id: obj for obj in objs}
+            self.by_name = {getattr(obj, self.name_field): obj for obj in objs}
+            self.version = version
+            return self.by_id
+
+    def get(self, obj_id: int):
+        obj = self.refresh().get(obj_id)
+        if obj is None and obj_id is not None:
+            # The row may have been added by another client since the last version check
+            obj = self.refresh(force_check=True).get(obj_id)
+        return obj
+
+    def get_all(self) -> list:
+        return list(self.refresh().values())
+
+    def get_by_name(self, name: str):
+        self.ids_by_name([name])
+        return self.by_name.get(name)
+
+    def ids_by_name(self, names) -> Dict[str, int]:
+        """
+        Maps the given names to ids, leaving out names that do not exist.
+        """
+        self.refresh()
+        names = set(names)
+        if not names <= self.by_name.keys():
+            self.refresh(force_check=True)
+        return {name: self.by_name[name].id for name in names if name in self.by_name}
+
+    def choices(self) -> list[tuple[int, str]]:
+        """
+        Returns the ``(id, name)`` pairs of every row, sorted by name.
+        """
+        return sorted(((obj.id, getattr(obj, self.name_field)) for obj in self.get_all()), key=lambda choice: choice[1])
 
-        # Check for nullable constraints
-        nullable_fields = get_nullable_fields(self.model)
-        self.check_nullables(obj, nullable_fields)
 
+# The caches by model and by the session factory of the database they copy
+REFERENCE_CACHES: Dict[tuple[type, Callable[[], Session]], ReferenceCache] = {}
+
+
+def get_reference_cache(model, session_factory: Callable[[], Session]) -> ReferenceCache:
+    """
+    Returns the reference cache of a model in the database of ``session_factory``, or None
+    if the model is not cached there.
+    """
+    return REFERENCE_CACHES.get((model, session_factory))
+
+
+_current_unit_of_work: ContextVar["UnitOfWork"] = ContextVar("unit_of_work", default=None)
+
+
+def current_unit_of_work() -> "UnitOfWork":
+    """
+    Returns the unit of work open in the current thread or context, or None.
+    """
+    return _current_unit_of_work.get()
+
+
+class UnitOfWork:
+    """
+    Runs the writes of every manager in one transaction that is committed once at the end.
+
+    While a unit of work is open, managers use its session in the opening thread. Their
+    writes are flushed instead of committed, so new objects get their ids right away. Their
+    change events are held back until the commit and dropped on rollback. Leaving the block
+    with an exception rolls everything back.
+
+    Use :meth:`savepoint` to let part of the work fail without losing the rest::
+
+        with unit_of_work() as work:
+            DEVICE_TYPE_MANAGER.add(device_type)
+            try:
+                with work.savepoint():
+                    AREA_CODE_MANAGER.add(area_code)
+            except ValidationError:
+                pass  # The device type is still committed
+    """
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self.session: Session = None
+        self.changes: list[tuple["BaseManager", str, list[int]]] = []
+        self._token = None
+
+    def __enter__(self) -> "UnitOfWork":
+        if current_unit_of_work() is not None:
+            raise RuntimeError("A unit of work is already open, use its savepoint() to nest work.")
+        self.session = self.session_factory()
+        self._token = _current_unit_of_work.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_unit_of_work.reset(self._token)
+        try:
+            if exc_type is not None:
+                self.session.rollback()
+                return False
+            try:
+                self.session.commit()
+            except Exception:
+                self.session.rollback()
+                raise
+        finally:
+            self.session.close()
+        self.publish_changes()
+        return False
+
+    @contextmanager
+    def savepoint(self) -> Iterator["UnitOfWork"]:
+        """
+        Runs part of the work in a savepoint, which is rolled back on its own if the block
+        raises. The exception is re-raised for the caller to handle.
+        """
+        # Events of the savepoint may have been merged into the last event before it
+        mark = len(self.changes)
+        merged_mark = len(self.changes[-1][2]) if self.changes else 0
+        nested = self.session.begin_nested()
+        try:
+            yield self
+        except BaseException:
+            nested.rollback()
+            del self.changes[mark:]
+            if mark:
+                del self.changes[mark - 1][2][merged_mark:]
+            raise
+        else:
+            nested.commit()
+
+    def defer_change(self, manager: "BaseManager", op: str, ids: list[int]):
+        # Merge consecutive events of the same kind, so a loop of adds publishes one event
+        if self.changes and self.changes[-1][:2] == (manager, op):
+            self.changes[-1][2].extend(ids)
+        else:
+            self.changes.append((manager, op, list(ids)))
+
+    def publish_changes(self):
+        changes, self.changes = self.changes, []
+        for manager, op, ids in changes:
+            manager.emit_change(op, ids)
+
+
+class TableManager:
+    """
+    The table operations the tables, dialogs, imports and exports use, shared by managers
+    of a database, see :class:`BaseManager`, and of the service, see
+    :class:`service_client.RemoteManager`.
+
+    This class keeps the model's schema, its table columns and the change listeners.
+    Subclasses read and write the rows with ``get``, ``get_all``, ``validate``, ``add``,
+    ``update``, ``update_rows``, ``update_many``, ``delete``, ``delete_many`` and
+    ``duplicate_many``, and show them with ``query``, ``count``, ``get_rows``,
+    ``stream_rows``, ``table_data``, ``get_versioned_row``, ``get_versions``,
+    ``related_choices`` and ``table_changes``, as :class:`BaseManager` does.
+    """
+
+    # Foreign key fields mapped to the name column of the row they refer to. Tables show,
+    # search and sort these fields by that name, joined in the same query as the rows.
+    related_names: Dict[str, Any] = {}
+
+    def __init__(self, model: BaseBase):
+        self.model = model
+        self.schema: ModelSchema = get_schema(model)
+        self.listeners: list[Callable[[ChangeEvent], None]] = []
+        # Managers whose rows refer to this manager's rows, see follow_references
+        self.referencing_managers: list["TableManager"] = []
+
+    def subscribe(self, listener: Callable[[ChangeEvent], None]):
+        """
+        Registers a callback that receives a :class:`ChangeEvent` after every committed write.
+        """
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[ChangeEvent], None]):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def emit_change(self, op: str, ids: list[int]):
+        """
+        Notifies the listeners of a committed write, fetching the new rows with one query.
+        """
+        self.publish_change(op, ids)
+
+    def publish_change(self, op: str, ids: list[int]):
+        if self.listeners and (ids or op == ChangeEvent.RELOAD):
+            rows = {}
+            if op in (ChangeEvent.INSERT, ChangeEvent.UPDATE):
+                rows = {row[0]: row for row in self.get_rows(ids)}
+            event = ChangeEvent(self.model, op, list(ids), rows)
+            for listener in list(self.listeners):
+                listener(event)
+        if op == ChangeEvent.UPDATE and ids:
+            for manager in self.referencing_managers:
+                manager.references_changed(self.model, ids)
+
+    def follow_references(self, *managers: "TableManager"):
+        """
+        Reports changes of the rows that ``related_names`` refer to, managed by ``managers``,
+        as updates of this manager's rows that refer to them, whose table rows show their
+        names. Updating a referenced row updates the rows that refer to it, and deleting one
+        updates the rows whose foreign keys were set to NULL.
+        """
+        for manager in managers:
+            if self not in manager.referencing_managers:
+                manager.referencing_managers.append(self)
+
+    def references_changed(self, model, obj_ids):
+        """
+        Reports that rows of ``model`` that this manager's rows may refer to were updated or
+        deleted. Without a way to find the rows that refer to them, every row is reloaded.
+        """
+        if self.listeners:
+            self.emit_change(ChangeEvent.RELOAD, [])
+
+    def convert(self, data: dict) -> dict:
+        """
+        Converts a dictionary keyed by labels or field names, with values entered as text,
+        to field names and typed values ready to be set on the model.
+
+        Raises:
+            ValidationError: If a value cannot be converted to its column's type, or
+                BatchValidationError if several cannot.
+        """
+        converted = {}
+        errors = []
+        for key, value in data.items():
+            field_name = self.schema.to_field(key)
+            try:
+                converted[field_name] = self.schema.convert(field_name, value)
+            except ValueError as e:
+                errors.append(ValidationError(str(e), field=field_name))
+        if errors:
+            raise errors[0] if len(errors) == 1 else BatchValidationError(errors)
+        return converted
+
+    def find_nullable_violations(self, objs: list, nullable_fields: Dict[str, str]) -> list[ValidationError]:
+        """
+        Finds missing values for non-nullable fields, treating blank strings as missing.
+
+        Args:
+            objs (list): Model instances, or dictionaries of field names to values.
+            nullable_fields (Dict[str, str]): A dictionary of field names to error messages.
+
+        Returns:
+            list[ValidationError]: The violations, each with the ``index`` of its object in ``objs``.
+        """
+        errors = []
+        for index, obj in enumerate(objs):
+            for field, message in nullable_fields.items():
+                field_value = get_value(obj, field)
+                if field_value is None or (isinstance(field_value, str) and not field_value.strip()):
+                    errors.append(ValidationError(message, field=field, index=index))
+        return errors
+
+    def display_column(self, field_name: str):
+        """
+        Returns the table column a field is shown as, the related name for fields in
+        ``related_names``. These are plain Core columns, so table reads bypass the ORM.
+        """
+        attribute = self.related_names.get(field_name, getattr(self.model, field_name))
+        return attribute.class_.__table__.c[attribute.key]
+
+    def table_columns(self):
+        """
+        Returns the columns that make up one table row, in ``_fields`` order.
+        """
+        return [self.display_column(field) for field in self.schema.fields]
+
+
+class BaseManager(TableManager):
+    """
+    Reads and writes one model, opening a short-lived session for every operation.
+
+    Managers hold no session of their own, so a single manager can be used from several
+    threads at once. :meth:`with_session` binds a copy to a caller's session, to run
+    several operations in one transaction.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], model: BaseBase):
+        super().__init__(model)
+        self.session_factory = session_factory
+        self.session: Session = None
+
+    def with_session(self, session: Session) -> "BaseManager":
+        """
+        Returns a copy of this manager bound to another session, sharing its listeners.
+        """
+        manager = copy.copy(self)
+        manager.session = session
+        return manager
+
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """
+        Provides the session for one unit of work: the bound session if there is one,
+        otherwise a new session that is rolled back on error and closed afterwards.
+        """
+        if self.session is not None:
+            yield self.session
+            return
+        work = current_unit_of_work()
+        if work is not None:
+            yield work.session
+            return
+        session = self.session_factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def batch(self) -> ContextManager[UnitOfWork]:
+        """
+        Opens a :class:`UnitOfWork` on this manager's database, for use in a ``with`` block.
+        The unit of work covers every manager, not just this one. Inside an open unit of
+        work, it opens a savepoint instead.
+        """
+        work = current_unit_of_work()
+        if work is not None:
+            return work.savepoint()
+        return UnitOfWork(self.session_factory)
+
+    def commit(self, session: Session):
+        """
+        Commits a write, or only flushes it while a unit of work is open.
+        """
+        work = current_unit_of_work()
+        if work is not None and work.session is session:
+            session.flush()
+        else:
+            session.commit()
+
+    def emit_change(self, op: str, ids: list[int]):
+        """
+        Notifies the listeners of a committed write, see :meth:`TableManager.emit_change`.
+        While a unit of work is open, the notification waits for it to commit.
+        """
+        work = current_unit_of_work()
+        if work is not None and self.session is None:
+            work.defer_change(self, op, ids)
+            return
+        self.publish_change(op, ids)
+
+    def referencing_ids(self, model, obj_ids, session: Session = None) -> list[int]:
+        """
+        Returns the ids of the rows whose foreign keys in ``related_names`` refer to rows of ``model``.
+        """
+        table = self.model.__table__
+        fields = [field for field, name_column in self.related_names.items() if name_column.class_ is model]
+        if not fields or not obj_ids:
+            return []
+        statement = select(table.c.id).where(or_(*(table.c[field].in_(list(obj_ids)) for field in fields)))
+        with self.session_scope() if session is None else nullcontext(session) as session:
+            return list(session.execute(statement).scalars())
+
+    def references_changed(self, model, obj_ids):
+        """
+        Reports the rows that refer to the updated rows of ``model`` as updated.
+        """
+        if self.listeners:
+            self.emit_reference_change(self.referencing_ids(model, obj_ids))
+
+    def emit_reference_change(self, obj_ids: list[int]):
+        # Refreshing a large part of the table costs more than reloading it
+        if len(obj_ids) > REFERENCE_CHANGE_ROWS:
+            self.emit_change(ChangeEvent.RELOAD, [])
+        else:
+            self.emit_change(ChangeEvent.UPDATE, obj_ids)
+
+    def find_referencing_rows(self, session: Session, obj_ids: list[int]) -> dict["BaseManager", list[int]]:
+        """
+        Finds the rows of the referencing managers with listeners that refer to rows about
+        to be deleted, whose foreign keys the delete sets to NULL.
+        """
+        return {
+            manager: manager.referencing_ids(self.model, obj_ids, session)
+            for manager in self.referencing_managers
+            if manager.listeners
+        }
+
+    @instrumented
+    def validate(self, obj, session: Session = None):
+        """
+        Validates a single object with one query.
+
+        Raises:
+            ValidationError: If a constraint is violated, or BatchValidationError if several are.
+        """
+        raise_errors(self.validate_many([obj], session=session))
+
+    @instrumented
+    def validate_many(self, objs: list, session: Session = None) -> list[ValidationError]:
+        """
+        Validates a batch of objects against the model's unique and non-nullable constraints.
+
+        Uniqueness is checked against the database for the whole batch in a single query,
+        and against the other objects of the batch itself. Every violation is returned
+        rather than stopping at the first one.
+
+        Args:
+            objs (list): Model instances, or dictionaries of field names to values.
+            session (Session): The session to query with, defaults to a new one.
+
+        Returns:
+            list[ValidationError]: The violations, each with the ``index`` of its object in ``objs``.
+        """
+        errors = self.find_nullable_violations(objs, self.schema.nullable_fields)
+        errors.extend(self.find_reference_violations(objs, session=session))
+        errors.extend(self.find_unique_violations(objs, self.schema.unique_fields, session=session))
+        errors.sort(key=lambda error: error.index)
+        return errors
+
+    def find_unique_violations(self, objs: list, unique_fields: Dict[str, str], session: Session = None) -> list[ValidationError]:
+        """
+        Finds uniqueness violations for a batch of objects with one query.
+
+        Args:
+            objs (list): Model instances, or dictionaries of field names to values.
+            unique_fields (Dict[str, str]): A dictionary of field names to error messages.
+            session (Session): The session to query with, defaults to a new one.
+
+        Returns:
+            list[ValidationError]: The violations, each with the ``index`` of its object in ``objs``.
+        """
+        values = {field: {get_value(obj, field) for obj in objs} - {None} for field in unique_fields}
+        clauses = [getattr(self.model, field).in_(field_values) for field, field_values in values.items() if field_values]
+        if not clauses:
+            return []
+
+        # Map each taken value to the ids of the rows holding it
+        existing = {field: {} for field in unique_fields}
+        scope = self.session_scope() if session is None else nullcontext(session)
+        with scope as session, session.no_autoflush:
+            rows = session.query(self.model.id, *(getattr(self.model, field) for field in unique_fields)).filter(or_(*clauses))
+            for row in rows:
+                for field, value in zip(unique_fields, row[1:]):
+                    existing[field].setdefault(value, set()).add(row[0])
+
+        errors = []
+        seen = {field: set() for field in unique_fields}
+        for index, obj in enumerate(objs):
+            obj_id = get_value(obj, "id")
+            for field, message in unique_fields.items():
+                value = get_value(obj, field)
+                if value is None:
+                    continue
+                if existing[field].get(value, set()) - {obj_id} or value in seen[field]:
+                    errors.append(ValidationError(message.format(value=value), field=field, index=index))
+                seen[field].add(value)
+        return errors
+
+    def find_reference_violations(self, objs: list, session: Session = None) -> list[ValidationError]:
+        """
+        Finds foreign keys in ``related_names`` that refer to missing rows, for the models
+        that have a reference cache. The check is served from memory, ids the cache does not
+        know are looked up in ``session``, which may hold rows that are not committed yet.
+
+        Args:
+            objs (list): Model instances, or dictionaries of field names to values.
+            session (Session): The session to look up unknown ids in, defaults to a new one.
+
+        Returns:
+            list[ValidationError]: The violations, each with the ``index`` of its object in ``objs``.
+        """
+        errors = []
+        for field, name_column in self.related_names.items():
+            cache = get_reference_cache(name_column.class_, self.session_factory)
+            if cache is None:
+                continue
+            unknown = {get_value(obj, field) for obj in objs} - {None}
+            unknown = {obj_id for obj_id in unknown if cache.get(obj_id) is None}
+            if unknown:
+                related = name_column.class_.__table__
+                scope = self.session_scope() if session is None else nullcontext(session)
+                with scope as lookup_session:
+                    unknown -= set(lookup_session.execute(select(related.c.id).where(related.c.id.in_(unknown))).scalars())
+            message = f"{self.schema.field_to_label[field]} does not exist."
+            for index, obj in enumerate(objs):
+                if get_value(obj, field) in unknown:
+                    errors.append(ValidationError(message, field=field, index=index))
+        return errors
+
+    @instrumented
     def check_uniqueness(self, obj, unique_fields: Dict[str, str]):
         """
         Checks for uniqueness constraints on the model's fields.
@@ -30,21 +737,9 @@ class BaseManager:
         Raises:
             ValidationError: If a uniqueness constraint is violated.
         """
-        with self.session.no_autoflush:
-            for field, message in unique_fields.items():
-                field_value = getattr(obj, field)
-                if obj.id:
-                    existing = self.session.query(self.model).filter(
-                        getattr(self.model, field) == field_value, 
-                        self.model.id != obj.id
-                    ).first()
-                else:
-                    existing = self.session.query(self.model).filter(
-                        getattr(self.model, field) == field_value
-                    ).first()
-                
-                if existing:
-                    raise ValidationError(message.format(value=field_value))
+        errors = self.find_unique_violations([obj], unique_fields)
+        if errors:
+            raise errors[0]
 
     def check_nullables(self, obj, nullable_fields: Dict[str, str]):
         """
@@ -57,60 +752,592 @@ class BaseManager:
         Raises:
             ValidationError: If a non-nullable constraint is violated.
         """
-        for field, message in nullable_fields.items():
-            field_value = getattr(obj, field)
-            if field_value is None or (isinstance(field_value, str) and not field_value.strip()):
-                raise ValidationError(message)
+        errors = self.find_nullable_violations([obj], nullable_fields)
+        if errors:
+            raise errors[0]
 
+    @instrumented
     def add(self, obj):
-        self.validate(obj)
-        self.session.add(obj)
-        self.session.commit()
+        with self.session_scope() as session:
+            self.validate(obj, session=session)
+            session.add(obj)
+            self.commit(session)
+        self.emit_change(ChangeEvent.INSERT, [obj.id])
         return obj
 
+    def load_options(self) -> list:
+        """
+        Returns the loader options that eager-load the model's many-to-one relationships,
+        so returned objects can be read after their session closes without a query per row.
+        """
+        return [joinedload(getattr(self.model, key)) for key in self.schema.many_to_one]
+
+    @instrumented
     def get(self, obj_id):
-        return self.session.query(self.model).get(obj_id)
+        with self.session_scope() as session:
+            return session.get(self.model, obj_id, options=self.load_options())
 
+    @instrumented
     def get_all(self):
-        return self.session.query(self.model).all()
+        with self.session_scope() as session:
+            return session.query(self.model).options(*self.load_options()).all()
 
-    def update(self, obj_id, updates: dict):
-        print("updates dict:", updates)
-        obj = self.session.query(self.model).get(obj_id)
-        if obj:
-            for key, value in updates.items():
-                if key in self.model._fields_map:
-                    field_name = self.model._fields_map.get(key)
-                else:
-                    field_name = key
-                if getattr(obj, field_name) == value:
+    @instrumented
+    def update(self, obj_id, updates: dict, version: int = None) -> dict:
+        """
+        Updates one row with a single ``UPDATE ... RETURNING`` of the given fields, without
+        loading the row first.
+
+        Only the given fields are validated, and the uniqueness query only runs when a unique
+        field is among them, so callers should pass just the fields that changed. Every update
+        increments the row's ``version``.
+
+        Args:
+            obj_id (int): The id of the row to update.
+            updates (dict): Labels or field names mapped to typed values.
+            version (int): The version the caller read the row at. The update only applies
+                if the row still has it, None updates whatever the current version is.
+
+        Returns:
+            dict: The stored field values of the row after the update, foreign keys as ids,
+            with its new ``version``. None if the row does not exist and no version was given.
+
+        Raises:
+            ValidationError: If an updated field violates a constraint, or BatchValidationError if several do.
+            ConflictError: If the row no longer has ``version``, or was deleted.
+        """
+        updates = {self.schema.to_field(key): value for key, value in updates.items()}
+        with self.session_scope() as session:
+            if updates:
+                raise_errors(self.find_update_violations([dict(updates, id=obj_id)], session=session))
+                logger.debug("Updating %s of %s %s", ", ".join(updates), self.model.__name__, obj_id)
+            record = self.update_returning(session, obj_id, updates, version)
+            if record is None:
+                error = self.find_conflict(session, obj_id, version)
+                if error is not None:
+                    raise error
+                return None
+            self.commit(session)
+        if updates:
+            self.emit_change(ChangeEvent.UPDATE, [obj_id])
+        return record
+
+    @instrumented
+    def update_rows(self, changes: dict, versions: dict = None) -> RowUpdates:
+        """
+        Applies different field values to several rows in one transaction, for edits queued
+        by a write-behind client.
+
+        The batch is validated with one query per kind of check, then each valid row is
+        written with its own ``UPDATE ... RETURNING``. A row that fails validation or no
+        longer has its expected version is reported and left unchanged, the other rows
+        are still saved.
+
+        Args:
+            changes (dict): Row ids mapped to dictionaries of field names to typed values.
+            versions (dict): Row ids mapped to the version each was read at, rows without
+                one are updated whatever their current version is.
+
+        Returns:
+            RowUpdates: The saved rows and the errors of the rows that were not saved.
+        """
+        versions = versions or {}
+        result = RowUpdates()
+        records = [dict(updates, id=obj_id) for obj_id, updates in changes.items() if updates]
+        with self.session_scope() as session:
+            for error in self.find_update_violations(records, session=session):
+                result.errors.setdefault(records[error.index]["id"], error)
+            for record in records:
+                obj_id = record.pop("id")
+                if obj_id in result.errors:
                     continue
-                print(f"updating {field_name} to {value}")
-                setattr(obj, field_name, value)
-            self.validate(obj)
-            self.session.commit()
-        return obj
+                saved = self.update_returning(session, obj_id, record, versions.get(obj_id))
+                if saved is None:
+                    error = self.find_conflict(session, obj_id, versions.get(obj_id))
+                    result.errors[obj_id] = error or ConflictError(f"This {self.model.__name__} was deleted by someone else.")
+                else:
+                    result.saved[obj_id] = saved
+            if result.saved:
+                self.commit(session)
+        if result.saved:
+            self.emit_change(ChangeEvent.UPDATE, list(result.saved))
+        return result
 
+    def find_update_violations(self, records: list[dict], session: Session = None) -> list[ValidationError]:
+        """
+        Validates partial updates, dictionaries of a row's ``id`` and only the fields being
+        changed. Each record is only checked for the fields it holds, and the uniqueness
+        query only runs if some record changes a unique field.
+
+        Returns:
+            list[ValidationError]: The violations, each with the ``index`` of its record in ``records``.
+        """
+        errors = []
+        for index, record in enumerate(records):
+            nullable_fields = {field: message for field, message in self.schema.nullable_fields.items() if field in record}
+            for error in self.find_nullable_violations([record], nullable_fields):
+                error.index = index
+                errors.append(error)
+        errors.extend(self.find_reference_violations(records, session=session))
+        unique_fields = {
+            field: message for field, message in self.schema.unique_fields.items() if any(field in record for record in records)
+        }
+        if unique_fields:
+            errors.extend(self.find_unique_violations(records, unique_fields, session=session))
+        errors.sort(key=lambda error: error.index)
+        return errors
+
+    def update_returning(self, session: Session, obj_id: int, updates: dict, version: int = None) -> dict:
+        """
+        Writes field values to one row if it still has ``version``, and returns its stored
+        values with the new version, or None if no row matched. Empty ``updates`` only read
+        the row.
+        """
+        table = self.model.__table__
+        returned = [table.c[field] for field in self.schema.fields] + [table.c.version]
+        if updates:
+            statement = update(table).where(table.c.id == obj_id).values(updates)
+        else:
+            statement = select(table).where(table.c.id == obj_id)
+        if version is not None:
+            statement = statement.where(table.c.version == version)
+        if updates and session.get_bind().dialect.update_returning:
+            row = session.execute(statement.returning(*returned)).first()
+        elif updates and not session.execute(statement).rowcount:
+            row = None
+        else:
+            row = session.execute(select(*returned).where(table.c.id == obj_id)).first()
+        return dict(row._mapping) if row is not None else None
+
+    def find_conflict(self, session: Session, obj_id: int, version: int) -> ConflictError:
+        """
+        Returns the ConflictError for an update of ``version`` that matched no row, or None
+        if no version was required and the row simply does not exist.
+        """
+        table = self.model.__table__
+        current = session.execute(select(table.c.version).where(table.c.id == obj_id)).scalar()
+        if current is None and version is None:
+            return None
+        if current is None:
+            return ConflictError(f"This {self.model.__name__} was deleted by someone else.")
+        return ConflictError(
+            f"This {self.model.__name__} was changed by someone else since it was opened. Reopen it to see their changes.",
+            current_version=current,
+        )
+
+    @instrumented
+    def get_versions(self, obj_ids) -> dict:
+        """
+        Returns the current version of each of the given rows that exists, by id.
+        """
+        table = self.model.__table__
+        with self.session_scope() as session:
+            return dict(session.execute(select(table.c.id, table.c.version).where(table.c.id.in_(list(obj_ids)))).all())
+
+    @instrumented
+    def get_versioned_row(self, obj_id: int) -> tuple:
+        """
+        Fetches the table row of an id together with its version in one query, for editing
+        the row with :meth:`update`. Returns ``(row, version)``, or None if it does not exist.
+        """
+        table = self.model.__table__
+        statement = self.table_select(*self.table_columns(), table.c.version).where(table.c.id == obj_id)
+        with self.session_scope() as session:
+            row = session.execute(statement).first()
+        return (tuple(row[:-1]), row[-1]) if row is not None else None
+
+    @instrumented
     def delete(self, obj_id):
-        obj = self.session.query(self.model).get(obj_id)
+        """
+        Deletes one row, returning it as a detached object with its many-to-one related
+        objects, or None if it does not exist.
+        """
+        with self.session_scope() as session:
+            obj = session.get(self.model, obj_id, options=self.load_options())
+            if obj:
+                referencing = self.find_referencing_rows(session, [obj_id])
+                session.delete(obj)
+                self.record_deletions(session, [obj_id])
+                self.commit(session)
         if obj:
-            self.session.delete(obj)
-            self.session.commit()
+            self.emit_change(ChangeEvent.DELETE, [obj_id])
+            for manager, ids in referencing.items():
+                manager.emit_reference_change(ids)
         return obj
 
+    @instrumented
+    def get_records(self, obj_ids, session: Session = None) -> list[dict]:
+        """
+        Fetches the stored field values of rows as dictionaries, foreign keys as ids, ordered by id.
+        """
+        table = self.model.__table__
+        statement = select(*(table.c[field] for field in self.schema.fields)).where(table.c.id.in_(list(obj_ids)))
+        with self.session_scope() if session is None else nullcontext(session) as session:
+            return [dict(row._mapping) for row in session.execute(statement.order_by(table.c.id))]
+
+    def record_deletions(self, session: Session, obj_ids: list[int]):
+        """
+        Leaves a tombstone for each deleted row in the same transaction, see :meth:`table_changes`.
+        """
+        if obj_ids:
+            table_name = self.model.__tablename__
+            session.execute(insert(DeletedRow), [{"table_name": table_name, "row_id": obj_id} for obj_id in obj_ids])
+            self.prune_deleted_rows(session)
+
+    def prune_deleted_rows(self, session: Session):
+        """
+        Deletes the table's tombstones older than ``DELETED_ROW_RETENTION``, at most once every
+        ``PRUNE_INTERVAL`` seconds, so the tombstones do not grow forever.
+        """
+        table_name = self.model.__tablename__
+        if time.monotonic() - _last_pruned.get(table_name, -PRUNE_INTERVAL) < PRUNE_INTERVAL:
+            return
+        _last_pruned[table_name] = time.monotonic()
+        expired = session.execute(select(func.now())).scalar() - DELETED_ROW_RETENTION
+        session.execute(delete(DeletedRow).where(DeletedRow.table_name == table_name, DeletedRow.deleted_at < expired))
+
+    @instrumented
+    def delete_many(self, obj_ids) -> list[int]:
+        """
+        Deletes rows by id with a single DELETE in one transaction.
+
+        As :meth:`delete` does through the ORM, foreign keys of other tables that refer to the
+        deleted rows are set to NULL first, one UPDATE per referencing column, so rows still
+        referenced by a required key fail to delete with an IntegrityError. The rows whose keys
+        were set to NULL are reported as updated, see :meth:`follow_references`.
+
+        Returns:
+            list[int]: The ids of the rows that were deleted.
+        """
+        obj_ids = list(dict.fromkeys(obj_ids))
+        if not obj_ids:
+            return []
+        table = self.model.__table__
+        with self.session_scope() as session:
+            referencing = self.find_referencing_rows(session, obj_ids)
+            for column in self.schema.referencing_columns:
+                session.execute(update(column.table).where(column.in_(obj_ids)).values({column.name: None}))
+            statement = delete(table).where(table.c.id.in_(obj_ids))
+            if session.get_bind().dialect.delete_returning:
+                deleted = list(session.execute(statement.returning(table.c.id)).scalars())
+            else:
+                deleted = obj_ids if session.execute(statement).rowcount else []
+            self.record_deletions(session, deleted)
+            self.commit(session)
+        self.emit_change(ChangeEvent.DELETE, deleted)
+        for manager, ids in referencing.items():
+            manager.emit_reference_change(ids)
+        return deleted
+
+    @instrumented
+    def duplicate_many(self, obj_ids, suffix: str = " (copy)") -> list[int]:
+        """
+        Copies rows in one transaction, with one validation query and one multi-row INSERT.
+
+        Text values of unique fields get ``suffix`` appended so the copies can be stored.
+
+        Returns:
+            list[int]: The ids of the copies, in the order of the copied rows' ids.
+
+        Raises:
+            ValidationError: If a copy violates a constraint, or BatchValidationError if several do.
+        """
+        table = self.model.__table__
+        with self.session_scope() as session:
+            copies = []
+            for record in self.get_records(obj_ids, session=session):
+                values = {field: record[field] for field in self.schema.editable_fields}
+                for field in self.schema.unique_fields:
+                    if isinstance(values.get(field), str):
+                        values[field] += suffix
+                copies.append(values)
+            if not copies:
+                return []
+            raise_errors(self.validate_many(copies, session=session))
+            new_ids = list(session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), copies).scalars())
+            self.commit(session)
+        self.emit_change(ChangeEvent.INSERT, new_ids)
+        return new_ids
+
+    @instrumented
+    def update_many(self, obj_ids, updates: dict) -> list[int]:
+        """
+        Sets the same field values on several rows with one validation query and a single
+        UPDATE, in one transaction.
+
+        Args:
+            obj_ids (list[int]): The ids of the rows to update.
+            updates (dict): Labels or field names mapped to typed values.
+
+        Returns:
+            list[int]: The ids of the rows that were updated.
+
+        Raises:
+            ValidationError: If an updated row violates a constraint, or BatchValidationError if several do.
+        """
+        updates = {self.schema.to_field(key): value for key, value in updates.items()}
+        table = self.model.__table__
+        with self.session_scope() as session:
+            records = self.get_records(obj_ids, session=session)
+            if not records or not updates:
+                return []
+            for record in records:
+                record.update(updates)
+            raise_errors(self.validate_many(records, session=session))
+            updated = [record["id"] for record in records]
+            session.execute(update(table).where(table.c.id.in_(updated)).values(updates))
+            self.commit(session)
+        self.emit_change(ChangeEvent.UPDATE, updated)
+        return updated
+
+    @instrumented
     def filter(self, filter_func):
-        return self.session.query(self.model).filter(filter_func(self.model)).all()
+        with self.session_scope() as session:
+            return session.query(self.model).options(*self.load_options()).filter(filter_func(self.model)).all()
+
+    def table_select(self, *columns) -> Select:
+        """
+        Starts a Core select on the model's table that outer joins the tables of ``related_names``.
+        """
+        table = self.model.__table__
+        joined = table
+        for field_name, name_column in self.related_names.items():
+            related = name_column.class_.__table__
+            joined = joined.outerjoin(related, table.c[field_name] == related.c.id)
+        return select(*columns).select_from(joined)
+
+    @instrumented
+    def related_choices(self, field_name: str) -> list[tuple[int, str]]:
+        """
+        Returns the ``(id, name)`` pairs a foreign key field can refer to, sorted by name.
+        """
+        name_column = self.related_names[field_name]
+        cache = get_reference_cache(name_column.class_, self.session_factory)
+        if cache is not None and cache.name_field == name_column.key:
+            return cache.choices()
+        with self.session_scope() as session:
+            return [tuple(row) for row in session.query(name_column.class_.id, name_column).order_by(name_column)]
+
+    def resolve_column(self, name: str):
+        """
+        Resolves a human-readable label from ``_fields_map`` or a field name to its model column.
+
+        Raises:
+            ValueError: If the name does not refer to one of the model's fields.
+        """
+        field_name = self.schema.to_field(name)
+        if field_name not in self.schema.field_index:
+            raise ValueError(f"Unknown column '{name}' for {self.model.__name__}.")
+        return self.display_column(field_name)
+
+    def search_clause(self, search: str = None, column: str = None):
+        """
+        Builds a case-insensitive substring match of ``search`` against one column, or against
+        every column in ``_fields_map`` when no column is given. Returns None for an empty search.
+        """
+        term = (search or "").strip()
+        if not term:
+            return None
+        pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        if column:
+            columns = [self.resolve_column(column)]
+        else:
+            columns = [self.display_column(field) for field in self.schema.editable_fields]
+        clauses = []
+        for model_column in columns:
+            if not isinstance(model_column.type, String):
+                model_column = cast(model_column, String)
+            clauses.append(model_column.ilike(pattern, escape="\\"))
+        return or_(*clauses)
+
+    def equals_clause(self, equals: dict = None):
+        """
+        Builds an exact match of every label or field name in ``equals`` against its value,
+        compared with the value the table shows, so related fields match the name of the row
+        they refer to. Names are unique, so this is the same as matching the foreign key.
+        A value of None matches missing and empty values. Returns None without values.
+        """
+        clauses = []
+        for name, value in (equals or {}).items():
+            model_column = self.resolve_column(name)
+            if value is None:
+                clauses.append(or_(model_column.is_(None), model_column == "") if isinstance(model_column.type, String) else model_column.is_(None))
+            else:
+                clauses.append(model_column == value)
+        return and_(*clauses) if clauses else None
+
+    @instrumented
+    def query(
+        self,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        limit: int = None,
+        offset: int = None,
+        after_id: int = None,
+        equals: dict = None,
+    ) -> list[tuple]:
+        """
+        Runs a filtered, sorted and windowed table query as a single SQL statement.
+
+        Rows are plain tuples of the model's ``_fields`` values. Sorting happens on the column
+        itself, so numbers sort numerically, with ``id`` as a tie-breaker to keep pages stable.
+        When sorting by ``id`` (the default), ``after_id`` pages by keyset so a page costs the
+        same no matter how far the caller has scrolled.
+
+        Args:
+            search (str): Case-insensitive substring to match, ignored if empty.
+            column (str): The label or field name to search in, defaults to all columns.
+            sort_column (str): The label or field name to sort by, defaults to ``id``.
+            descending (bool): Whether to sort in descending order.
+            limit (int): The maximum number of rows to return.
+            offset (int): The number of matching rows to skip.
+            after_id (int): The last ``id`` of the previous page when sorting by ``id``.
+            equals (dict): Labels or field names mapped to the value they must show, see
+                :meth:`equals_clause`.
+
+        Returns:
+            list[tuple]: The matching rows.
+        """
+        statement = self.table_statement(search, column, sort_column, descending, limit, offset, after_id, equals)
+        with self.session_scope() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
+    def table_statement(
+        self,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        limit: int = None,
+        offset: int = None,
+        after_id: int = None,
+        equals: dict = None,
+    ) -> Select:
+        """
+        Builds the select statement of :meth:`query`, see there for the arguments.
+        """
+        id_column = self.model.__table__.c.id
+        statement = self.table_select(*self.table_columns())
+        for clause in (self.search_clause(search, column), self.equals_clause(equals)):
+            if clause is not None:
+                statement = statement.where(clause)
+        sort = self.resolve_column(sort_column) if sort_column else id_column
+        if sort is id_column:
+            if after_id is not None:
+                statement = statement.where(id_column < after_id if descending else id_column > after_id)
+            statement = statement.order_by(id_column.desc() if descending else id_column)
+        else:
+            statement = statement.order_by(sort.desc() if descending else sort, id_column)
+        if offset:
+            statement = statement.offset(offset)
+        if limit is not None:
+            statement = statement.limit(limit)
+        return statement
+
+    @instrumented
+    def table_data(self, search: str = None, column: str = None, sort_column: str = None, descending: bool = False, limit: int = None) -> "TableData":
+        """
+        Fetches a read-only table as :class:`TableData`, with the same filtering and sorting as
+        :meth:`query`. Only the displayed columns are selected, through Core, so no ORM objects
+        are built or tracked.
+        """
+        statement = self.table_statement(search, column, sort_column, descending, limit)
+        with self.session_scope() as session:
+            rows = tuple(map(tuple, session.execute(statement)))
+        return TableData(self.schema.labels, self.schema.fields, rows)
+
+    def stream_rows(
+        self,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        chunk_size: int = 1000,
+        equals: dict = None,
+    ) -> Iterator[list[tuple]]:
+        """
+        Streams the rows of :meth:`query` in chunks of at most ``chunk_size`` tuples.
 
+        The statement runs with ``stream_results``, so PostgreSQL reads it through a
+        server-side cursor and only one chunk is held in memory at a time, however many rows
+        match. The session stays open until the generator is exhausted or closed.
+        """
+        statement = self.table_statement(search, column, sort_column, descending, equals=equals)
+        statement = statement.execution_options(stream_results=True, yield_per=chunk_size)
+        with self.session_scope() as session:
+            for partition in session.execute(statement).partitions():
+                yield list(map(tuple, partition))
+
+    @instrumented
+    def table_changes(self, since: datetime.datetime = None) -> "TableChanges":
+        """
+        Fetches the table rows inserted or updated since a watermark, and the ids of the rows
+        deleted since then, for keeping a local copy of the table in sync.
+
+        Rows are matched on their ``updated_at`` and on the ``updated_at`` of the rows their
+        related names come from, so renaming a device type returns the equipment showing it.
+        Changes from ``SYNC_OVERLAP`` before the watermark are returned again, in case a
+        transaction that started earlier committed after the last sync. Applying a change
+        twice does no harm. A watermark older than ``DELETED_ROW_RETENTION`` may have missed
+        deletes whose tombstones were pruned, so it gets every row, as None does.
+
+        Args:
+            since (datetime): The watermark of the last sync, None fetches every row.
+
+        Returns:
+            TableChanges: The changes, with the watermark for the next sync.
+        """
+        table = self.model.__table__
+        with self.session_scope() as session:
+            # Taken before reading, so rows written while reading are fetched again next time
+            watermark = session.execute(select(func.now())).scalar()
+            statement = self.table_select(*self.table_columns()).order_by(table.c.id)
+            cutoff = since - SYNC_OVERLAP if since is not None else None
+            if cutoff is None or cutoff < watermark - DELETED_ROW_RETENTION:
+                return TableChanges(watermark, [tuple(row) for row in session.execute(statement)], [], full=True)
+            clauses = [table.c.updated_at > cutoff]
+            for field_name, name_column in self.related_names.items():
+                related = name_column.class_.__table__
+                renamed = session.execute(select(related.c.id).where(related.c.updated_at > cutoff)).scalars().all()
+                if renamed:
+                    clauses.append(table.c[field_name].in_(renamed))
+            rows = [tuple(row) for row in session.execute(statement.where(or_(*clauses)))]
+            deleted = session.execute(
+                select(DeletedRow.row_id).where(DeletedRow.table_name == table.name, DeletedRow.deleted_at > cutoff)
+            ).scalars().all()
+        return TableChanges(watermark, rows, list(dict.fromkeys(deleted)))
+
+    @instrumented
+    def count(self, search: str = None, column: str = None, equals: dict = None) -> int:
+        """
+        Counts the rows matching a search, see :meth:`query`.
+        """
+        table = self.model.__table__
+        clauses = [clause for clause in (self.search_clause(search, column), self.equals_clause(equals)) if clause is not None]
+        if not clauses:
+            statement = select(func.count(table.c.id)).select_from(table)
+        else:
+            statement = self.table_select(func.count(table.c.id)).where(*clauses)
+        with self.session_scope() as session:
+            return session.execute(statement).scalar()
+
+    @instrumented
+    def get_rows(self, obj_ids) -> list[tuple]:
+        """
+        Fetches the table rows for the given ids in a single query, in no particular order.
+        """
+        if not obj_ids:
+            return []
+        statement = self.table_select(*self.table_columns()).where(self.model.__table__.c.id.in_(list(obj_ids)))
+        with self.session_scope() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
+    @instrumented
     def create_pairs_for_table(self) -> list[tuple[str, Any]]:
-        # first get all all data
-        data = self.get_all()
-        # get the fields
-        fields = self.model._fields
-        # create the pairs by iterating through the fields and using getattr to get the value
-        rows = []
-        for entry in data:
-            rows.append([(field, getattr(entry, field)) for field in fields])
-        return rows
+        # Kept for callers that expect (field, value) pairs, table_data() is the compact form
+        return [list(row) for row in self.table_data().pairs()]
 
 def get_unique_fields(model):
     """
@@ -122,17 +1349,7 @@ def get_unique_fields(model):
     Returns:
         Dict[str, str]: A dictionary mapping field names to error messages.
     """
-    unique_fields = {}
-    for field_name, column in model.__table__.columns.items():
-        if column.unique:
-            human_readable_name = None
-            for human_readable, mapped_field in model._fields_map.items():
-                if mapped_field == field_name:
-                    human_readable_name = human_readable
-                    break
-            if human_readable_name:
-                unique_fields[field_name] = f"{human_readable_name} with value '{{value}}' already exists."
-    return unique_fields
+    return get_schema(model).unique_fields
 
 def get_nullable_fields(model):
     """
@@ -144,26 +1361,64 @@ def get_nullable_fields(model):
     Returns:
         Dict[str, str]: A dictionary mapping field names to error messages.
     """
-    nullable_fields = {}
-    for field_name, column in model.__table__.columns.items():
-        if not column.nullable:
-            human_readable_name = None
-            for human_readable, mapped_field in model._fields_map.items():
-                if mapped_field == field_name:
-                    human_readable_name = human_readable
-                    break
-            if human_readable_name:
-                nullable_fields[field_name] = f"{human_readable_name} is required."
-    return nullable_fields
+    return get_schema(model).nullable_fields
 
 class EquipmentManager(BaseManager):
-    def __init__(self, session: Session):
-        super().__init__(session, Equipment)
+    related_names = {
+        "device_type_id": DeviceType.device_type,
+        "area_code_id": AreaCode.area_code,
+    }
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        super().__init__(session_factory, Equipment)
+
+class ReferenceManager(BaseManager):
+    """
+    Manages a small lookup table, serving ``get``, ``get_all`` and lookups by name from the
+    process-wide :class:`ReferenceCache` of the model, shared by the managers with the same
+    ``session_factory``. Managers bound to a session with :meth:`with_session` read from the
+    database, so they see their own transaction.
+    """
+
+    # The field that names a row, e.g. the device type of a DeviceType
+    name_field: str = None
+
+    def __init__(self, session_factory: Callable[[], Session], model: BaseBase):
+        super().__init__(session_factory, model)
+        key = (model, session_factory)
+        if key not in REFERENCE_CACHES:
+            REFERENCE_CACHES[key] = ReferenceCache(model, self.name_field, session_factory)
+        self.cache = REFERENCE_CACHES[key]
+
+    @instrumented
+    def get(self, obj_id):
+        if self.session is not None:
+            return super().get(obj_id)
+        return self.cache.get(obj_id)
+
+    @instrumented
+    def get_all(self):
+        if self.session is not None:
+            return super().get_all()
+        return self.cache.get_all()
+
+    @instrumented
+    def get_by_name(self, name: str):
+        return self.cache.get_by_name(name)
+
+    def publish_change(self, op: str, ids: list[int]):
+        # Local writes and remote notifications both pass through here
+        self.cache.invalidate()
+        super().publish_change(op, ids)
+
+class DeviceTypeManager(ReferenceManager):
+    name_field = "device_type"
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        super().__init__(session_factory, DeviceType)
 
-class DeviceTypeManager(BaseManager):
-    def __init__(self, session: Session):
-        super().__init__(session, DeviceType)
+class AreaCodeManager(ReferenceManager):
+    name_field = "area_code"
 
-class AreaCodeManager(BaseManager):
-    def __init__(self, session: Session):
-        super().__init__(session, AreaCode)
+    def __init__(self, session_factory: Callable[[], Session]):
+        super().__init__(session_factory, AreaCode)
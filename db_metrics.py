@@ -0,0 +1,236 @@
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements run outside of any tracked operation are counted under this name
+UNTRACKED = "(untracked)"
+
+# Longest statement text kept in the slow query log
+MAX_STATEMENT_LENGTH = 2000
+
+_current_operation: ContextVar[str] = ContextVar("metrics_operation", default=None)
+
+
+class OperationStats:
+    """
+    Totals of one tracked operation, such as ``EquipmentManager.update``.
+
+    Wall time covers the whole operation including nested operations, while statements
+    are counted for the innermost operation that ran them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.statements = 0
+        self.statement_ms = 0.0
+        self.rows = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    @property
+    def statements_per_call(self) -> float:
+        # A count that grows with the data is the mark of an N+1 query pattern
+        return self.statements / self.calls if self.calls else float(self.statements)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.mean_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "statements": self.statements,
+            "statements_per_call": round(self.statements_per_call, 2),
+            "statement_ms": round(self.statement_ms, 3),
+            "rows": self.rows,
+        }
+
+
+class SlowQuery:
+    def __init__(self, operation: str, statement: str, duration_ms: float, rows: int):
+        self.timestamp = time.time()
+        self.operation = operation
+        self.statement = statement
+        self.duration_ms = duration_ms
+        self.rows = rows
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "operation": self.operation,
+            "statement": self.statement,
+            "duration_ms": round(self.duration_ms, 3),
+            "rows": self.rows,
+        }
+
+
+class QueryMetrics:
+    """
+    Counts and times the statements of instrumented engines and the operations that run them.
+
+    Operations are named by :func:`instrumented` methods or :meth:`operation` blocks. The
+    current operation is tracked per thread, so operations running side by side on the
+    database executor each get their own statements. Statements slower than ``slow_query_ms`` are kept in a
+    bounded log and logged as warnings. Parameters are never recorded.
+
+    Args:
+        slow_query_ms (float): The duration from which a statement counts as slow, 0 disables the log.
+        slow_log_size (int): The number of slow statements kept, the oldest are dropped first.
+    """
+
+    def __init__(self, slow_query_ms: float = 200.0, slow_log_size: int = 100):
+        self.slow_query_ms = slow_query_ms
+        self.lock = threading.Lock()
+        self.operations: dict[str, OperationStats] = {}
+        self.slow_queries: deque[SlowQuery] = deque(maxlen=slow_log_size)
+        self.started = time.time()
+
+    def _stats(self, name: str) -> OperationStats:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats(name)
+        return stats
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[None]:
+        """
+        Tracks the block as one call of the operation ``name``.
+        """
+        token = _current_operation.set(name)
+        started = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_operation.reset(token)
+            self.record_call(name, (time.perf_counter() - started) * 1000, failed=failed)
+
+    def record_call(self, name: str, duration_ms: float, failed: bool = False):
+        with self.lock:
+            stats = self._stats(name)
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_ms += duration_ms
+            stats.max_ms = max(stats.max_ms, duration_ms)
+
+    def record_rows(self, name: str, rows: int):
+        with self.lock:
+            self._stats(name).rows += rows
+
+    def record_statement(self, statement: str, duration_ms: float, rows: int = None):
+        """
+        Records one executed statement for the current operation. Statements outside of any
+        operation count as one call each of ``(untracked)``.
+
+        Args:
+            statement (str): The SQL text.
+            duration_ms (float): The execution time, not including fetching the rows.
+            rows (int): The rows affected, if the driver reports them.
+        """
+        name = _current_operation.get() or UNTRACKED
+        with self.lock:
+            stats = self._stats(name)
+            stats.statements += 1
+            stats.statement_ms += duration_ms
+            if name == UNTRACKED:
+                stats.calls += 1
+                stats.total_ms += duration_ms
+                stats.max_ms = max(stats.max_ms, duration_ms)
+            slow = self.slow_query_ms and duration_ms >= self.slow_query_ms
+            if slow:
+                self.slow_queries.append(SlowQuery(name, statement[:MAX_STATEMENT_LENGTH], duration_ms, rows))
+        if slow:
+            logger.warning("Slow query in %s took %.1f ms: %s", name, duration_ms, " ".join(statement.split())[:200])
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the metrics as plain data, operations sorted by total time.
+        """
+        with self.lock:
+            operations = sorted((stats.to_dict() for stats in self.operations.values()), key=lambda stats: -stats["total_ms"])
+            slow_queries = [query.to_dict() for query in self.slow_queries]
+        return {
+            "since": self.started,
+            "slow_query_ms": self.slow_query_ms,
+            "statements": sum(stats["statements"] for stats in operations),
+            "operations": operations,
+            "slow_queries": slow_queries,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.slow_queries.clear()
+            self.started = time.time()
+
+    def export(self, path: str):
+        """
+        Writes a snapshot of the metrics to a JSON file.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+METRICS = QueryMetrics()
+
+
+def instrument_engine(engine: Engine, metrics: QueryMetrics = METRICS):
+    """
+    Times every statement the engine executes and records it in ``metrics``.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        # Drivers report -1 for queries whose rows are not fetched yet
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        metrics.record_statement(statement, (time.perf_counter() - started) * 1000, rows)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("metrics_started"):
+            started = connection.info["metrics_started"].pop()
+            metrics.record_statement(exception_context.statement or "", (time.perf_counter() - started) * 1000)
+
+
+def instrumented(method):
+    """
+    Tracks every call of a method as the operation ``<class name>.<method name>``, counting
+    the length of its result as rows returned.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        name = f"{type(self).__name__}.{method.__name__}"
+        with METRICS.operation(name):
+            result = method(self, *args, **kwargs)
+        if hasattr(result, "__len__") and not isinstance(result, (str, dict)):
+            METRICS.record_rows(name, len(result))
+        return result
+
+    return wrapper
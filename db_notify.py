@@ -0,0 +1,222 @@
+import json
+import logging
+import select
+import threading
+import time
+from typing import Callable
+from sqlalchemy import DDL, event
+from sqlalchemy.engine import Engine
+from db_classes import *
+from db_managers import ChangeEvent
+
+logger = logging.getLogger(__name__)
+
+# The PostgreSQL channel that row changes are published on
+CHANNEL = "sadieware_changes"
+
+# Tables whose row changes are published
+NOTIFY_TABLES = [DeviceType.__tablename__, AreaCode.__tablename__, Equipment.__tablename__]
+
+NOTIFY_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION sadieware_notify_change() RETURNS trigger AS $$
+DECLARE
+    row_id integer;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_id := OLD.id;
+    ELSE
+        row_id := NEW.id;
+    END IF;
+    PERFORM pg_notify(
+        '{CHANNEL}',
+        json_build_object('table', TG_TABLE_NAME, 'op', lower(TG_OP), 'id', row_id, 'pid', pg_backend_pid())::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+
+def create_change_triggers(connection):
+    """
+    Creates the notification function and one trigger per published table, replacing any
+    existing ones. Does nothing on databases other than PostgreSQL.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(NOTIFY_FUNCTION)
+    for table_name in NOTIFY_TABLES:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {table_name}_notify_change ON {table_name}")
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {table_name}_notify_change "
+            f"AFTER INSERT OR UPDATE OR DELETE ON {table_name} "
+            f"FOR EACH ROW EXECUTE FUNCTION sadieware_notify_change()"
+        )
+
+
+def install_change_triggers(engine: Engine):
+    """
+    Installs the change notification triggers on an existing database.
+    """
+    with engine.begin() as connection:
+        create_change_triggers(connection)
+
+
+# Keep the triggers in place whenever the schema is created
+event.listen(Base.metadata, "after_create", lambda target, connection, **kw: create_change_triggers(connection))
+
+
+def parse_change(payload: str) -> tuple[str, str, int, int]:
+    """
+    Reads the ``(table, op, id, pid)`` of a change notification, ``pid`` being the backend
+    that made the change. Returns None for a payload that is not a change notification.
+    """
+    try:
+        data = json.loads(payload)
+        return data["table"], data["op"], int(data["id"]), data.get("pid")
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def coalesce_change(pending: dict, table: str, op: str, row_id: int):
+    """
+    Merges one row change into ``pending``, which maps ``(table, id)`` to the net operation.
+
+    A row inserted and then updated is still an insert, and anything followed by a delete
+    is a delete, so a burst of writes to one row collapses into a single refresh.
+    """
+    previous = pending.get((table, row_id))
+    if op == ChangeEvent.UPDATE and previous == ChangeEvent.INSERT:
+        return
+    pending[(table, row_id)] = op
+
+
+def group_changes(pending: dict) -> dict[str, dict[str, list[int]]]:
+    """
+    Groups coalesced changes as ``{table: {op: [ids]}}``.
+    """
+    changes = {}
+    for (table, row_id), op in pending.items():
+        changes.setdefault(table, {}).setdefault(op, []).append(row_id)
+    return changes
+
+
+class ChangeListener(threading.Thread):
+    """
+    Listens for row change notifications on a dedicated connection in a background thread.
+
+    Notifications are coalesced for ``interval`` seconds after the first one arrives and
+    then delivered to ``callback`` as ``{table: {op: [ids]}}``, so a burst of imports
+    results in one targeted refresh per table instead of one per row.
+
+    Changes made through ``engine``'s own connections are skipped, their managers already
+    reported them. A lost connection is reopened, waiting ``retry_delay`` seconds at first
+    and twice as long after each failure up to ``max_retry_delay``. Changes made while it
+    was down are missed, so ``on_reconnect`` is called once listening again.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        callback: Callable[[dict], None],
+        interval: float = 0.25,
+        poll_timeout: float = 1.0,
+        on_reconnect: Callable[[], None] = None,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+    ):
+        super().__init__(name="ChangeListener", daemon=True)
+        self.engine = engine
+        self.callback = callback
+        self.interval = interval
+        self.poll_timeout = poll_timeout
+        self.on_reconnect = on_reconnect
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.stopped = threading.Event()
+        self.listening = threading.Event()
+        # Backend process ids of the engine's pooled connections, whose changes are skipped
+        self.own_pids: set[int] = set()
+        event.listen(engine, "checkout", self._track_connection)
+        event.listen(engine, "close", self._forget_connection)
+
+    def _track_connection(self, dbapi_connection, connection_record, connection_proxy):
+        pid = connection_record.info.get("backend_pid")
+        if pid is None:
+            pid = connection_record.info["backend_pid"] = dbapi_connection.info.backend_pid
+        self.own_pids.add(pid)
+
+    def _forget_connection(self, dbapi_connection, connection_record):
+        # The process id may be reused by another client's connection
+        self.own_pids.discard(connection_record.info.pop("backend_pid", None))
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        delay = self.retry_delay
+        connected = False
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self.listen(reconnected=connected)
+                except Exception:
+                    if self.listening.is_set():
+                        delay = self.retry_delay
+                    logger.warning("Listening for changes failed, retrying in %.1f s", delay, exc_info=True)
+                finally:
+                    connected = connected or self.listening.is_set()
+                    self.listening.clear()
+                if self.stopped.wait(delay):
+                    return
+                delay = min(delay * 2, self.max_retry_delay)
+        finally:
+            event.remove(self.engine, "checkout", self._track_connection)
+            event.remove(self.engine, "close", self._forget_connection)
+
+    def listen(self, reconnected: bool = False):
+        """
+        Listens on a new connection until stopped, raising if the connection fails.
+        """
+        # Detach the connection from the pool, it is switched to autocommit and never reused
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            self.listening.set()
+            if reconnected:
+                logger.info("Listening for changes again")
+                if self.on_reconnect is not None:
+                    self.on_reconnect()
+
+            pending = {}
+            deadline = None
+            while not self.stopped.is_set():
+                timeout = self.poll_timeout if deadline is None else max(0.0, deadline - time.monotonic())
+                readable, _, _ = select.select([dbapi_connection], [], [], timeout)
+                if readable:
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        change = parse_change(notify.payload)
+                        if change is None:
+                            logger.warning("Ignoring a malformed change notification: %r", notify.payload)
+                            continue
+                        table, op, row_id, pid = change
+                        if pid not in self.own_pids:
+                            coalesce_change(pending, table, op, row_id)
+                    if pending and deadline is None:
+                        deadline = time.monotonic() + self.interval
+                if deadline is not None and time.monotonic() >= deadline:
+                    self.callback(group_changes(pending))
+                    pending = {}
+                    deadline = None
+        except Exception:
+            # A failed connection is discarded without the rollback a close would send
+            connection.invalidate()
+            raise
+        finally:
+            connection.close()
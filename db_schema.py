@@ -0,0 +1,101 @@
+from typing import Any, Callable, Dict
+from sqlalchemy import Integer, inspect
+from sqlalchemy.orm import MANYTOONE, ONETOMANY
+from db_classes import *
+
+
+def convert_text(value):
+    return value
+
+
+def convert_integer(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        return int(value)
+    return value
+
+
+class ModelSchema:
+    """
+    Column metadata for one model, computed once and shared by managers, dialogs and tables.
+
+    Labels are the human-readable names from ``_fields_map``; fields are the attribute names.
+    The ``id`` field is labelled "ID".
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields: list[str] = list(model._fields)
+        self.field_index: Dict[str, int] = {field: index for index, field in enumerate(self.fields)}
+        self.label_to_field: Dict[str, str] = dict(model._fields_map)
+        self.field_to_label: Dict[str, str] = {field: label for label, field in model._fields_map.items()}
+        self.field_to_label.setdefault("id", "ID")
+        self.label_to_field.setdefault("ID", "id")
+        self.labels: list[str] = [self.field_to_label.get(field, field) for field in self.fields]
+        self.editable_fields: list[str] = [field for field in self.fields if field in self.field_to_label and field != "id"]
+        self.many_to_one: list[str] = [
+            relationship.key for relationship in inspect(model).relationships if relationship.direction is MANYTOONE
+        ]
+        # Foreign key columns of other tables that refer to this model
+        self.referencing_columns = [
+            column
+            for relationship in inspect(model).relationships
+            if relationship.direction is ONETOMANY
+            for column in relationship.remote_side
+        ]
+
+        self.column_types = {}
+        self.converters: Dict[str, Callable[[Any], Any]] = {}
+        self.unique_fields: Dict[str, str] = {}
+        self.nullable_fields: Dict[str, str] = {}
+        self.invalid_messages: Dict[str, str] = {}
+        for field_name, column in model.__table__.columns.items():
+            label = self.field_to_label.get(field_name)
+            self.column_types[field_name] = column.type
+            if isinstance(column.type, Integer):
+                self.converters[field_name] = convert_integer
+                self.invalid_messages[field_name] = f"{label or field_name} must be a whole number."
+            else:
+                self.converters[field_name] = convert_text
+            if label is None or field_name == "id":
+                continue
+            if column.unique:
+                self.unique_fields[field_name] = f"{label} with value '{{value}}' already exists."
+            if not column.nullable:
+                self.nullable_fields[field_name] = f"{label} is required."
+
+    def to_field(self, key: str) -> str:
+        """
+        Translates a label to its field name, field names are returned unchanged.
+        """
+        return self.label_to_field.get(key, key)
+
+    def convert(self, field_name: str, value):
+        """
+        Converts a value entered as text to the column's type.
+
+        Raises:
+            ValueError: If the value cannot be converted, with a message naming the field.
+        """
+        try:
+            return self.converters.get(field_name, convert_text)(value)
+        except ValueError:
+            raise ValueError(self.invalid_messages.get(field_name, f"Invalid value '{value}'.")) from None
+
+
+# Only the application's tables have fields, bookkeeping tables such as deleted_rows do not
+SCHEMAS: Dict[type, ModelSchema] = {
+    mapper.class_: ModelSchema(mapper.class_) for mapper in Base.registry.mappers if issubclass(mapper.class_, BaseBase)
+}
+
+
+def get_schema(model) -> ModelSchema:
+    """
+    Returns the schema of a model class, building it on first use for models defined later.
+    """
+    schema = SCHEMAS.get(model)
+    if schema is None:
+        schema = SCHEMAS[model] = ModelSchema(model)
+    return schema
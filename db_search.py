@@ -0,0 +1,167 @@
+import re
+from sqlalchemy import Float, String, and_, desc, event, func, literal, literal_column, select, union_all
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Engine
+from db_classes import *
+from db_managers import BaseManager
+from db_metrics import instrumented
+
+# The text search configuration, "simple" lowers words without stemming, which suits
+# equipment names, codes and vendor names better than a language dictionary
+SEARCH_CONFIG = "simple"
+
+# The generated tsvector column added to every searchable table on PostgreSQL
+SEARCH_VECTOR = "search_vector"
+
+# Characters with a meaning in tsquery syntax, removed from the words of a search
+TSQUERY_OPERATORS = re.compile(r"[&|!():*<>'\\]")
+
+# The fields of each searchable table that make up its search vector, with their weights.
+# The first field is the title of a result and the second its detail.
+SEARCH_FIELDS = {
+    Equipment.__tablename__: {"name": "A", "application": "B", "specs_description": "C", "manufacturer": "C", "vendor": "C"},
+    DeviceType.__tablename__: {"device_type": "A", "description": "B"},
+    AreaCode.__tablename__: {"area_code": "A", "description": "B"},
+}
+
+
+def create_search_vectors(connection):
+    """
+    Adds the generated search vector columns and their GIN indexes to the searchable tables
+    where they are missing. Does nothing on databases other than PostgreSQL.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    for table_name, fields in SEARCH_FIELDS.items():
+        vector = " || ".join(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({field}, '')), '{weight}')" for field, weight in fields.items()
+        )
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR} tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{SEARCH_VECTOR} ON {table_name} USING gin ({SEARCH_VECTOR})"
+        )
+
+
+def install_search_vectors(engine: Engine):
+    """
+    Adds the search vectors to an existing database, computing them for every existing row.
+    """
+    with engine.begin() as connection:
+        create_search_vectors(connection)
+
+
+# Keep the search vectors in place whenever the schema is created
+event.listen(Base.metadata, "after_create", lambda target, connection, **kw: create_search_vectors(connection))
+
+
+def to_prefix_query(text: str) -> str:
+    """
+    Turns free text into a tsquery that matches rows containing every word, each word also
+    matching as a prefix, so "conv belt" finds "Conveyor Belt". Returns None without words.
+
+    Words are split on whitespace only and left to the text search parser, which splits
+    codes such as "DT-0001" the same way it split them in the search vectors.
+    """
+    words = [TSQUERY_OPERATORS.sub("", word) for word in text.lower().split()]
+    words = [word for word in words if re.search(r"\w", word)]
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+class SearchResult:
+    def __init__(self, model, obj_id: int, title: str, detail: str, rank: float):
+        self.model = model
+        self.id = obj_id
+        self.title = title
+        self.detail = detail
+        self.rank = rank
+
+    def __repr__(self):
+        return f"SearchResult({self.model.__name__}, id={self.id!r}, title={self.title!r}, rank={self.rank:.3f})"
+
+
+class GlobalSearch:
+    """
+    Searches equipment, device types and area codes at once, ranked by relevance.
+
+    On PostgreSQL one query over the GIN-indexed search vectors of all tables returns a page
+    of results ranked with ``ts_rank``. Other databases fall back to the managers' substring
+    search for every word, unranked and unindexed, ordered by table and id.
+
+    Args:
+        managers (list[BaseManager]): The managers of the searchable tables, the first one's
+            sessions run the queries.
+    """
+
+    def __init__(self, managers: list[BaseManager]):
+        self.managers = {manager.model.__tablename__: manager for manager in managers if manager.model.__tablename__ in SEARCH_FIELDS}
+        self.models = {manager.model.__name__: manager.model for manager in self.managers.values()}
+        self.session_scope = managers[0].session_scope
+
+    @instrumented
+    def search(self, text: str, limit: int = 50, offset: int = 0) -> list[SearchResult]:
+        """
+        Returns one page of results for ``text``, the best matches first.
+
+        Args:
+            text (str): Words to find, each matched as a prefix.
+            limit (int): The page size.
+            offset (int): The number of results to skip.
+        """
+        with self.session_scope() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                statement = self.ranked_statement(text)
+            else:
+                statement = self.substring_statement(text)
+            if statement is None:
+                return []
+            rows = session.execute(statement.limit(limit).offset(offset or None)).all()
+        return [SearchResult(self.models[kind], obj_id, title, detail, rank) for kind, obj_id, title, detail, rank in rows]
+
+    def ranked_statement(self, text: str):
+        query_text = to_prefix_query(text)
+        if query_text is None:
+            return None
+        selects = []
+        for table_name, manager in self.managers.items():
+            table = manager.model.__table__
+            title, detail = list(SEARCH_FIELDS[table_name])[:2]
+            vector = literal_column(f"{table_name}.{SEARCH_VECTOR}", TSVECTOR)
+            query = func.to_tsquery(SEARCH_CONFIG, query_text)
+            selects.append(
+                select(
+                    literal(manager.model.__name__, String).label("kind"),
+                    table.c.id,
+                    table.c[title].label("title"),
+                    table.c[detail].label("detail"),
+                    func.ts_rank(vector, query).label("rank"),
+                )
+                .select_from(table)
+                .where(vector.op("@@")(query))
+            )
+        statement = union_all(*selects).subquery()
+        return statement.select().order_by(desc(statement.c.rank), statement.c.kind, statement.c.id)
+
+    def substring_statement(self, text: str):
+        words = text.split()
+        if not words:
+            return None
+        selects = []
+        for table_name, manager in self.managers.items():
+            table = manager.model.__table__
+            title, detail = list(SEARCH_FIELDS[table_name])[:2]
+            selects.append(
+                manager.table_select(
+                    literal(manager.model.__name__, String).label("kind"),
+                    table.c.id,
+                    table.c[title].label("title"),
+                    table.c[detail].label("detail"),
+                    literal(0.0, Float).label("rank"),
+                ).where(and_(*(manager.search_clause(word) for word in words)))
+            )
+        statement = union_all(*selects).subquery()
+        return statement.select().order_by(statement.c.kind, statement.c.id)
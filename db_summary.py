@@ -0,0 +1,196 @@
+from sqlalchemy import DDL, String, cast, delete, event, func, insert, literal, select
+from sqlalchemy.engine import Engine
+from db_classes import *
+from db_managers import EquipmentManager, get_reference_cache
+from db_metrics import instrumented
+
+# Equipment fields the summary counts rows by, with the labels the dashboard shows
+SUMMARY_DIMENSIONS = {
+    "area_code_id": "Area Code",
+    "device_type_id": "Device Type",
+    "manufacturer": "Manufacturer",
+    "vendor": "Vendor",
+}
+
+EQUIPMENTS = Equipment.__tablename__
+COUNTS = EquipmentCount.__tablename__
+
+
+def summary_keys(alias: str) -> str:
+    """
+    Returns SQL expanding each row of ``alias`` into one ``(dimension, value)`` pair per
+    summarized field, for PostgreSQL.
+    """
+    pairs = ", ".join(f"('{field}', coalesce({alias}.{field}::text, ''))" for field in SUMMARY_DIMENSIONS)
+    return f"CROSS JOIN LATERAL (VALUES {pairs}) AS summary_keys(dimension, value)"
+
+
+def count_changes(select_rows: str) -> str:
+    """
+    Returns the statement that adds the ``delta`` of the given rows to their counts. Keys are
+    locked in sorted order, so concurrent writers cannot deadlock on them.
+    """
+    return f"""
+        INSERT INTO {COUNTS} AS counts (dimension, value, count)
+        SELECT dimension, value, sum(delta) FROM ({select_rows}) AS changes {summary_keys('changes')}
+        GROUP BY dimension, value HAVING sum(delta) <> 0 ORDER BY dimension, value
+        ON CONFLICT (dimension, value) DO UPDATE SET count = counts.count + excluded.count"""
+
+
+# One statement-level trigger per operation counts all the rows a statement wrote at once,
+# so a bulk import costs one aggregate per chunk instead of one update per row
+COUNT_FUNCTION = DDL(f"""
+CREATE OR REPLACE FUNCTION sadieware_count_equipment() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {count_changes("SELECT *, 1 AS delta FROM new_rows")};
+    ELSIF TG_OP = 'DELETE' THEN
+        {count_changes("SELECT *, -1 AS delta FROM old_rows")};
+    ELSE
+        {count_changes("SELECT *, -1 AS delta FROM old_rows UNION ALL SELECT *, 1 AS delta FROM new_rows")};
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+COUNT_TRIGGERS = {
+    "insert": "REFERENCING NEW TABLE AS new_rows",
+    "update": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "delete": "REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def sqlite_count(field: str, row: str, delta: int) -> str:
+    value = f"coalesce(CAST({row}.{field} AS TEXT), '')"
+    return (
+        f"INSERT INTO {COUNTS} (dimension, value, count) VALUES ('{field}', {value}, {delta}) "
+        f"ON CONFLICT (dimension, value) DO UPDATE SET count = count + {delta};"
+    )
+
+
+def create_sqlite_triggers(connection):
+    # SQLite only has row-level triggers, updates only count the fields that changed
+    triggers = {
+        "insert": ("AFTER INSERT", [sqlite_count(field, "NEW", 1) for field in SUMMARY_DIMENSIONS]),
+        "delete": ("AFTER DELETE", [sqlite_count(field, "OLD", -1) for field in SUMMARY_DIMENSIONS]),
+    }
+    for field in SUMMARY_DIMENSIONS:
+        triggers[f"update_{field}"] = (
+            f"AFTER UPDATE OF {field}",
+            [sqlite_count(field, "OLD", -1), sqlite_count(field, "NEW", 1)],
+            f"WHEN OLD.{field} IS NOT NEW.{field}",
+        )
+    for name, (event_name, statements, *condition) in triggers.items():
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {EQUIPMENTS}_count_{name}")
+        body = " ".join(statements)
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {EQUIPMENTS}_count_{name} {event_name} ON {EQUIPMENTS} FOR EACH ROW {' '.join(condition)} BEGIN {body} END"
+        )
+
+
+def create_summary_triggers(connection):
+    """
+    Creates the triggers that keep the equipment counts up to date, replacing any existing ones.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(COUNT_FUNCTION)
+        for name, transition_tables in COUNT_TRIGGERS.items():
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {EQUIPMENTS}_count_{name} ON {EQUIPMENTS}")
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER {EQUIPMENTS}_count_{name} AFTER {name.upper()} ON {EQUIPMENTS} "
+                f"{transition_tables} FOR EACH STATEMENT EXECUTE FUNCTION sadieware_count_equipment()"
+            )
+    else:
+        create_sqlite_triggers(connection)
+
+
+def rebuild_summary(connection):
+    """
+    Recounts the equipment from scratch, with one aggregate query per summarized field.
+    """
+    counts = EquipmentCount.__table__
+    equipments = Equipment.__table__
+    connection.execute(delete(counts))
+    for field in SUMMARY_DIMENSIONS:
+        value = func.coalesce(cast(equipments.c[field], String), "")
+        connection.execute(
+            insert(counts).from_select(
+                ["dimension", "value", "count"],
+                select(literal(field), value, func.count()).group_by(value),
+            )
+        )
+
+
+def create_summary(connection):
+    """
+    Creates the summary triggers, and counts the existing equipment if the counts are empty,
+    for databases created before the summary.
+    """
+    create_summary_triggers(connection)
+    counts = EquipmentCount.__table__
+    if connection.execute(select(counts.c.dimension).limit(1)).first() is None:
+        rebuild_summary(connection)
+
+
+def install_summary(engine: Engine):
+    """
+    Installs the summary triggers on an existing database and recounts its equipment.
+    """
+    with engine.begin() as connection:
+        create_summary_triggers(connection)
+        rebuild_summary(connection)
+
+
+# Keep the triggers in place whenever the schema is created
+event.listen(Base.metadata, "after_create", lambda target, connection, **kw: create_summary(connection))
+
+
+class EquipmentSummary:
+    """
+    Reads the equipment counts by area code, device type, manufacturer and vendor.
+
+    The counts are kept in the ``equipment_counts`` table by triggers on every insert,
+    update and delete, whoever makes them, so reading them is one query over a row per
+    distinct value however much equipment there is. Related names come from the reference
+    caches.
+    """
+
+    def __init__(self, manager: EquipmentManager):
+        self.manager = manager
+
+    def related_names(self, field: str) -> dict:
+        """
+        Returns the names of the rows a foreign key field refers to, by id.
+        """
+        name_column = self.manager.related_names[field]
+        cache = get_reference_cache(name_column.class_, self.manager.session_factory)
+        if cache is not None and cache.name_field == name_column.key:
+            return {obj_id: getattr(obj, cache.name_field) for obj_id, obj in cache.refresh().items()}
+        return dict(self.manager.related_choices(field))
+
+    @instrumented
+    def totals(self) -> dict[str, list[tuple[str, int]]]:
+        """
+        Returns the counts of each summarized field, as ``(value, count)`` pairs ordered from
+        the most common value. Foreign keys are given by name, a missing value as None.
+        """
+        counts = EquipmentCount.__table__
+        statement = (
+            select(counts.c.dimension, counts.c.value, counts.c.count)
+            .where(counts.c.count > 0)
+            .order_by(counts.c.count.desc(), counts.c.value)
+        )
+        with self.manager.session_scope() as session:
+            rows = session.execute(statement).all()
+        names = {field: self.related_names(field) for field in SUMMARY_DIMENSIONS if field in self.manager.related_names}
+        totals = {field: [] for field in SUMMARY_DIMENSIONS}
+        for dimension, value, count in rows:
+            if dimension not in totals:
+                continue
+            if not value:
+                value = None
+            elif dimension in names:
+                value = names[dimension].get(int(value), value)
+            totals[dimension].append((value, count))
+        return totals
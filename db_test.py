@@ -1,17 +1,10 @@
-from sqlalchemy.orm import Session
-
 from db_classes import *
 from db_managers import *
-from db_setup import session
-
-# Create managers
-equipment_manager = EquipmentManager(session)
-device_type_manager = DeviceTypeManager(session)
-area_code_manager = AreaCodeManager(session)
+from db_setup import create_schema, new_session, unit_of_work
 
 
 # Function to delete existing records if they match the new records
-def delete_existing_records():
+def delete_existing_records(equipment_manager, device_type_manager, area_code_manager):
     # Check and delete existing device type
     existing_device_type = device_type_manager.filter(lambda model: model.device_type == "PLC")
     for device_type in existing_device_type:
@@ -28,44 +21,58 @@ def delete_existing_records():
         equipment_manager.delete(equipment.id)
 
 
-# Call the function to delete existing records
-delete_existing_records()
+def main():
+    create_schema()
+
+    # Create managers
+    equipment_manager = EquipmentManager(new_session)
+    device_type_manager = DeviceTypeManager(new_session)
+    area_code_manager = AreaCodeManager(new_session)
+
+    # Replace the records in one transaction, committed once at the end
+    with unit_of_work():
+        # Call the function to delete existing records
+        delete_existing_records(equipment_manager, device_type_manager, area_code_manager)
+
+        # Add new records
+        new_device_type = DeviceType(device_type="PLC", description="Programmable Logic Controller")
+        device_type_manager.add(new_device_type)
+
+        new_area_code = AreaCode(area_code="B2", description="Backup Area")
+        area_code_manager.add(new_area_code)
 
-# Add new records
-new_device_type = DeviceType(device_type="PLC", description="Programmable Logic Controller")
-device_type_manager.add(new_device_type)
+        new_equipment = Equipment(
+            name="EQ124",
+            application="Conveyor Belt",
+            device_type_id=new_device_type.id,
+            area_code_id=new_area_code.id,
+            specs_description="Conveyor belt for sorting system",
+            manufacturer="Conveyor Inc",
+            vendor="Machinery Suppliers",
+        )
+        equipment_manager.add(new_equipment)
 
-new_area_code = AreaCode(area_code="B2", description="Backup Area")
-area_code_manager.add(new_area_code)
+    # Query records
+    all_equipment = equipment_manager.get_all()
+    for equipment in all_equipment:
+        print(equipment.name, equipment.application)
 
-new_equipment = Equipment(
-    name="EQ124",
-    application="Conveyor Belt",
-    device_type_id=new_device_type.id,
-    area_code_id=new_area_code.id,
-    specs_description="Conveyor belt for sorting system",
-    manufacturer="Conveyor Inc",
-    vendor="Machinery Suppliers",
-)
-equipment_manager.add(new_equipment)
+    # Update a record
+    updated_equipment = equipment_manager.update(new_equipment.id, {"specs_description": "Updated specs description"})
 
-# Query records
-all_equipment = equipment_manager.get_all()
-for equipment in all_equipment:
-    print(equipment.name, equipment.application)
+    # Delete a record
+    equipment_manager.delete(new_equipment.id)
 
-# Update a record
-updated_equipment = equipment_manager.update(new_equipment.id, {"specs_description": "Updated specs description"})
+    # Use the filter method to get equipment with a specific application
+    filtered_equipment = equipment_manager.filter(lambda model: model.application == "Conveyor Belt")
+    for equipment in filtered_equipment:
+        print(f"Filtered Equipment: {equipment.name}, Application: {equipment.application}")
 
-# Delete a record
-equipment_manager.delete(new_equipment.id)
+    # Use the filter method to get area codes that start with 'B'
+    filtered_area_codes = area_code_manager.filter(lambda model: model.area_code.startswith("B"))
+    for area_code in filtered_area_codes:
+        print(f"Filtered Area Code: {area_code.area_code}, Description: {area_code.description}")
 
-# Use the filter method to get equipment with a specific application
-filtered_equipment = equipment_manager.filter(lambda model: model.application == "Conveyor Belt")
-for equipment in filtered_equipment:
-    print(f"Filtered Equipment: {equipment.name}, Application: {equipment.application}")
 
-# Use the filter method to get area codes that start with 'B'
-filtered_area_codes = area_code_manager.filter(lambda model: model.area_code.startswith("B"))
-for area_code in filtered_area_codes:
-    print(f"Filtered Area Code: {area_code.area_code}, Description: {area_code.description}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import datetime
+from PySide6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QFileDialog,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+    QMessageBox,
+)
+from PySide6.QtCore import Qt, QTimer
+from db_metrics import METRICS, QueryMetrics
+
+# Columns of the operations table, with their snapshot keys
+OPERATION_COLUMNS = [
+    ("Operation", "name"),
+    ("Calls", "calls"),
+    ("Mean ms", "mean_ms"),
+    ("Max ms", "max_ms"),
+    ("Total ms", "total_ms"),
+    ("Statements", "statements"),
+    ("Statements/Call", "statements_per_call"),
+    ("SQL ms", "statement_ms"),
+    ("Rows", "rows"),
+    ("Errors", "errors"),
+]
+
+SLOW_QUERY_COLUMNS = [
+    ("Time", "timestamp"),
+    ("Operation", "operation"),
+    ("ms", "duration_ms"),
+    ("Statement", "statement"),
+]
+
+
+def format_time(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+
+
+class DiagnosticsPanel(QWidget):
+    """
+    Shows the query metrics per manager operation and the slow query log.
+
+    The tables refresh every few seconds while the panel is visible. A high Statements/Call
+    count points at an N+1 query pattern, the slow query log at statements that need an
+    index or a smaller result.
+    """
+
+    REFRESH_INTERVAL_MS = 2000
+
+    def __init__(self, metrics: QueryMetrics = METRICS, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+
+        self.summary_label = QLabel("")
+        self.refresh_button = QPushButton("Refresh")
+        self.refresh_button.clicked.connect(self.refresh)
+        self.reset_button = QPushButton("Reset")
+        self.reset_button.clicked.connect(self.reset)
+        self.export_button = QPushButton("Export...")
+        self.export_button.clicked.connect(self.export)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.summary_label, 1)
+        button_layout.addWidget(self.refresh_button)
+        button_layout.addWidget(self.reset_button)
+        button_layout.addWidget(self.export_button)
+
+        self.operations_table = self.make_table(OPERATION_COLUMNS)
+        self.operations_table.horizontalHeader().setSortIndicator(4, Qt.DescendingOrder)
+        self.slow_queries_table = self.make_table(SLOW_QUERY_COLUMNS)
+        self.slow_queries_table.horizontalHeader().setSortIndicator(0, Qt.DescendingOrder)
+        self.slow_queries_label = QLabel("Slow queries")
+
+        layout = QVBoxLayout()
+        layout.addLayout(button_layout)
+        layout.addWidget(self.operations_table, 2)
+        layout.addWidget(self.slow_queries_label)
+        layout.addWidget(self.slow_queries_table, 1)
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    @staticmethod
+    def make_table(columns: list[tuple[str, str]]) -> QTableWidget:
+        table = QTableWidget(0, len(columns))
+        table.setHorizontalHeaderLabels([label for label, _ in columns])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSortingEnabled(True)
+        return table
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        self.summary_label.setText(f"{snapshot['statements']} statements since {format_time(snapshot['since'])}")
+        self.slow_queries_label.setText(f"Slow queries (at least {snapshot['slow_query_ms']:g} ms)")
+        self.fill_table(self.operations_table, OPERATION_COLUMNS, snapshot["operations"])
+        self.fill_table(self.slow_queries_table, SLOW_QUERY_COLUMNS, snapshot["slow_queries"])
+
+    @staticmethod
+    def fill_table(table: QTableWidget, columns: list[tuple[str, str]], rows: list[dict]):
+        sort_column = table.horizontalHeader().sortIndicatorSection()
+        sort_order = table.horizontalHeader().sortIndicatorOrder()
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, (_, key) in enumerate(columns):
+                value = values[key]
+                item = QTableWidgetItem()
+                if key == "timestamp":
+                    value = format_time(value)
+                # Numbers are set as data so the columns sort numerically
+                item.setData(Qt.DisplayRole, "" if value is None else value)
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+        table.sortItems(sort_column, sort_order)
+
+    def reset(self):
+        self.metrics.reset()
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Diagnostics", "sadieware-diagnostics.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            self.metrics.export(path)
+        except OSError as e:
+            QMessageBox.warning(self, "Export Diagnostics", f"Could not write {path}: {e}")
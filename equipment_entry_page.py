@@ -0,0 +1,24 @@
+from PySide6.QtWidgets import QWidget, QVBoxLayout
+from db_managers import EquipmentManager
+from qt_table import SimpleTable
+from qt_table_dialog import EquipmentDialog
+
+
+class EquipmentEntryPage(QWidget):
+    """
+    The equipment table, showing device types and area codes by name.
+
+    Names are joined into the table query, so a page of equipment costs one query however
+    many device types and area codes it refers to. The equipment manager follows the
+    device type and area code managers, so renaming or deleting one refreshes only the
+    equipment rows that refer to it.
+    """
+
+    def __init__(self, equipment_manager: EquipmentManager):
+        super().__init__()
+        self.table = SimpleTable(equipment_manager, "Equipment", dialog_class=EquipmentDialog)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
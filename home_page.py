@@ -0,0 +1,350 @@
+import logging
+from PySide6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QGridLayout,
+    QLabel,
+    QLineEdit,
+    QTableView,
+    QHeaderView,
+    QAbstractItemView,
+)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, Signal
+from db_managers import TableManager
+from db_search import GlobalSearch, SearchResult
+from db_setup import EQUIPMENT_MANAGER, EQUIPMENT_SUMMARY, GLOBAL_SEARCH
+from db_summary import SUMMARY_DIMENSIONS, EquipmentSummary
+from qt_workers import db_executor
+
+logger = logging.getLogger(__name__)
+
+# Columns of the results table, with the result attribute each one shows
+RESULT_COLUMNS = [
+    ("Type", "kind"),
+    ("Name", "title"),
+    ("Details", "detail"),
+]
+
+# Display names of the searchable models
+KIND_LABELS = {
+    "Equipment": "Equipment",
+    "DeviceType": "Device Type",
+    "AreaCode": "Area Code",
+}
+
+
+class SearchResultsModel(QAbstractTableModel):
+    """
+    The results of a global search, fetched a page at a time in the background.
+
+    The first page arrives as soon as its query returns and further pages are fetched as the
+    view scrolls towards the end, so a search matching many rows never loads them all.
+    """
+
+    busy_changed = Signal(bool)
+    # The total number of results loaded so far and whether more remain
+    results_changed = Signal(int, bool)
+
+    def __init__(self, search: GlobalSearch, page_size: int = 50, parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.page_size = page_size
+        self.executor = db_executor()
+        self.text = ""
+        self._results: list[SearchResult] = []
+        self._exhausted = True
+        self._fetching = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._results)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(RESULT_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return RESULT_COLUMNS[section][0]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        result = self._results[index.row()]
+        attribute = RESULT_COLUMNS[index.column()][1]
+        if attribute == "kind":
+            return KIND_LABELS.get(result.model.__name__, result.model.__name__)
+        value = getattr(result, attribute)
+        return "" if value is None else str(value)
+
+    def result(self, row: int) -> SearchResult:
+        return self._results[row]
+
+    def set_text(self, text: str):
+        """
+        Starts a new search, dropping the results of the previous one.
+        """
+        text = text.strip()
+        if text == self.text:
+            return
+        self.beginResetModel()
+        self.text = text
+        self._results = []
+        self._exhausted = not text
+        self._fetching = False
+        self.endResetModel()
+        if text:
+            self.fetchMore()
+        else:
+            self.results_changed.emit(0, False)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        text, limit, offset = self.text, self.page_size, len(self._results)
+        self._fetching = True
+        self.busy_changed.emit(True)
+        # A new search supersedes the pages of the previous one
+        self.executor.submit(
+            self.search,
+            lambda search: search.search(text, limit=limit, offset=offset),
+            key=(id(self), "search"),
+            on_result=lambda results: self._append_page(text, results),
+            on_error=lambda error: self._search_failed(text, error),
+            on_done=lambda: self.busy_changed.emit(self._fetching),
+        )
+
+    def _append_page(self, text: str, results: list[SearchResult]):
+        if text != self.text:
+            return
+        self._fetching = False
+        self._exhausted = len(results) < self.page_size
+        if results:
+            first = len(self._results)
+            self.beginInsertRows(QModelIndex(), first, first + len(results) - 1)
+            self._results.extend(results)
+            self.endInsertRows()
+        self.results_changed.emit(len(self._results), not self._exhausted)
+
+    def _search_failed(self, text: str, error: Exception):
+        logger.error("Global search for %r failed", text, exc_info=error)
+        if text == self.text:
+            self._fetching = False
+            self._exhausted = True
+            self.results_changed.emit(len(self._results), False)
+
+
+class SummaryModel(QAbstractTableModel):
+    """
+    The equipment counts of one summarized field, as ``(value, count)`` pairs.
+    """
+
+    def __init__(self, label: str, parent=None):
+        super().__init__(parent)
+        self.label = label
+        self._pairs: list[tuple[str, int]] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._pairs)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 2
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.label if section == 0 else "Equipment"
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value, count = self._pairs[index.row()]
+        if role == Qt.DisplayRole:
+            if index.column() == 1:
+                return str(count)
+            return "(none)" if value is None else value
+        if role == Qt.TextAlignmentRole and index.column() == 1:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def value(self, row: int) -> str:
+        return self._pairs[row][0]
+
+    def set_pairs(self, pairs: list[tuple[str, int]]):
+        self.beginResetModel()
+        self._pairs = pairs
+        self.endResetModel()
+
+
+class EquipmentDashboard(QWidget):
+    """
+    Shows how much equipment there is by area code, device type, manufacturer and vendor.
+
+    The counts are read from :class:`EquipmentSummary` in the background, a single small
+    query however much equipment there is, and read again shortly after the equipment
+    changes. Activating a count emits :attr:`group_activated`.
+    """
+
+    # The column label and the value of the activated count, None for equipment without one
+    group_activated = Signal(str, object)
+    change_received = Signal(object)
+
+    def __init__(self, summary: EquipmentSummary, manager: TableManager = None, parent=None):
+        super().__init__(parent)
+        self.summary = summary
+        self.executor = db_executor()
+
+        self.total_label = QLabel("Loading the equipment summary...")
+        self.models = {}
+        grid = QGridLayout()
+        for position, (field, label) in enumerate(SUMMARY_DIMENSIONS.items()):
+            model = self.models[field] = SummaryModel(label, parent=self)
+            view = QTableView()
+            view.setModel(model)
+            view.setSelectionBehavior(QAbstractItemView.SelectRows)
+            view.setSelectionMode(QAbstractItemView.SingleSelection)
+            view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            view.verticalHeader().setVisible(False)
+            view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+            view.activated.connect(lambda index, model=model: self.activate_group(model, index))
+            grid.addWidget(view, position // 2, position % 2)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.total_label)
+        layout.addLayout(grid)
+        self.setLayout(layout)
+
+        # A burst of writes, such as an import, reloads the counts once
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(500)
+        self.reload_timer.timeout.connect(self.reload)
+        if manager is not None:
+            # Writes are reported on the thread that made them, the signal brings them to this one
+            self.change_received.connect(lambda event: self.reload_timer.start())
+            listener = self.change_received.emit
+            manager.subscribe(listener)
+            self.destroyed.connect(lambda: manager.unsubscribe(listener))
+        self.reload()
+
+    def reload(self):
+        self.reload_timer.stop()
+        self.executor.submit(
+            self.summary,
+            lambda summary: summary.totals(),
+            key=(id(self), "totals"),
+            on_result=self.show_totals,
+            on_error=self._load_failed,
+        )
+
+    def show_totals(self, totals: dict[str, list[tuple[str, int]]]):
+        for field, model in self.models.items():
+            model.set_pairs(totals.get(field, []))
+        # Every piece of equipment is counted once per field, with or without a value
+        total = sum(count for _, count in totals.get(next(iter(SUMMARY_DIMENSIONS)), []))
+        self.total_label.setText(f"{total} pieces of equipment" if total != 1 else "1 piece of equipment")
+
+    def _load_failed(self, error: Exception):
+        logger.error("Loading the equipment summary failed", exc_info=error)
+        self.total_label.setText("The equipment summary could not be loaded.")
+
+    def activate_group(self, model: SummaryModel, index: QModelIndex):
+        if index.isValid():
+            self.group_activated.emit(model.label, model.value(index.row()))
+
+
+class HomePage(QWidget):
+    """
+    Searches equipment, device types and area codes at once.
+
+    Results are ranked on PostgreSQL and shown as their pages arrive. Activating a result
+    emits :attr:`result_activated`, the main window then opens the result's table filtered
+    down to it. While nothing is searched for the page shows the :class:`EquipmentDashboard`,
+    activating one of its counts emits :attr:`filter_activated`.
+    """
+
+    # The model, id and title of the activated result
+    result_activated = Signal(object, int, str)
+    # The equipment column label and value of the activated count
+    filter_activated = Signal(str, object)
+
+    def __init__(
+        self,
+        search: GlobalSearch = GLOBAL_SEARCH,
+        summary: EquipmentSummary = EQUIPMENT_SUMMARY,
+        manager: TableManager = EQUIPMENT_MANAGER,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.results_model = SearchResultsModel(search, parent=self)
+        self.dashboard = EquipmentDashboard(summary, manager, parent=self)
+        self.dashboard.group_activated.connect(self.filter_activated)
+
+        self.search_bar = QLineEdit()
+        self.search_bar.setPlaceholderText("Search equipment, device types and area codes...")
+        self.search_bar.setClearButtonEnabled(True)
+        # Wait for a pause in typing before running the search query
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_bar.textChanged.connect(self.search_timer.start)
+        self.search_bar.returnPressed.connect(self.run_search)
+
+        self.status_label = QLabel("")
+        self.results_model.results_changed.connect(self.update_status)
+        self.results_model.busy_changed.connect(self.on_busy_changed)
+
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_model)
+        self.results_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.results_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.results_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.results_view.verticalHeader().setVisible(False)
+        self.results_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.results_view.horizontalHeader().setStretchLastSection(True)
+        # Double-click or Enter, depending on the platform
+        self.results_view.activated.connect(self.activate_result)
+        self.results_view.hide()
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(QLabel("Search:"))
+        search_layout.addWidget(self.search_bar)
+
+        layout = QVBoxLayout()
+        layout.addLayout(search_layout)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results_view)
+        layout.addWidget(self.dashboard)
+        self.setLayout(layout)
+
+    def run_search(self):
+        self.search_timer.stop()
+        self.results_model.set_text(self.search_bar.text())
+        searching = bool(self.results_model.text)
+        self.results_view.setVisible(searching)
+        self.dashboard.setVisible(not searching)
+
+    def on_busy_changed(self, busy: bool):
+        if busy and not self.results_model.rowCount():
+            self.status_label.setText("Searching...")
+
+    def update_status(self, count: int, more: bool):
+        if not self.results_model.text:
+            self.status_label.setText("")
+        elif more:
+            self.status_label.setText(f"Showing the best {count} results, scroll for more")
+        elif count:
+            self.status_label.setText(f"{count} results" if count > 1 else "1 result")
+        else:
+            self.status_label.setText("No results")
+
+    def activate_result(self, index: QModelIndex):
+        if index.isValid():
+            result = self.results_model.result(index.row())
+            self.result_activated.emit(result.model, result.id, result.title)
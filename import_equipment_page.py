@@ -0,0 +1,133 @@
+from PySide6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QFileDialog,
+    QProgressBar,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+)
+from PySide6.QtCore import QThread, Signal
+from db_import import EquipmentImporter, ImportProgress
+from db_managers import EquipmentManager
+from service_client import RemoteEquipmentImporter, RemoteManager
+
+# Keep the error list responsive for files where most rows fail
+MAX_DISPLAYED_ERRORS = 1000
+
+
+class ImportWorker(QThread):
+    progress = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, importer: EquipmentImporter, path: str, parent=None):
+        super().__init__(parent)
+        self.importer = importer
+        self.path = path
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.importer.run(self.path, progress=self.progress.emit, cancelled=self.isInterruptionRequested)
+            self.progress.emit(self.result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class ImportEquipmentPage(QWidget):
+    def __init__(self, manager: EquipmentManager):
+        super().__init__()
+        self.manager = manager
+        self.path = None
+        self.worker = None
+        self.displayed_errors = 0
+
+        self.file_label = QLabel("No file selected")
+        self.choose_button = QPushButton("Choose File...")
+        self.choose_button.clicked.connect(self.choose_file)
+        self.import_button = QPushButton("Import")
+        self.import_button.setEnabled(False)
+        self.import_button.clicked.connect(self.start_import)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_import)
+
+        file_layout = QHBoxLayout()
+        file_layout.addWidget(self.choose_button)
+        file_layout.addWidget(self.file_label, 1)
+        file_layout.addWidget(self.import_button)
+        file_layout.addWidget(self.cancel_button)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        self.status_label = QLabel("")
+
+        self.error_table = QTableWidget(0, 2)
+        self.error_table.setHorizontalHeaderLabels(["Row", "Error"])
+        self.error_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.error_table.verticalHeader().setVisible(False)
+
+        layout = QVBoxLayout()
+        layout.addLayout(file_layout)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.error_table)
+        self.setLayout(layout)
+
+    def choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Equipment", "", "Spreadsheets (*.csv *.xlsx)")
+        if path:
+            self.path = path
+            self.file_label.setText(path)
+            self.import_button.setEnabled(True)
+
+    def start_import(self):
+        self.error_table.setRowCount(0)
+        self.displayed_errors = 0
+        self.status_label.setText("Importing...")
+        self.progress_bar.setRange(0, 0)  # Busy indicator, the row count is not known up front
+        self.import_button.setEnabled(False)
+        self.choose_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+
+        importer_class = RemoteEquipmentImporter if isinstance(self.manager, RemoteManager) else EquipmentImporter
+        self.worker = ImportWorker(importer_class(self.manager), self.path, parent=self)
+        self.worker.progress.connect(self.show_progress)
+        self.worker.failed.connect(self.show_failure)
+        self.worker.finished.connect(self.import_finished)
+        self.worker.start()
+
+    def cancel_import(self):
+        if self.worker:
+            self.worker.requestInterruption()
+            self.cancel_button.setEnabled(False)
+
+    def show_progress(self, progress: ImportProgress):
+        self.status_label.setText(
+            f"{progress.rows_read} rows read, {progress.rows_imported} imported, "
+            f"{len(progress.errors)} errors ({progress.rows_per_second:.0f} rows/sec)"
+        )
+        new_errors = progress.errors[self.displayed_errors:MAX_DISPLAYED_ERRORS]
+        for error in new_errors:
+            row = self.error_table.rowCount()
+            self.error_table.insertRow(row)
+            self.error_table.setItem(row, 0, QTableWidgetItem(str(error.row_number)))
+            self.error_table.setItem(row, 1, QTableWidgetItem(error.message))
+        self.displayed_errors += len(new_errors)
+
+    def show_failure(self, message: str):
+        self.status_label.setText(f"Import failed: {message}")
+
+    def import_finished(self):
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(1)
+        self.choose_button.setEnabled(True)
+        self.import_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if self.worker.result is not None and self.worker.result.cancelled:
+            self.status_label.setText(self.status_label.text() + " - cancelled")
+        self.worker = None
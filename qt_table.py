@@ -5,8 +5,8 @@ from PySide6.QtWidgets import (
     QMainWindow,
     QVBoxLayout,
     QWidget,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
     QDialog,
     QFormLayout,
     QDialogButtonBox,
@@ -14,39 +14,743 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QMessageBox,
     QComboBox,
+    QProgressBar,
+    QFileDialog,
+    QProgressDialog,
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QObject, QThread, QTimer, Signal
+from PySide6.QtGui import QColor
+from array import array
+from collections import OrderedDict
+from db_export import EXPORT_FORMATS, ExportProgress, TableExporter
 from db_setup import *
 from qt_table_dialog import *
+from qt_table_delegate import CellEditDelegate
+from qt_workers import WriteBehindQueue, db_executor
+from search_index import SearchIndex
+from snapshot_cache import SnapshotCache, load_snapshot_rows
+
+# Tables with at most this many rows are loaded whole and searched in memory
+LOCAL_SEARCH_ROWS = 20_000
+
+# Row backgrounds for inline edits that are being saved, or that could not be saved
+ROW_MARKER_COLORS = {"pending": QColor("#FFF4CE"), "conflict": QColor("#FFE0B2"), "error": QColor("#FDE7E9")}
+
+
+def load_searchable_rows(manager: TableManager, limit: int, sort_field: str, descending: bool):
+    """
+    Loads every row of a table in order together with a search index over them, or returns
+    None if the table has more than ``limit`` rows.
+    """
+    if manager.count() > limit:
+        return None
+    rows = manager.query(sort_column=sort_field, descending=descending)
+    columns = {field: manager.schema.field_index[field] for field in manager.schema.editable_fields}
+    return rows, SearchIndex(columns, rows)
+
+
+class ManagerTableModel(QAbstractTableModel):
+    """
+    A table model that pages rows from a manager on demand.
+
+    Row ids are appended page by page through ``canFetchMore``/``fetchMore`` as the view
+    scrolls, and kept in a compact integer array. The row values themselves live in a
+    bounded LRU cache that holds the visible window plus a prefetch margin; rows that
+    have been evicted are fetched again by id when they scroll back into view.
+
+    Tables of at most ``local_rows`` rows are instead loaded whole, with a
+    :class:`SearchIndex`, and then searched and sorted in memory without queries. Given a
+    ``snapshot``, such tables are loaded from the local copy first and then updated with the
+    rows changed since it was last synced.
+
+    All queries run on the database executor. Rows that are not cached yet show as blank
+    until their window arrives, and ``busy_changed`` reports whether requests are pending.
+
+    An ``editable`` model lets the view edit cells in place. Edits are checked locally for
+    required and, while the whole table is loaded, unique values, shown right away and
+    saved in the background by a :class:`WriteBehindQueue`. Rows being saved, and rows
+    whose edits conflicted or failed, are marked with a background color and a tooltip.
+    """
+
+    busy_changed = Signal(bool)
+    change_received = Signal(object)
+
+    def __init__(
+        self,
+        manager: TableManager,
+        headers: list[str],
+        page_size: int = 200,
+        cache_pages: int = 5,
+        local_rows: int = LOCAL_SEARCH_ROWS,
+        snapshot: SnapshotCache = None,
+        editable: bool = False,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.executor = db_executor()
+        self.manager = manager
+        self.snapshot = snapshot
+        self.headers = headers
+        self.page_size = page_size
+        self.cache_size = page_size * cache_pages
+        self.local_rows = local_rows
+        self.search = ""
+        self.search_column = None
+        self.equals = {}
+        self.sort_field = "id"
+        self.descending = False
+        self._ids = array("q")
+        self._rows = OrderedDict()
+        self._exhausted = False
+        self._fetching = False
+        self._requested = set()
+        self._pending = 0
+        # Every id in sort order and the search index, while the whole table is loaded
+        self._index = None
+        self._order = array("q")
+        self._rank = {}
+        self._loading_local = False
+        # Values of edited cells not saved yet by row id and column, and the marker of each
+        # row being saved or that failed to save
+        self._edits: dict[int, dict] = {}
+        self._markers: dict[int, tuple[str, str]] = {}
+        self.writes = None
+        if editable:
+            self.writes = WriteBehindQueue(manager, parent=self)
+            self.writes.saved.connect(self._edit_saved)
+            self.writes.failed.connect(self._edit_failed)
+        # Change events may be emitted from worker threads, apply them on the GUI thread
+        self.change_received.connect(self.apply_change)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        flags = super().flags(index) & ~Qt.ItemIsEditable
+        if self.writes is not None and index.isValid() and self.field(index) in self.manager.schema.editable_fields:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def field(self, index) -> str:
+        return self.manager.schema.fields[index.column()]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.BackgroundRole, Qt.ToolTipRole):
+            marker = self._markers.get(self._ids[index.row()])
+            if marker is None:
+                return None
+            return ROW_MARKER_COLORS[marker[0]] if role == Qt.BackgroundRole else marker[1]
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        edited = self._edits.get(self._ids[index.row()])
+        if edited and index.column() in edited:
+            value = edited[index.column()]
+            return "" if value is None else str(value)
+        values = self.cached_values(index.row())
+        if values is None:
+            self._load_window(index.row())
+            return ""
+        value = values[index.column()]
+        return "" if value is None else str(value)
+
+    def begin_edit(self, index):
+        """
+        Called when an editor opens on a cell, reads the row's version so its edits are
+        saved only if nobody else changes the row first.
+        """
+        self.writes.track(self._ids[index.row()])
+
+    def setData(self, index, value, role=Qt.EditRole):
+        """
+        Checks an edited value, shows it and queues it to be saved. Values of foreign key
+        columns are given as ``(id, name)`` pairs, other values as the text entered.
+        """
+        if role != Qt.EditRole or not self.flags(index) & Qt.ItemIsEditable:
+            return False
+        obj_id, field = self._ids[index.row()], self.field(index)
+        if field in self.manager.related_names:
+            value, shown = value
+        else:
+            shown = value
+        if ("" if shown is None else str(shown)) == self.data(index):
+            return False
+        try:
+            if field not in self.manager.related_names:
+                value = shown = self.manager.convert({field: value})[field]
+            self.check_edit(obj_id, index.column(), value)
+        except ValidationError as e:
+            self._set_marker(obj_id, "error", str(e))
+            return False
+        self._edits.setdefault(obj_id, {})[index.column()] = shown
+        self.writes.edit(obj_id, field, value)
+        self._set_marker(obj_id, "pending", "Saving...")
+        self.dataChanged.emit(index, index)
+        return True
+
+    def check_edit(self, obj_id: int, column: int, value):
+        """
+        Checks an edited value against the required and unique constraints of its column.
+        Uniqueness is only checked while the whole table is loaded, the save checks it
+        against the database either way.
+
+        Raises:
+            ValidationError: If the value violates a constraint.
+        """
+        field = self.manager.schema.fields[column]
+        message = self.manager.schema.nullable_fields.get(field)
+        if message is not None:
+            errors = self.manager.find_nullable_violations([{field: value}], {field: message})
+            if errors:
+                raise errors[0]
+        message = self.manager.schema.unique_fields.get(field)
+        if message is None or self._index is None or value is None:
+            return
+        for other_id, values in self._rows.items():
+            edited = self._edits.get(other_id, {})
+            if other_id != obj_id and edited.get(column, values[column]) == value:
+                raise ValidationError(message.format(value=value), field=field)
+
+    def _edit_saved(self, obj_id: int, record: dict):
+        # Keep the saved values in the row, edits made since it was sent stay on top
+        still_pending = {self.manager.schema.field_index[field] for field in self.writes.pending_fields(obj_id)}
+        edited = self._edits.pop(obj_id, {})
+        saved = {column: value for column, value in edited.items() if column not in still_pending}
+        if still_pending:
+            self._edits[obj_id] = {column: value for column, value in edited.items() if column in still_pending}
+        values = self._rows.get(obj_id)
+        if values is not None and saved:
+            values = tuple(saved.get(column, value) for column, value in enumerate(values))
+            self._cache_row(values)
+            if self._index is not None:
+                self._index.update(values)
+        self._set_marker(obj_id, "pending" if self.writes.is_pending(obj_id) else None)
+
+    def _edit_failed(self, obj_id: int, error: Exception):
+        # Show the stored row again, with what kept the edits from being saved
+        self._edits.pop(obj_id, None)
+        if isinstance(error, ConflictError):
+            self._set_marker(obj_id, "conflict", str(error))
+        elif isinstance(error, ValidationError):
+            self._set_marker(obj_id, "error", str(error))
+        else:
+            self._set_marker(obj_id, "error", "The changes could not be saved.")
+        self.executor.submit(
+            self.manager,
+            lambda manager: manager.get_rows([obj_id]),
+            on_result=lambda rows: self.apply_change(
+                ChangeEvent(self.manager.model, ChangeEvent.UPDATE, [obj_id], {values[0]: values for values in rows})
+            ),
+        )
+
+    def _set_marker(self, obj_id: int, state: str = None, message: str = ""):
+        if state is None:
+            if self._markers.pop(obj_id, None) is None:
+                return
+        else:
+            self._markers[obj_id] = (state, message)
+        row = self.find_row(obj_id)
+        if row >= 0:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._fetching:
+            return
+        search, column, equals = self.search, self.search_column, self.equals
+        sort_field, descending = self.sort_field, self.descending
+        # Sorting by id pages by keyset, any other column by offset
+        offset = len(self._ids) if sort_field != "id" else None
+        after_id = self._ids[-1] if self._ids and sort_field == "id" else None
+        limit = self.page_size
+        self._fetching = True
+        self.request(
+            "page",
+            lambda manager: manager.query(
+                search=search,
+                column=column,
+                sort_column=sort_field,
+                descending=descending,
+                limit=limit,
+                offset=offset,
+                after_id=after_id,
+                equals=equals,
+            ),
+            self._append_page,
+        )
+
+    def _append_page(self, rows: list[tuple]):
+        self._fetching = False
+        self._exhausted = len(rows) < self.page_size
+        if not rows:
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._ids.extend(row[0] for row in rows)
+        for row in rows:
+            self._cache_row(row)
+        self.endInsertRows()
+
+    def request(self, kind: str, fn, on_result):
+        """
+        Runs a query for this model in the background, superseding any pending query of the
+        same kind.
+        """
+        self._pending += 1
+        if self._pending == 1:
+            self.busy_changed.emit(True)
+        self.executor.submit(self.manager, fn, key=(id(self), kind), on_result=on_result, on_done=self._request_done)
+
+    def is_busy(self) -> bool:
+        return self._pending > 0
+
+    def _request_done(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self.busy_changed.emit(False)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        sort_field = self.manager.schema.fields[column]
+        descending = order == Qt.DescendingOrder
+        if (sort_field, descending) == (self.sort_field, self.descending):
+            return
+        self.sort_field = sort_field
+        self.descending = descending
+        if self._index is not None:
+            self._sort_local()
+        elif not self._loading_local:
+            self._restart_paging()
+
+    def set_filter(self, search: str, column: str = None, equals: dict = None):
+        """
+        Restricts the model to rows matching ``search``, in one column label or in all of them,
+        and showing exactly the values of ``equals``, see :meth:`BaseManager.equals_clause`.
+        """
+        search = search.strip()
+        equals = dict(equals or {})
+        if (search, column, equals) == (self.search, self.search_column, self.equals):
+            return
+        self.search = search
+        self.search_column = column
+        self.equals = equals
+        # A table that is being loaded whole is filtered once it arrives
+        if self._index is not None:
+            self._filter_local()
+        elif not self._loading_local:
+            self._restart_paging()
+
+    def is_local(self) -> bool:
+        """
+        Returns whether the whole table is loaded, so searching and sorting need no queries.
+        """
+        return self._index is not None
+
+    def reload(self):
+        """
+        Drops every loaded row and loads the table again, whole if it has at most
+        ``local_rows`` rows and otherwise page by page.
+        """
+        self._clear_rows()
+        if not self.local_rows:
+            self.fetchMore()
+            return
+        limit, sort_field, descending, snapshot = self.local_rows, self.sort_field, self.descending, self.snapshot
+        self._loading_local = True
+        self._fetching = True
+        if snapshot is not None:
+            self.request("page", lambda manager: load_snapshot_rows(manager, snapshot, limit), self._set_snapshot)
+        else:
+            self.request("page", lambda manager: load_searchable_rows(manager, limit, sort_field, descending), self._set_local)
+
+    def _restart_paging(self):
+        self._clear_rows()
+        self.fetchMore()
+
+    def _clear_rows(self):
+        self.beginResetModel()
+        self._ids = array("q")
+        self._rows.clear()
+        self._requested = set()
+        self._exhausted = False
+        self._fetching = False
+        self._index = None
+        self._order = array("q")
+        self._rank = {}
+        self._loading_local = False
+        self.endResetModel()
+
+    def _set_local(self, result, in_order: bool = True):
+        self._loading_local = False
+        self._fetching = False
+        if result is None:
+            # Too many rows to keep, page them from the database with the current search
+            self.fetchMore()
+            return
+        rows, self._index = result
+        self._set_order(array("q", (values[0] for values in rows)))
+        for values in rows:
+            self._rows[values[0]] = values
+        self._exhausted = True
+        if in_order:
+            self._filter_local()
+        else:
+            self._sort_local()
+
+    def _set_snapshot(self, result):
+        # Snapshot rows are in id order and may be stale, show them and then fetch the changes
+        if result is None:
+            self._set_local(None)
+            return
+        rows, index, synced = result
+        self._set_local((rows, index), in_order=False)
+        if not synced:
+            snapshot = self.snapshot
+            self.request("sync", lambda manager: snapshot.sync(manager), self._apply_sync)
+
+    def _apply_sync(self, changes: TableChanges):
+        """
+        Applies the rows changed since the snapshot was taken as change events, so only the
+        rows that differ are updated, inserted or removed.
+        """
+        if self._index is None:
+            return
+        if changes.full:
+            # The snapshot was too old for a delta, rows missing from the full sync were deleted
+            present = {values[0] for values in changes.rows}
+            deleted = [obj_id for obj_id in self._rows if obj_id not in present]
+        else:
+            deleted = [obj_id for obj_id in changes.deleted if obj_id in self._rows]
+        # Changes from the sync overlap are usually already in the snapshot
+        rows = {values[0]: values for values in changes.rows if self._rows.get(values[0]) != values}
+        updated = [obj_id for obj_id in rows if obj_id in self._rows]
+        inserted = [obj_id for obj_id in rows if obj_id not in self._rows]
+        if deleted:
+            self.apply_change(ChangeEvent(self.manager.model, ChangeEvent.DELETE, deleted))
+        if updated:
+            self.apply_change(ChangeEvent(self.manager.model, ChangeEvent.UPDATE, updated, rows))
+        if inserted:
+            self.apply_change(ChangeEvent(self.manager.model, ChangeEvent.INSERT, inserted, rows))
+
+    def _filter_local(self):
+        ids = self._order
+        if self.equals:
+            rows = self._rows
+            ids = array("q", (obj_id for obj_id in ids if self.row_equals(rows[obj_id])))
+        if self.search:
+            column = self.manager.schema.to_field(self.search_column) if self.search_column else None
+            matched = self._index.search(self.search, column)
+            if len(matched) < len(ids) // 8:
+                # Ordering a few matches is cheaper than a pass over every row
+                ids = sorted(matched.intersection(ids) if self.equals else matched, key=self._rank.__getitem__)
+            elif len(matched) < len(self._index):
+                ids = filter(matched.__contains__, ids)
+        self.beginResetModel()
+        self._ids = array("q", ids)
+        self.endResetModel()
+
+    def _sort_local(self):
+        # Sort by id first, the stable sort then keeps id order among equal values like the
+        # database query does
+        order = sorted(self._order)
+        if self.sort_field != "id":
+            position = self.manager.schema.field_index[self.sort_field]
+            rows = self._rows
+            order.sort(key=lambda obj_id: (rows[obj_id][position] is not None, rows[obj_id][position]), reverse=self.descending)
+        elif self.descending:
+            order.reverse()
+        self._set_order(array("q", order))
+        self._filter_local()
+
+    def _set_order(self, order: array):
+        self._order = order
+        self._rank = {obj_id: rank for rank, obj_id in enumerate(order)}
+
+    def apply_change(self, event: ChangeEvent):
+        """
+        Applies a manager's change event with minimal row inserts, updates and removals,
+        keeping the loaded rows, sort and filter instead of reloading the whole table.
+        Events for many rows are applied as one block of changes, a reload event reloads.
+        """
+        if event.op == ChangeEvent.RELOAD:
+            self.reload()
+            return
+        if event.op == ChangeEvent.DELETE:
+            self._remove_rows(event.ids)
+            return
+        if self._index is not None:
+            self._index_change(event)
+        positions = self.find_rows(event.ids)
+        updated, removed, inserted = [], [], []
+        for obj_id in event.ids:
+            values = event.rows.get(obj_id)
+            if values is None:
+                # Deleted again before the event's rows were fetched
+                removed.append(obj_id)
+            elif obj_id in positions:
+                self._cache_row(values)
+                updated.append(positions[obj_id])
+            elif event.op == ChangeEvent.INSERT and self.row_matches(values):
+                inserted.append(values)
+        if updated:
+            self.dataChanged.emit(self.index(min(updated), 0), self.index(max(updated), self.columnCount() - 1))
+        self._remove_rows(removed)
+        self._insert_rows(inserted)
+
+    def _index_change(self, event: ChangeEvent):
+        # Keep every row, the search index and the full order of a whole loaded table up to
+        # date, new rows are placed the same way as among the shown rows
+        new_ids = []
+        for obj_id in event.ids:
+            values = event.rows.get(obj_id)
+            if values is None:
+                continue
+            if obj_id not in self._rows:
+                new_ids.append(obj_id)
+            self._rows[obj_id] = values
+            self._index.update(values)
+        if event.op == ChangeEvent.INSERT and new_ids:
+            if self.sort_field == "id" and self.descending:
+                new_ids.sort(reverse=True)
+                self._order[0:0] = array("q", new_ids)
+                first = min(self._rank.values(), default=0) - len(new_ids)
+            else:
+                new_ids.sort()
+                self._order.extend(new_ids)
+                first = max(self._rank.values(), default=-1) + 1
+            self._rank.update((obj_id, first + offset) for offset, obj_id in enumerate(new_ids))
+
+    def find_row(self, obj_id: int) -> int:
+        """
+        Returns the row of an id among the loaded rows, or -1 if it is not loaded.
+        """
+        try:
+            return self._ids.index(obj_id)
+        except ValueError:
+            return -1
+
+    def find_rows(self, obj_ids) -> dict[int, int]:
+        """
+        Maps the given ids to their rows among the loaded rows, in one pass over the ids.
+        """
+        wanted = set(obj_ids)
+        if len(wanted) == 1:
+            row = self.find_row(next(iter(wanted)))
+            return {self._ids[row]: row} if row >= 0 else {}
+        return {obj_id: row for row, obj_id in enumerate(self._ids) if obj_id in wanted}
+
+    def row_matches(self, values: tuple) -> bool:
+        """
+        Checks a row against the current search the same way the manager's query does.
+        """
+        if not self.row_equals(values):
+            return False
+        if not self.search:
+            return True
+        if self.search_column:
+            columns = [self.manager.schema.field_index[self.manager.schema.to_field(self.search_column)]]
+        else:
+            columns = [self.manager.schema.field_index[field] for field in self.manager.schema.editable_fields]
+        search = self.search.lower()
+        return any(values[column] is not None and search in str(values[column]).lower() for column in columns)
+
+    def row_equals(self, values: tuple) -> bool:
+        """
+        Checks a row against the exact values of the current filter, see :meth:`set_filter`.
+        """
+        schema = self.manager.schema
+        for name, value in self.equals.items():
+            shown = values[schema.field_index[schema.to_field(name)]]
+            if shown != value and not (value is None and shown == ""):
+                return False
+        return True
+
+    def _insert_rows(self, rows: list[tuple]):
+        # New rows belong on top when sorted by descending id and at the end when sorted
+        # by ascending id, other orders only place them once every row is loaded
+        if not rows:
+            return
+        if self.sort_field == "id" and self.descending:
+            first = 0
+            rows = sorted(rows, key=lambda values: values[0], reverse=True)
+        elif self._exhausted:
+            first = len(self._ids)
+            rows = sorted(rows, key=lambda values: values[0]) if self.sort_field == "id" else rows
+        else:
+            return
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._ids[first:first] = array("q", (values[0] for values in rows))
+        for values in rows:
+            self._cache_row(values)
+        self.endInsertRows()
+
+    def _remove_rows(self, obj_ids):
+        for obj_id in obj_ids:
+            self._rows.pop(obj_id, None)
+        if self._index is not None and obj_ids:
+            for obj_id in obj_ids:
+                self._index.remove(obj_id)
+            removed = set(obj_ids)
+            self._order = array("q", (obj_id for obj_id in self._order if obj_id not in removed))
+        rows = sorted(self.find_rows(obj_ids).values())
+        # Remove contiguous runs of rows together, starting from the bottom
+        end = len(rows)
+        while end:
+            start = end - 1
+            while start and rows[start - 1] == rows[start] - 1:
+                start -= 1
+            self.beginRemoveRows(QModelIndex(), rows[start], rows[end - 1])
+            del self._ids[rows[start]:rows[end - 1] + 1]
+            self.endRemoveRows()
+            end = start
+
+    def row_id(self, row: int) -> int:
+        return self._ids[row]
+
+    def cached_values(self, row: int):
+        """
+        Returns the values of a row if they are cached, or None.
+        """
+        values = self._rows.get(self._ids[row])
+        if values is not None:
+            self._rows.move_to_end(values[0])
+        return values
+
+    def _load_window(self, row: int):
+        # Fetch the page around the row, a newer window request supersedes this one
+        if self._ids[row] in self._requested:
+            return
+        start = max(0, row - self.page_size // 2)
+        window = self._ids[start:start + self.page_size]
+        missing = [obj_id for obj_id in window if obj_id not in self._rows]
+        self._requested = set(missing)
+        self.request("window", lambda manager: manager.get_rows(missing), self._cache_window)
+
+    def _cache_window(self, rows: list[tuple]):
+        self._requested = set()
+        for values in rows:
+            self._cache_row(values)
+        if self._ids:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._ids) - 1, self.columnCount() - 1))
+
+    def _cache_row(self, values: tuple):
+        self._rows[values[0]] = values
+        self._rows.move_to_end(values[0])
+        # A whole loaded table keeps every row
+        while self._index is None and len(self._rows) > self.cache_size:
+            self._rows.popitem(last=False)
+
+
+class ChangeDispatcher(QObject):
+    """
+    Delivers coalesced change notifications from other clients to the managers on the GUI
+    thread, where they become targeted row refreshes in any open table. ``reload_requested``
+    makes every manager report a reload, for changes that may have been missed.
+    """
+
+    changes_received = Signal(object)
+    reload_requested = Signal()
+
+    def __init__(self, managers: list[TableManager], parent=None):
+        super().__init__(parent)
+        self.managers = {manager.model.__tablename__: manager for manager in managers}
+        self.changes_received.connect(self.dispatch)
+        self.reload_requested.connect(self.reload)
+
+    def reload(self):
+        for manager in self.managers.values():
+            manager.emit_change(ChangeEvent.RELOAD, [])
+
+    def dispatch(self, changes: dict):
+        for table_name, ops in changes.items():
+            manager = self.managers.get(table_name)
+            if manager is None:
+                continue
+            for op, ids in ops.items():
+                db_executor().submit(manager, lambda manager, op=op, ids=ids: manager.emit_change(op, ids))
+
+
+class ExportWorker(QThread):
+    progress = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, exporter: TableExporter, path: str, filters: dict, parent=None):
+        super().__init__(parent)
+        self.exporter = exporter
+        self.path = path
+        self.filters = filters
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.exporter.run(self.path, progress=self.progress.emit, cancelled=self.isInterruptionRequested, **self.filters)
+        except Exception as e:
+            self.failed.emit(str(e))
+
 
 class SimpleTable(QWidget):
-    def __init__(self, manager, title, columns, dialog_class: BaseDialog):
+    def __init__(self, manager, title, dialog_class: type[BaseDialog]):
         super().__init__()
         self.manager = manager
         self.title = title
-        self.columns = columns
+        # The model's labels, the first one is the hidden id column
+        self.columns = manager.schema.labels
         self.dialog_class = dialog_class
-        self.pre_focus_field = False
+        self.export_worker = None
+        # The id of a row to select once it is loaded, see show_row
+        self.pending_row = None
+        # Column labels and the exact values they must show, see show_group
+        self.group_filter = {}
 
         self.init_ui()
 
     def init_ui(self):
         self.setWindowTitle(self.title)
         
-        # Create table widget
-        self.table_widget = QTableWidget()
-        self.table_widget.setSortingEnabled(True)
+        # Create table view backed by a lazily paged model
+        self.table_model = ManagerTableModel(self.manager, self.columns, snapshot=get_snapshot_cache(), editable=True, parent=self)
+        self.table_widget = QTableView()
+        self.table_widget.setModel(self.table_model)
+        # Cells are edited in place, the Edit button opens the whole row in a dialog
+        self.table_widget.setItemDelegate(CellEditDelegate(self.table_widget))
+        self.table_widget.setEditTriggers(
+            QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed | QAbstractItemView.AnyKeyPressed
+        )
+        self.table_widget.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.table_widget.horizontalHeader().setSectionsClickable(True)
-        self.table_widget.horizontalHeader().sectionClicked.connect(self.sort_table)
-        self.table_widget.itemSelectionChanged.connect(self.update_button_states)
-        self.table_widget.cellDoubleClicked.connect(self.handle_cell_double_click)
-        
+        self.table_widget.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        self.table_widget.selectionModel().selectionChanged.connect(self.update_button_states)
+
+        # Writes made through the manager update the model row by row
+        manager, listener = self.manager, self.table_model.change_received.emit
+        manager.subscribe(listener)
+        self.destroyed.connect(lambda: manager.unsubscribe(listener))
+        self.table_model.modelReset.connect(self.select_pending_row)
+        self.table_model.rowsInserted.connect(self.select_pending_row)
+
         self.load_data()
+        self.table_widget.setSortingEnabled(True)
 
         # Create search bar and column selector
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Search...")
-        self.search_bar.textChanged.connect(self.filter_table)
+        # Wait for a pause in typing before running the search query
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.filter_table)
+        self.search_bar.textChanged.connect(self.on_search_edited)
 
         self.column_selector = QComboBox()
         self.column_selector.addItems(["All Columns"] + self.columns[1:])
@@ -58,6 +762,22 @@ class SimpleTable(QWidget):
         self.search_layout.addWidget(QLabel("In Column:"))
         self.search_layout.addWidget(self.column_selector)
 
+        # Shows the exact value the table is filtered to, clicking it clears the filter
+        self.group_button = QPushButton()
+        self.group_button.setToolTip("Show all rows")
+        self.group_button.clicked.connect(self.clear_group)
+        self.group_button.hide()
+        self.search_layout.addWidget(self.group_button)
+
+        # Busy indicator while the model waits for the database
+        self.busy_indicator = QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(80)
+        self.busy_indicator.setTextVisible(False)
+        self.busy_indicator.setVisible(self.table_model.is_busy())
+        self.table_model.busy_changed.connect(self.busy_indicator.setVisible)
+        self.search_layout.addWidget(self.busy_indicator)
+
         # Create and connect buttons
         self.edit_button = QPushButton("Edit")
         self.edit_button.clicked.connect(self.edit_selected_entry)
@@ -67,6 +787,8 @@ class SimpleTable(QWidget):
         self.delete_button.clicked.connect(self.delete_entry)
         self.duplicate_button = QPushButton("Duplicate")
         self.duplicate_button.clicked.connect(self.duplicate_entry)
+        self.export_button = QPushButton("Export...")
+        self.export_button.clicked.connect(self.export_table)
 
         # Disable the edit, delete, and duplicate buttons initially
         self.edit_button.setEnabled(False)
@@ -83,6 +805,7 @@ class SimpleTable(QWidget):
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.delete_button)
         button_layout.addWidget(self.duplicate_button)
+        button_layout.addWidget(self.export_button)
         button_layout.addStretch()
 
         # Create main layout
@@ -122,127 +845,250 @@ class SimpleTable(QWidget):
         self.add_button.setStyleSheet(button_style)
         self.delete_button.setStyleSheet(button_style)
         self.duplicate_button.setStyleSheet(button_style)
+        self.export_button.setStyleSheet(button_style)
 
     def load_data(self):
-        self.table_widget.blockSignals(True)
-        prepared_rows_of_field_value_pairs = self.manager.create_pairs_for_table()
-        if len(prepared_rows_of_field_value_pairs) == 0:
-            self.table_widget.setRowCount(0)
-            self.table_widget.setColumnCount(0)
-            self.table_widget.setHorizontalHeaderLabels([])
-            self.table_widget.blockSignals(False)
-            return
-        
-        self.table_widget.setRowCount(len(prepared_rows_of_field_value_pairs))
-        self.table_widget.setColumnCount(len(prepared_rows_of_field_value_pairs[0]))
-        self.table_widget.setHorizontalHeaderLabels([pair[0] for pair in prepared_rows_of_field_value_pairs[0]])
-
-        for row_no, field_value_pairs in enumerate(prepared_rows_of_field_value_pairs):
-            for col_no, pair in enumerate(field_value_pairs):
-                cell = QTableWidgetItem(str(pair[1]))
-                cell.setFlags(cell.flags() & ~Qt.ItemIsEditable)
-                self.table_widget.setItem(row_no, col_no, cell)
-
+        self.table_model.reload()
         self.table_widget.setColumnHidden(0, True)  # Hide the ID column
-        self.table_widget.blockSignals(False)
 
-    def sort_table(self, index):
-        self.table_widget.sortItems(index, Qt.AscendingOrder if self.table_widget.horizontalHeader().sortIndicatorOrder() == Qt.AscendingOrder else Qt.DescendingOrder)
+    def on_search_edited(self):
+        # Searches in memory are instant, database searches wait for a pause in typing
+        if self.table_model.is_local():
+            self.filter_table()
+        else:
+            self.search_timer.start()
 
     def filter_table(self):
-        filter_text = self.search_bar.text().strip().lower()
+        self.search_timer.stop()
         column = self.column_selector.currentIndex()  # This will give the index relative to the combo box
+        self.table_model.set_filter(self.search_bar.text(), self.columns[column] if column > 0 else None, self.group_filter)
 
-        for i in range(self.table_widget.rowCount()):
-            row_matches = False
-            for col in range(1, self.table_widget.columnCount()):
-                item = self.table_widget.item(i, col)
-                if column == 0:  # All Columns
-                    if filter_text in item.text().strip().lower():
-                        row_matches = True
-                        break
-                elif col == column:  # Specific Column
-                    if filter_text in item.text().strip().lower():
-                        row_matches = True
-                        break
-            if row_matches:
-                self.table_widget.showRow(i)
-            else:
-                self.table_widget.hideRow(i)
+    def show_row(self, obj_id: int, name: str):
+        """
+        Selects the row of ``obj_id``. A row that is not loaded yet is searched for by
+        ``name`` in the first column and selected once it arrives.
+        """
+        self.pending_row = obj_id
+        if self.select_pending_row():
+            return
+        self.show_filtered(self.columns[1], name)
+
+    def show_filtered(self, column: str, text: str):
+        """
+        Filters the table to the rows whose ``column`` contains ``text``.
+        """
+        self.set_group({})
+        # Set the column and the text without their signals, so the table is filtered once
+        self.column_selector.blockSignals(True)
+        self.column_selector.setCurrentIndex(max(0, self.column_selector.findText(column)))
+        self.column_selector.blockSignals(False)
+        self.search_bar.blockSignals(True)
+        self.search_bar.setText(text)
+        self.search_bar.blockSignals(False)
+        self.filter_table()
+
+    def show_group(self, column: str, value):
+        """
+        Filters the table to the rows whose ``column`` shows exactly ``value``, or no value
+        when ``value`` is None, and clears the search.
+        """
+        self.set_group({column: value})
+        self.search_bar.blockSignals(True)
+        self.search_bar.clear()
+        self.search_bar.blockSignals(False)
+        self.column_selector.blockSignals(True)
+        self.column_selector.setCurrentIndex(0)
+        self.column_selector.blockSignals(False)
+        self.filter_table()
 
-    def handle_cell_double_click(self, row, column):
-        self.pre_focus_field = True
-        self.edit_entry(row=row, column=column)
-        self.pre_focus_field = False
+    def clear_group(self):
+        self.set_group({})
+        self.filter_table()
+
+    def set_group(self, group_filter: dict):
+        self.group_filter = group_filter
+        shown = ", ".join(f"{column}: {'(none)' if value is None else value}" for column, value in group_filter.items())
+        self.group_button.setText(f"{shown} \u2715")
+        self.group_button.setVisible(bool(group_filter))
+
+    def select_pending_row(self) -> bool:
+        if self.pending_row is None:
+            return False
+        row = self.table_model.find_row(self.pending_row)
+        if row < 0:
+            # The name may match more rows than one page holds
+            if self.table_model.canFetchMore():
+                self.table_model.fetchMore()
+            return False
+        self.pending_row = None
+        self.table_widget.selectRow(row)
+        self.table_widget.scrollTo(self.table_model.index(row, 1))
+        self.table_widget.setFocus()
+        return True
 
     def edit_selected_entry(self):
-        self.edit_entry()
+        obj_ids = self.selected_ids()
+        if len(obj_ids) > 1:
+            BulkEditDialog(self.title, obj_ids, self.manager, parent=self).exec()
+        else:
+            self.edit_entry()
+
+    def selected_row(self) -> int:
+        index = self.table_widget.currentIndex()
+        return index.row() if index.isValid() and self.table_widget.selectionModel().hasSelection() else -1
+
+    def selected_ids(self) -> list[int]:
+        rows = sorted(index.row() for index in self.table_widget.selectionModel().selectedRows())
+        return [self.table_model.row_id(row) for row in rows]
+
+    def row_fields(self, values: tuple) -> dict:
+        return {self.columns[col]: "" if values[col] is None else str(values[col]) for col in range(1, len(self.columns))}
+
+    def with_row_fields(self, row: int, callback):
+        """
+        Calls ``callback`` with the fields of a row, fetching the row first if it is not cached.
+        """
+        values = self.table_model.cached_values(row)
+        if values is not None:
+            callback(self.row_fields(values))
+            return
+        obj_id = self.table_model.row_id(row)
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.get_rows([obj_id]),
+            on_result=lambda rows: rows and callback(self.row_fields(rows[0])),
+            on_error=self.show_error,
+        )
+
+    def show_error(self, error: Exception):
+        QMessageBox.warning(self, "Error", str(error) if isinstance(error, ValidationError) else "Unexpected error occurred")
 
     def edit_entry(self, row=None, column=None):
-        selected_row = self.table_widget.currentRow() if row is None else row
-        selected_column = self.table_widget.currentColumn() if column is None else column
+        selected_row = self.selected_row() if row is None else row
+        selected_column = self.table_widget.currentIndex().column() if column is None else column
 
         if selected_row < 0:
             QMessageBox.warning(self, "No selection", "Please select a row to edit")
             return
 
-        id_item = self.table_widget.item(selected_row, 0)
-        fields = {self.columns[col]: self.table_widget.item(selected_row, col).text() for col in range(1, self.table_widget.columnCount())}
+        obj_id = self.table_model.row_id(selected_row)
+        focused_field = self.columns[selected_column] if selected_column > 0 else None
+
+        def open_dialog(result):
+            if result is None:
+                QMessageBox.warning(self, "Error", "This entry was deleted by someone else.")
+                return
+            # The row is read again with its version rather than taken from the cache, so the
+            # dialog starts from its current values and saving fails if it changes meanwhile
+            values, version = result
+            dialog = self.dialog_class(
+                title=self.title,
+                id=obj_id,
+                parent=self,
+                fields=self.row_fields(values),
+                focused_field=focused_field,
+                version=version,
+            )
+            dialog.exec()
 
-        dialog = self.dialog_class(
-            title=self.title,
-            id=int(id_item.text()),
-            parent=self,
-            fields=fields,
-            focused_field=self.columns[selected_column] if self.pre_focus_field else None
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.get_versioned_row(obj_id),
+            key=(id(self), "edit"),
+            on_result=open_dialog,
+            on_error=self.show_error,
         )
-        if dialog.exec():
-            self.load_data()
 
     def add_entry(self):
         dialog = self.dialog_class(title=self.title, parent=self, fields={col: "" for col in self.columns[1:]})
-        if dialog.exec():
-            self.load_data()
+        dialog.exec()
 
     def delete_entry(self):
-        selected_row = self.table_widget.currentRow()
-        if selected_row < 0:
+        obj_ids = self.selected_ids()
+        if not obj_ids:
             QMessageBox.warning(self, "No selection", "Please select a row to delete")
             return
 
         response = QMessageBox.question(
             self,
             "Confirm Delete",
-            "Are you sure you want to delete this entry?",
+            "Are you sure you want to delete this entry?" if len(obj_ids) == 1 else f"Are you sure you want to delete these {len(obj_ids)} entries?",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
         if response == QMessageBox.StandardButton.Yes:
-            id_item = self.table_widget.item(selected_row, 0)
-            obj_id = int(id_item.text())
-            self.manager.delete(obj_id)
-            self.load_data()
+            db_executor().submit(self.manager, lambda manager: manager.delete_many(obj_ids), on_error=self.show_error)
 
     def duplicate_entry(self):
-        selected_row = self.table_widget.currentRow()
-        if selected_row < 0:
+        obj_ids = self.selected_ids()
+        if not obj_ids:
             QMessageBox.warning(self, "No selection", "Please select a row to duplicate")
             return
+        if len(obj_ids) > 1:
+            # Copies get " (copy)" appended to their unique fields
+            db_executor().submit(self.manager, lambda manager: manager.duplicate_many(obj_ids), on_error=self.show_error)
+            return
+        selected_row = self.table_model.find_row(obj_ids[0])
 
-        id_item = self.table_widget.item(selected_row, 0)
-        fields = {self.columns[col]: self.table_widget.item(selected_row, col).text() for col in range(1, self.table_widget.columnCount())}
+        def open_dialog(fields):
+            dialog = self.dialog_class(
+                title=self.title,
+                id=None,  # New entry
+                parent=self,
+                fields=fields,
+            )
+            dialog.exec()
 
+        self.with_row_fields(selected_row, open_dialog)
 
-        dialog = self.dialog_class(
-            title=self.title,
-            id=None,  # New entry
-            parent=self,
-            fields=fields,
-        )
-        if dialog.exec():
-            self.load_data()
+    def hideEvent(self, event):
+        # Save queued cell edits when switching away instead of waiting for the interval
+        self.table_model.writes.flush()
+        super().hideEvent(event)
+
+    def export_table(self):
+        """
+        Exports the rows matching the current search, in the current order, in the background.
+        """
+        file_filter = ";;".join(f"{name} (*{extension})" for extension, name in EXPORT_FORMATS.items())
+        path, _ = QFileDialog.getSaveFileName(self, f"Export {self.title}", f"{self.title}.csv", file_filter)
+        if not path:
+            return
+        model = self.table_model
+        filters = {
+            "search": model.search,
+            "column": model.search_column,
+            "sort_column": model.sort_field,
+            "descending": model.descending,
+            "equals": model.equals,
+        }
+        self.export_worker = ExportWorker(TableExporter(self.manager), path, filters, parent=self)
+
+        # The row count is only known once the export has counted the matching rows
+        self.export_progress = QProgressDialog(f"Exporting {self.title}...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle(f"Export {self.title}")
+        self.export_progress.setMinimumDuration(500)
+        self.export_progress.canceled.connect(self.export_worker.requestInterruption)
+        self.export_worker.progress.connect(self.show_export_progress)
+        self.export_worker.failed.connect(lambda message: QMessageBox.warning(self, f"Export {self.title}", f"Could not export to {path}: {message}"))
+        self.export_worker.finished.connect(self.export_finished)
+        self.export_button.setEnabled(False)
+        self.export_worker.start()
+
+    def show_export_progress(self, progress: ExportProgress):
+        if progress.total_rows:
+            self.export_progress.setMaximum(progress.total_rows)
+        self.export_progress.setValue(min(progress.rows_written, self.export_progress.maximum()))
+        self.export_progress.setLabelText(f"{progress.rows_written} of {progress.total_rows} rows written ({progress.rows_per_second:.0f} rows/sec)")
+
+    def export_finished(self):
+        self.export_progress.reset()
+        self.export_progress.deleteLater()
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_button.setEnabled(True)
 
     def update_button_states(self):
-        has_selection = bool(self.table_widget.selectedItems())
+        has_selection = self.table_widget.selectionModel().hasSelection()
         self.edit_button.setEnabled(has_selection)
         self.delete_button.setEnabled(has_selection)
         self.duplicate_button.setEnabled(has_selection)
@@ -250,11 +1096,9 @@ class SimpleTable(QWidget):
 
 class AreaCodeTable(SimpleTable):
     def __init__(self):
-        columns = ["ID", "Area Code", "Description"]
-        super().__init__(AREA_CODE_MANAGER, "Area Codes", columns, AreaCodeDialog)
+        super().__init__(AREA_CODE_MANAGER, "Area Codes", dialog_class=AreaCodeDialog)
 
 
 class DeviceTypeTable(SimpleTable):
     def __init__(self):
-        columns = ["ID", "Device Type", "Description"]
-        super().__init__(DEVICE_TYPE_MANAGER, "Device Types", columns, DeviceTypeDialog)
+        super().__init__(DEVICE_TYPE_MANAGER, "Device Types", dialog_class=DeviceTypeDialog)
@@ -0,0 +1,62 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QIntValidator
+from PySide6.QtWidgets import QComboBox, QLineEdit, QStyledItemDelegate
+from sqlalchemy import Integer
+from qt_workers import db_executor
+
+
+class CellEditDelegate(QStyledItemDelegate):
+    """
+    Edits the cells of a :class:`ManagerTableModel` in place with an editor suited to each
+    column: foreign keys are picked by name from the rows they can refer to, whole number
+    columns only accept digits, and text columns are edited as text.
+    """
+
+    def createEditor(self, parent, option, index):
+        model = index.model()
+        model.begin_edit(index)
+        field = model.field(index)
+        if field in model.manager.related_names:
+            editor = QComboBox(parent)
+            self.load_choices(model.manager, field, editor)
+            return editor
+        editor = QLineEdit(parent)
+        if isinstance(model.manager.schema.column_types[field], Integer):
+            editor.setValidator(QIntValidator(editor))
+        return editor
+
+    def load_choices(self, manager, field: str, combo: QComboBox):
+        """
+        Fills a foreign key picker in the background, selecting the name the cell shows.
+        """
+        combo.setEnabled(False)
+        # The editor is deleted when editing ends, which may be before the choices arrive
+        closed = []
+        combo.destroyed.connect(lambda: closed.append(True))
+
+        def fill(choices):
+            if closed:
+                return
+            combo.addItem("", None)
+            for obj_id, name in choices:
+                combo.addItem(name, obj_id)
+            combo.setCurrentIndex(max(0, combo.findText(combo.property("selected_name") or "")))
+            combo.setEnabled(True)
+
+        db_executor().submit(manager, lambda manager: manager.related_choices(field), key=(id(combo), "choices"), on_result=fill)
+
+    def setEditorData(self, editor, index):
+        value = index.data(Qt.EditRole)
+        if isinstance(editor, QComboBox):
+            editor.setProperty("selected_name", value)
+            editor.setCurrentIndex(max(0, editor.findText(value)))
+        else:
+            editor.setText(value)
+
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QComboBox):
+            # A picker whose choices are still loading keeps the cell's value
+            if editor.count():
+                model.setData(index, (editor.currentData(), editor.currentText() or None), Qt.EditRole)
+        else:
+            model.setData(index, editor.text(), Qt.EditRole)
@@ -1,23 +1,51 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QLineEdit, QLabel, QDialogButtonBox, QMessageBox
-from db_managers import BaseManager
+import logging
+import shiboken6
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QLineEdit, QLabel, QDialogButtonBox, QMessageBox, QComboBox, QCheckBox
+from db_managers import TableManager
 from db_setup import AREA_CODE_MANAGER, EQUIPMENT_MANAGER, DEVICE_TYPE_MANAGER, ValidationError
+from qt_workers import db_executor
+
+logger = logging.getLogger(__name__)
 
 class BaseDialog(QDialog):
-    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, manager: BaseManager = None, focused_field: str = None):
+    def __init__(
+        self,
+        title: str,
+        id: int = None,
+        parent=None,
+        fields: dict = None,
+        manager: TableManager = None,
+        focused_field: str = None,
+        version: int = None,
+    ):
         super().__init__(parent=parent)
         self.setWindowTitle(title)
         self.id = id
         self.manager = manager
+        # The version the row was read at and its values then, an edit only sends the fields
+        # that differ from them and fails if the row has changed since
+        self.version = version
+        self.initial_fields = dict(fields)
         self.fields = []
         self.focused_field = focused_field
         self.field_widgets = {}
+        # Keys this dialog's background tasks, unlike id(self) it is never reused by a later dialog
+        self.task_key = object()
+        self.choice_keys = []
+        self.finished.connect(self.cancel_choices)
         self.error_label = QLabel("")
         self.error_label.setStyleSheet("color: red")
 
         form_layout = QFormLayout()
         for label, value in fields.items():
-            field_edit = QLineEdit(value)
-            form_layout.addRow(QLabel(label + ":"), field_edit)
+            field_name = manager.schema.to_field(label)
+            if field_name in manager.related_names:
+                # Foreign keys are picked by name from the rows they can refer to
+                field_edit = QComboBox()
+                self.load_choices(field_name, field_edit, value)
+            else:
+                field_edit = QLineEdit(value)
+            form_layout.addRow(self.make_label(label, field_edit), field_edit)
             self.fields.append(field_edit)
             self.field_widgets[label] = field_edit
 
@@ -39,41 +67,171 @@ class BaseDialog(QDialog):
         elif self.fields:
             self.fields[0].setFocus()
 
+    def make_label(self, label: str, field_edit):
+        return QLabel(label + ":")
+
+    def load_choices(self, field_name: str, combo: QComboBox, selected_name: str):
+        """
+        Fills a foreign key picker in the background and selects the entry named ``selected_name``.
+        """
+        combo.setEnabled(False)
+
+        def fill(choices):
+            if not shiboken6.isValid(combo):
+                return
+            combo.addItem("", None)
+            for obj_id, name in choices:
+                combo.addItem(name, obj_id)
+            combo.setCurrentIndex(max(0, combo.findText(selected_name or "")))
+            combo.setEnabled(self.button_box.isEnabled())
+
+        key = (self.task_key, "choices", field_name)
+        self.choice_keys.append(key)
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.related_choices(field_name),
+            key=key,
+            on_result=fill,
+            on_error=self.on_save_failed,
+        )
+
+    def cancel_choices(self):
+        # The pickers close with the dialog, drop the choices still loading for them
+        for key in self.choice_keys:
+            db_executor().cancel(key)
+
     def get_data(self):
         """
-        Get the data from the fields and return a dictionary of the data
+        Get the data from the fields and return a dictionary of field names to typed values
         """
-        data = {}
-        for field, value in zip(self.manager.model._fields_map.values(), self.fields):
-            data[field] = value.text()
-        return data
+        return self.manager.convert({label: self.widget_value(widget) for label, widget in self.field_widgets.items()})
+
+    def get_changes(self):
+        """
+        Get the fields edited since the dialog opened as a dictionary of field names to typed values
+        """
+        return self.manager.convert(
+            {
+                label: self.widget_value(widget)
+                for label, widget in self.field_widgets.items()
+                if self.is_changed(label, widget)
+            }
+        )
+
+    def is_changed(self, label: str, widget) -> bool:
+        if isinstance(widget, QComboBox):
+            # A picker whose choices are still loading keeps its value
+            return widget.count() > 0 and widget.currentText() != self.initial_fields[label]
+        return widget.text() != self.initial_fields[label]
+
+    @staticmethod
+    def widget_value(widget):
+        return widget.currentData() if isinstance(widget, QComboBox) else widget.text()
 
     def on_accept(self):
-        data = self.get_data()
         try:
-            if self.id is None:
-                new_object = self.manager.model(**data)
-                self.manager.add(new_object)
-            else:
-                self.manager.update(self.id, data)
-            self.accept()
+            data = self.get_data() if self.id is None else self.get_changes()
         except ValidationError as e:
             self.error_label.setText(str(e))
-        except Exception as e:
+            return
+
+        obj_id, version = self.id, self.version
+        if obj_id is None:
+            save = lambda manager: manager.add(manager.model(**data))
+        elif not data:
+            self.accept()
+            return
+        else:
+            save = lambda manager: manager.update(obj_id, data, version=version)
+        self.set_busy(True)
+        db_executor().submit(self.manager, save, key=(self.task_key, "save"), on_result=self.on_saved, on_error=self.on_save_failed)
+
+    def on_saved(self, result):
+        self.set_busy(False)
+        self.accept()
+
+    def on_save_failed(self, error: Exception):
+        self.set_busy(False)
+        if isinstance(error, ValidationError):
+            self.error_label.setText(str(error))
+        else:
             self.error_label.setText("Unexpected error occurred")
-            raise e
+            logger.error("Saving %s failed", self.manager.model.__name__, exc_info=error)
+
+    def set_busy(self, busy: bool):
+        self.button_box.setEnabled(not busy)
+        for field_edit in self.fields:
+            if isinstance(field_edit, QComboBox):
+                field_edit.setEnabled(not busy and field_edit.count() > 0)
+            else:
+                field_edit.setReadOnly(busy)
+        if busy:
+            self.error_label.setText("Saving...")
 
 
 class AreaCodeDialog(BaseDialog):
-    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None):
-        super().__init__(id=id, title=title, parent=parent, fields=fields, manager=AREA_CODE_MANAGER, focused_field=focused_field)
+    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None, version: int = None):
+        super().__init__(
+            id=id, title=title, parent=parent, fields=fields, manager=AREA_CODE_MANAGER, focused_field=focused_field, version=version
+        )
 
 
 class EquipmentDialog(BaseDialog):
-    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None):
-        super().__init__(id=id, title=title, parent=parent, fields=fields, manager=EQUIPMENT_MANAGER, focused_field=focused_field)
+    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None, version: int = None):
+        super().__init__(
+            id=id, title=title, parent=parent, fields=fields, manager=EQUIPMENT_MANAGER, focused_field=focused_field, version=version
+        )
 
 
 class DeviceTypeDialog(BaseDialog):
-    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None):
-        super().__init__(id=id, title=title, parent=parent, fields=fields, manager=DEVICE_TYPE_MANAGER, focused_field=focused_field)
+    def __init__(self, title: str, id: int = None, parent=None, fields: dict = None, focused_field: str = None, version: int = None):
+        super().__init__(
+            id=id, title=title, parent=parent, fields=fields, manager=DEVICE_TYPE_MANAGER, focused_field=focused_field, version=version
+        )
+
+
+class BulkEditDialog(BaseDialog):
+    """
+    Sets the checked fields to the same value on several rows at once, in one transaction.
+    Editing a field checks it.
+    """
+
+    def __init__(self, title: str, ids: list[int], manager: TableManager, parent=None):
+        self.checks = {}
+        fields = {manager.schema.field_to_label[field]: "" for field in manager.schema.editable_fields}
+        super().__init__(title=f"{title} - Edit {len(ids)} entries", parent=parent, fields=fields, manager=manager)
+        self.ids = ids
+
+    def make_label(self, label: str, field_edit):
+        check = QCheckBox(label + ":")
+        if isinstance(field_edit, QComboBox):
+            field_edit.activated.connect(lambda _: check.setChecked(True))
+        else:
+            field_edit.textEdited.connect(lambda _: check.setChecked(True))
+        self.checks[label] = check
+        return check
+
+    def get_data(self):
+        return self.manager.convert(
+            {label: self.widget_value(widget) for label, widget in self.field_widgets.items() if self.checks[label].isChecked()}
+        )
+
+    def on_accept(self):
+        try:
+            data = self.get_data()
+        except ValidationError as e:
+            self.error_label.setText(str(e))
+            return
+        if not data:
+            self.error_label.setText("Check at least one field to change.")
+            return
+
+        ids = self.ids
+        self.set_busy(True)
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.update_many(ids, data),
+            key=(self.task_key, "save"),
+            on_result=self.on_saved,
+            on_error=self.on_save_failed,
+        )
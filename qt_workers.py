@@ -0,0 +1,274 @@
+import logging
+from typing import Any, Callable, Hashable
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from db_managers import RowUpdates, TableManager
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSignals(QObject):
+    succeeded = Signal(object)
+    failed = Signal(object)
+
+
+class DbTask(QRunnable):
+    """
+    Runs one manager operation on a pool thread.
+    """
+
+    def __init__(self, manager: TableManager, fn: Callable[[TableManager], Any], key: Hashable = None, on_result=None, on_error=None, on_done=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.manager = manager
+        self.fn = fn
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_done = on_done
+        self.signals = TaskSignals()
+
+    def run(self):
+        # Hold the signals for the whole run, whatever happens to the task meanwhile
+        signals = self.signals
+        try:
+            result = self.fn(self.manager)
+        except Exception as e:
+            self._emit(signals.failed, e)
+        else:
+            self._emit(signals.succeeded, result)
+
+    @staticmethod
+    def _emit(signal, value):
+        try:
+            signal.emit(value)
+        except RuntimeError:
+            # The signals were deleted while the application quit, nobody waits for the result
+            logger.debug("Dropped the result of a database task finished after shutdown")
+
+
+class DbExecutor(QObject):
+    """
+    Runs manager operations on a thread pool and delivers their results on the GUI thread.
+
+    Managers open a session per operation, so concurrent tasks never share ORM state with
+    each other or with the GUI thread. Tasks submitted with the same ``key`` supersede each
+    other: a queued task is cancelled outright, and the result of one that already started
+    is dropped, so only the latest request for a key (for example a search) is delivered.
+    """
+
+    def __init__(self, max_threads: int = 4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.latest: dict[Hashable, DbTask] = {}
+        self.running: set[DbTask] = set()
+
+    def submit(
+        self,
+        manager: TableManager,
+        fn: Callable[[TableManager], Any],
+        key: Hashable = None,
+        on_result: Callable[[Any], None] = None,
+        on_error: Callable[[Exception], None] = None,
+        on_done: Callable[[], None] = None,
+    ) -> DbTask:
+        """
+        Runs ``fn(manager)`` in the background.
+
+        Args:
+            manager (TableManager): The manager to run the operation with.
+            fn (Callable): Receives the manager and returns the result.
+            key (Hashable): Tasks with the same key supersede each other.
+            on_result (Callable): Called with the result, unless the task was superseded.
+            on_error (Callable): Called with the exception, unless the task was superseded.
+            on_done (Callable): Always called once the task has finished or was cancelled.
+
+        Returns:
+            DbTask: The submitted task.
+        """
+        task = DbTask(manager, fn, key, on_result, on_error, on_done)
+        if key is not None:
+            previous = self.latest.get(key)
+            self.latest[key] = task
+            if previous is not None and self.pool.tryTake(previous):
+                self._finish(previous)
+        task.signals.succeeded.connect(lambda result: self._deliver(task, result))
+        task.signals.failed.connect(lambda error: self._fail(task, error))
+        # The task and its signals stay referenced until its result is delivered
+        self.running.add(task)
+        self.pool.start(task)
+        return task
+
+    def wait_for_done(self, timeout: int = 10_000) -> bool:
+        """
+        Waits up to ``timeout`` milliseconds for the submitted tasks to finish, so none outlives
+        the application. Returns False if some are still running.
+        """
+        return self.pool.waitForDone(timeout)
+
+    def cancel(self, key: Hashable):
+        """
+        Cancels the latest task submitted with ``key``: a queued task is taken off the queue
+        and the result of one that already started is dropped.
+        """
+        task = self.latest.pop(key, None)
+        if task is not None and self.pool.tryTake(task):
+            self._finish(task)
+
+    def is_current(self, task: DbTask) -> bool:
+        return task.key is None or self.latest.get(task.key) is task
+
+    def _deliver(self, task: DbTask, result):
+        if self.is_current(task) and task.on_result:
+            task.on_result(result)
+        self._finish(task)
+
+    def _fail(self, task: DbTask, error: Exception):
+        if self.is_current(task):
+            if task.on_error:
+                task.on_error(error)
+            else:
+                logger.error("Database task failed", exc_info=error)
+        self._finish(task)
+
+    def _finish(self, task: DbTask):
+        self.running.discard(task)
+        if task.key is not None and self.latest.get(task.key) is task:
+            del self.latest[task.key]
+        if task.on_done:
+            task.on_done()
+
+
+_executor = None
+
+
+def db_executor() -> DbExecutor:
+    """
+    Returns the application-wide executor, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = DbExecutor()
+    return _executor
+
+
+class WriteBehindQueue(QObject):
+    """
+    Saves edits to the rows of one manager's table in the background, in batches.
+
+    Edits are collected for ``interval`` milliseconds after the first one. Edits to the same
+    row are merged, keeping the latest value of each field, and the batch is saved with one
+    :meth:`BaseManager.update_rows` transaction, so the database sees one statement per row
+    touched rather than one per keystroke. Only one batch is in flight at a time, edits made
+    meanwhile go into the next one.
+
+    Rows passed to :meth:`track` when editing begins are saved with the version read then,
+    so a row someone else changed meanwhile fails with a ConflictError instead of being
+    overwritten. ``saved`` and ``failed`` report the outcome of each row.
+    """
+
+    saved = Signal(int, object)
+    failed = Signal(int, object)
+
+    def __init__(self, manager: TableManager, interval: int = 500, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.pending: dict[int, dict] = {}
+        self.in_flight: dict[int, dict] = {}
+        self.versions: dict[int, int] = {}
+        # Rows whose version is being read, their edits wait for it
+        self.reading: set[int] = set()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def track(self, obj_id: int):
+        """
+        Reads the version of a row that is about to be edited, unless it is already known.
+        """
+        if obj_id in self.versions or obj_id in self.reading:
+            return
+        self.reading.add(obj_id)
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.get_versions([obj_id]),
+            on_result=self._set_versions,
+            on_done=lambda: self._version_read(obj_id),
+        )
+
+    def _set_versions(self, versions: dict):
+        self.versions.update(versions)
+
+    def _version_read(self, obj_id: int):
+        self.reading.discard(obj_id)
+        self._schedule()
+
+    def edit(self, obj_id: int, field: str, value):
+        """
+        Queues a field value for a row, replacing any value of the field not yet saved.
+        """
+        self.pending.setdefault(obj_id, {})[field] = value
+        self._schedule()
+
+    def is_pending(self, obj_id: int) -> bool:
+        return obj_id in self.pending or obj_id in self.in_flight
+
+    def pending_fields(self, obj_id: int) -> set[str]:
+        return set(self.pending.get(obj_id, ())) | set(self.in_flight.get(obj_id, ()))
+
+    def has_pending(self) -> bool:
+        return bool(self.pending or self.in_flight)
+
+    def _schedule(self):
+        if self.pending and not self.in_flight and not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """
+        Saves the queued edits now, unless a batch is already being saved.
+        """
+        self.timer.stop()
+        if self.in_flight:
+            return
+        batch = {obj_id: fields for obj_id, fields in self.pending.items() if obj_id not in self.reading}
+        if not batch:
+            return
+        for obj_id in batch:
+            del self.pending[obj_id]
+        self.in_flight = batch
+        versions = {obj_id: self.versions[obj_id] for obj_id in batch if obj_id in self.versions}
+        db_executor().submit(
+            self.manager,
+            lambda manager: manager.update_rows(batch, versions),
+            on_result=self._flushed,
+            on_error=self._flush_failed,
+        )
+
+    def _flushed(self, result: RowUpdates):
+        self.in_flight = {}
+        for obj_id, record in result.saved.items():
+            # Later edits of the row build on this save, a row edited again from scratch
+            # reads its version again
+            if obj_id in self.pending:
+                self.versions[obj_id] = record["version"]
+            else:
+                self.versions.pop(obj_id, None)
+            self.saved.emit(obj_id, record)
+        for obj_id, error in result.errors.items():
+            self._drop(obj_id)
+            self.failed.emit(obj_id, error)
+        self._schedule()
+
+    def _flush_failed(self, error: Exception):
+        batch, self.in_flight = self.in_flight, {}
+        logger.error("Saving edits to %s failed", self.manager.model.__name__, exc_info=error)
+        for obj_id in batch:
+            self._drop(obj_id)
+            self.failed.emit(obj_id, error)
+        self._schedule()
+
+    def _drop(self, obj_id: int):
+        # Edits made after a failed one are based on values that were not saved
+        self.pending.pop(obj_id, None)
+        self.versions.pop(obj_id, None)
@@ -0,0 +1,151 @@
+from array import array
+from itertools import compress, repeat
+from operator import contains
+from typing import Dict, Iterable
+
+# Length of the n-grams in the postings, shorter searches scan the pre-lowered values
+GRAM_SIZE = 3
+
+# Joins the columns of a row for searches in all columns, it cannot occur in a search
+COLUMN_SEPARATOR = "\x00"
+
+
+def grams(text: str) -> set[str]:
+    return {text[start:start + GRAM_SIZE] for start in range(len(text) - GRAM_SIZE + 1)}
+
+
+class SearchIndex:
+    """
+    An in-memory case-insensitive substring index over table rows, for tables small enough
+    to keep every row loaded.
+
+    Values are lowered once when a row is added. Each column keeps postings from every
+    trigram of its values to the slots of the rows containing it, so a search of three or
+    more characters only checks the rows of its rarest trigram instead of every row. Shorter
+    searches scan the pre-lowered values, and a search that extends the previous one only
+    checks the previous matches.
+
+    Rows are tuples whose first value is the id. Removed rows leave their slot and postings
+    behind until the index is rebuilt, matches are always checked against the current values.
+
+    Args:
+        columns (Dict[str, int]): The searchable columns, by name, with their positions in the rows.
+        rows (Iterable[tuple]): The initial rows.
+    """
+
+    def __init__(self, columns: Dict[str, int], rows: Iterable[tuple] = ()):
+        self.columns = list(columns)
+        self.positions = [columns[name] for name in self.columns]
+        self.ids: list[int] = []
+        # Lowered values per column and slot, removed rows are left as empty strings which
+        # no search matches
+        self.values: list[list[str]] = [[] for _ in self.columns]
+        # The lowered values of all columns of a slot joined, for searches in all columns
+        self.joined: list[str] = []
+        self.slots: Dict[int, int] = {}
+        self.postings: list[Dict[str, array]] = [{} for _ in self.columns]
+        self.last_search = None
+        self.last_slots = None
+        for values in rows:
+            self._add(values)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, obj_id: int) -> bool:
+        return obj_id in self.slots
+
+    def _add(self, values: tuple):
+        slot = len(self.ids)
+        self.ids.append(values[0])
+        self.slots[values[0]] = slot
+        lowered = []
+        for column_values, postings, position in zip(self.values, self.postings, self.positions):
+            value = "" if values[position] is None else str(values[position]).lower()
+            column_values.append(value)
+            lowered.append(value)
+            for gram in grams(value):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(slot)
+        self.joined.append(COLUMN_SEPARATOR.join(lowered))
+
+    def update(self, values: tuple):
+        """
+        Adds a row, or replaces the indexed values of a row with the same id.
+        """
+        self.remove(values[0])
+        self._add(values)
+        self.last_search = None
+
+    def remove(self, obj_id: int):
+        slot = self.slots.pop(obj_id, None)
+        if slot is not None:
+            for column_values in self.values:
+                column_values[slot] = ""
+            self.joined[slot] = ""
+            self.last_search = None
+
+    def search(self, text: str, column: str = None) -> set[int]:
+        """
+        Returns the ids of the rows containing ``text``, ignoring case.
+
+        Args:
+            text (str): The substring to find, every row matches an empty string.
+            column (str): The column to search in, defaults to all columns.
+        """
+        text = text.lower()
+        if not text:
+            return set(self.slots)
+
+        # A longer search can only match rows the shorter one matched, so those are the
+        # candidates when they are fewer than the rows of the rarest trigram
+        previous = self.last_search
+        narrowed = self.last_slots if previous is not None and previous[1] == column and previous[0] in text else None
+        if column:
+            index = self.columns.index(column)
+            candidates = self._candidates(index, text)
+            if narrowed is not None and (candidates is None or len(narrowed) < len(candidates)):
+                candidates = narrowed
+            slots = self._matching(candidates, self.values[index], text)
+        else:
+            candidates = [self._candidates(index, text) for index in range(len(self.columns))]
+            total = None if None in candidates else sum(map(len, candidates))
+            if narrowed is not None and (total is None or len(narrowed) < total):
+                slots = self._matching(narrowed, self.joined, text)
+            elif total is None or total > len(self.ids) // 2:
+                # One pass over the joined values is cheaper than checking most rows per column
+                slots = self._matching(None, self.joined, text)
+            else:
+                matches = [self._matching(column_slots, self.values[index], text) for index, column_slots in enumerate(candidates) if column_slots]
+                # Postings are in slot order, so matches from a single column need no sorting
+                slots = matches[0] if len(matches) == 1 else sorted(set().union(*matches))
+
+        self.last_search = (text, column)
+        self.last_slots = slots
+        return set(map(self.ids.__getitem__, slots))
+
+    def _candidates(self, index: int, text: str):
+        """
+        Returns the slots that may contain ``text`` in a column, the slots of its rarest
+        trigram, or None for every slot when the text is too short to have one.
+        """
+        if len(text) < GRAM_SIZE:
+            return None
+        postings = self.postings[index]
+        rarest = None
+        for gram in grams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                return ()
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        return rarest
+
+    @staticmethod
+    def _matching(slots, values: list[str], text: str) -> list[int]:
+        # Filter with iterators over C functions, a Python loop per row would not fit in a frame
+        if slots is None:
+            return list(compress(range(len(values)), map(contains, values, repeat(text))))
+        return list(compress(slots, map(contains, map(values.__getitem__, slots), repeat(text))))
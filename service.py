@@ -0,0 +1,468 @@
+import argparse
+import asyncio
+import datetime
+import functools
+import hmac
+import ipaddress
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from sqlalchemy import inspect
+from db_import import EquipmentImporter
+from db_managers import *
+from db_search import GlobalSearch
+from db_setup import create_equipment_summary, create_global_search, create_managers, get_engine, load_database_config
+from db_summary import EquipmentSummary
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+
+def encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} as JSON.")
+
+
+def json_response(data, status: int = 200) -> web.Response:
+    return web.json_response(data, status=status, dumps=functools.partial(json.dumps, default=encode_value))
+
+
+def object_data(obj, schema) -> dict:
+    """
+    Describes a model object for a JSON response, its many-to-one relationships as nested
+    objects, see :func:`service_client.to_object`.
+    """
+    data = {attribute.key: getattr(obj, attribute.key) for attribute in inspect(type(obj)).column_attrs}
+    for key in schema.many_to_one:
+        related = getattr(obj, key)
+        data[key] = None if related is None else {attribute.key: getattr(related, attribute.key) for attribute in inspect(type(related)).column_attrs}
+    return data
+
+
+def row_not_found(request: web.Request) -> web.Response:
+    """
+    Answers 404 for a row that does not exist. Clients tell it apart from an unknown route
+    or table by ``missing``.
+    """
+    return json_response({"error": f"Row {request.match_info['id']} does not exist.", "missing": True}, status=404)
+
+
+def error_data(error: ValidationError) -> dict:
+    """
+    Describes a validation error for a JSON response, see :func:`service_client.to_error`.
+    """
+    data = {"error": str(error), "field": error.field, "index": error.index}
+    if isinstance(error, ConflictError):
+        data.update(conflict=True, current_version=error.current_version)
+    if isinstance(error, BatchValidationError):
+        data["errors"] = [error_data(each) for each in error.errors]
+    return data
+
+
+@web.middleware
+async def error_middleware(request: web.Request, handler):
+    """
+    Answers validation errors with 409 or 422, and any other failure with a logged 500.
+    Requests that cannot be parsed are answered 400 by the handlers, see :func:`bad_request`.
+    """
+    try:
+        return await handler(request)
+    except ConflictError as e:
+        return json_response(error_data(e), status=409)
+    except ValidationError as e:
+        return json_response(error_data(e), status=422)
+    except web.HTTPException:
+        raise
+    except Exception:
+        logger.exception("%s %s failed", request.method, request.path)
+        return json_response({"error": "The service failed to handle the request."}, status=500)
+
+
+def token_middleware(token: str):
+    """
+    Returns a middleware answering 401 to requests without ``Authorization: Bearer <token>``,
+    except the ``/health`` checks of load balancers.
+    """
+    expected = f"Bearer {token}".encode()
+
+    @web.middleware
+    async def check_token(request: web.Request, handler):
+        if request.path != "/health" and not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return json_response({"error": "A valid service token is required."}, status=401)
+        return await handler(request)
+
+    return check_token
+
+
+def bad_request(message: str) -> web.HTTPBadRequest:
+    """
+    Returns the 400 Bad Request to raise for a request that cannot be parsed.
+    """
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+def to_int(value, name: str) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise bad_request(f"'{name}' must be an integer, not '{value}'.") from None
+
+
+def int_param(request: web.Request, name: str) -> int:
+    value = request.query.get(name)
+    return to_int(value, name) if value not in (None, "") else None
+
+
+def bool_param(request: web.Request, name: str) -> bool:
+    return request.query.get(name, "").lower() in ("1", "true", "yes")
+
+
+def ids_param(request: web.Request, name: str = "ids") -> list[int]:
+    value = request.query.get(name, "")
+    return [to_int(obj_id, name) for obj_id in value.split(",") if obj_id]
+
+
+def id_param(request: web.Request) -> int:
+    return to_int(request.match_info["id"], "id")
+
+
+def json_param(request: web.Request, name: str):
+    value = request.query.get(name)
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        raise bad_request(f"'{name}' must be JSON.") from None
+
+
+def column_param(request: web.Request, manager: BaseManager, name: str) -> str:
+    """
+    Returns a label or field name sent as ``name``, checked to be one of the manager's columns.
+    """
+    column = request.query.get(name) or None
+    check_columns(manager, [column] if column else [])
+    return column
+
+
+def equals_param(request: web.Request, manager: BaseManager) -> dict:
+    """
+    Returns the exact values sent as JSON in ``equals``, see :meth:`BaseManager.equals_clause`.
+    """
+    equals = json_param(request, "equals")
+    if equals is not None and not isinstance(equals, dict):
+        raise bad_request("'equals' must map columns to values.")
+    check_columns(manager, equals or {})
+    return equals
+
+
+def check_columns(manager: BaseManager, names):
+    for name in names:
+        if manager.schema.to_field(name) not in manager.schema.field_index:
+            raise bad_request(f"Unknown column '{name}' for {manager.model.__name__}.")
+
+
+async def json_body(request: web.Request, *required: str) -> dict:
+    """
+    Returns the JSON object a request sent, checked to have the ``required`` keys.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        raise bad_request("The request body must be JSON.") from None
+    if not isinstance(body, dict):
+        raise bad_request("The request body must be a JSON object.")
+    missing = [key for key in required if key not in body]
+    if missing:
+        raise bad_request(f"The request body is missing {', '.join(missing)}.")
+    return body
+
+
+class ManagerService:
+    """
+    Serves the managers' table operations over HTTP/JSON, so clients share one connection
+    pool instead of each holding connections of their own.
+
+    Requests are handled on an asyncio event loop and every manager call runs on a thread
+    pool of at most ``max_workers`` threads, by default as many as the engine's pool has
+    connections, so a burst of requests queues for a thread instead of for a connection.
+    The service keeps no state between requests, more instances can serve the same
+    database behind a load balancer.
+
+    Given a ``token``, every request but ``/health`` must send it as
+    ``Authorization: Bearer <token>`` or is answered 401 Unauthorized. :func:`main` only
+    listens beyond localhost with a token, set by ``--token`` or ``SADIEWARE_SERVICE_TOKEN``.
+
+    Args:
+        managers (list[BaseManager]): The managers to serve, by table name.
+        search (GlobalSearch): Serves ``/search``, if given.
+        summary (EquipmentSummary): Serves ``/summary``, if given.
+        max_workers (int): The number of manager calls that run at once.
+        token (str): The shared token requests must send, if any.
+    """
+
+    def __init__(
+        self,
+        managers: list[BaseManager],
+        search: GlobalSearch = None,
+        summary: EquipmentSummary = None,
+        max_workers: int = None,
+        token: str = None,
+    ):
+        self.managers = {manager.model.__tablename__: manager for manager in managers}
+        self.search = search
+        self.summary = summary
+        self.token = token
+        if max_workers is None:
+            config = load_database_config()
+            max_workers = config["pool_size"] + config["max_overflow"]
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="service")
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        Runs a blocking manager call on the thread pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    def manager(self, request: web.Request) -> BaseManager:
+        manager = self.managers.get(request.match_info["table"])
+        if manager is None:
+            raise web.HTTPNotFound(text=f"Unknown table '{request.match_info['table']}'.")
+        return manager
+
+    def create_app(self) -> web.Application:
+        middlewares = [error_middleware] if not self.token else [token_middleware(self.token), error_middleware]
+        app = web.Application(middlewares=middlewares)
+        app.add_routes(
+            [
+                web.get("/health", self.health),
+                web.get("/search", self.search_rows),
+                web.get("/summary", self.summary_totals),
+                web.get("/tables/{table}/rows", self.list_rows),
+                web.post("/tables/{table}/rows", self.add_row),
+                web.get("/tables/{table}/rows/{id}", self.get_row),
+                web.patch("/tables/{table}/rows/{id}", self.update_row),
+                web.delete("/tables/{table}/rows/{id}", self.delete_row),
+                web.get("/tables/{table}/objects", self.list_objects),
+                web.get("/tables/{table}/objects/{id}", self.get_object),
+                web.post("/tables/{table}/validate", self.validate_row),
+                web.get("/tables/{table}/count", self.count_rows),
+                web.get("/tables/{table}/versions", self.get_versions),
+                web.get("/tables/{table}/choices/{field}", self.related_choices),
+                web.get("/tables/{table}/changes", self.table_changes),
+                web.post("/tables/{table}/batch/update", self.update_rows),
+                web.post("/tables/{table}/batch/set", self.update_many),
+                web.post("/tables/{table}/batch/delete", self.delete_many),
+                web.post("/tables/{table}/batch/duplicate", self.duplicate_many),
+                web.post("/tables/{table}/import", self.import_rows),
+            ]
+        )
+        app.on_cleanup.append(self.close)
+        return app
+
+    async def close(self, app: web.Application):
+        self.executor.shutdown(wait=True)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return json_response({"status": "ok"})
+
+    async def search_rows(self, request: web.Request) -> web.Response:
+        if self.search is None:
+            raise web.HTTPNotFound(text="Search is not served.")
+        results = await self.call(
+            self.search.search, request.query.get("text", ""), limit=int_param(request, "limit") or 50, offset=int_param(request, "offset") or 0
+        )
+        return json_response(
+            {
+                "results": [
+                    {"model": result.model.__name__, "id": result.id, "title": result.title, "detail": result.detail, "rank": result.rank}
+                    for result in results
+                ]
+            }
+        )
+
+    async def summary_totals(self, request: web.Request) -> web.Response:
+        if self.summary is None:
+            raise web.HTTPNotFound(text="The summary is not served.")
+        return json_response({"totals": await self.call(self.summary.totals)})
+
+    async def list_rows(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        if "ids" in request.query:
+            rows = await self.call(manager.get_rows, ids_param(request))
+        else:
+            rows = await self.call(
+                manager.query,
+                search=request.query.get("search"),
+                column=column_param(request, manager, "column"),
+                sort_column=column_param(request, manager, "sort"),
+                descending=bool_param(request, "descending"),
+                limit=int_param(request, "limit"),
+                offset=int_param(request, "offset"),
+                after_id=int_param(request, "after_id"),
+                equals=equals_param(request, manager),
+            )
+        return json_response({"rows": rows})
+
+    async def list_objects(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        objs = await self.call(manager.get_all)
+        return json_response({"objects": [object_data(obj, manager.schema) for obj in objs]})
+
+    async def get_object(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        obj = await self.call(manager.get, id_param(request))
+        if obj is None:
+            return row_not_found(request)
+        return json_response({"object": object_data(obj, manager.schema)})
+
+    async def validate_row(self, request: web.Request) -> web.Response:
+        """
+        Validates the ``values`` of a new row, or of the row ``id`` if given, answering 422
+        with the ValidationError if they are invalid.
+        """
+        manager = self.manager(request)
+        body = await json_body(request, "values")
+        check_columns(manager, body["values"])
+        obj = manager.model(**manager.convert(body["values"]))
+        obj.id = body.get("id")
+        await self.call(manager.validate, obj)
+        return json_response({"valid": True})
+
+    async def count_rows(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        count = await self.call(manager.count, request.query.get("search"), column_param(request, manager, "column"), equals_param(request, manager))
+        return json_response({"count": count})
+
+    async def get_row(self, request: web.Request) -> web.Response:
+        result = await self.call(self.manager(request).get_versioned_row, id_param(request))
+        if result is None:
+            return row_not_found(request)
+        return json_response({"row": result[0], "version": result[1]})
+
+    async def add_row(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        values = (await json_body(request, "values"))["values"]
+        check_columns(manager, values)
+        values = manager.convert(values)
+        obj = await self.call(manager.add, manager.model(**values))
+        return json_response({"id": obj.id}, status=201)
+
+    async def update_row(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        body = await json_body(request, "updates")
+        check_columns(manager, body["updates"])
+        record = await self.call(manager.update, id_param(request), body["updates"], version=body.get("version"))
+        if record is None:
+            return row_not_found(request)
+        return json_response({"record": record})
+
+    async def delete_row(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        obj = await self.call(manager.delete, id_param(request))
+        if obj is None:
+            return row_not_found(request)
+        return json_response({"object": object_data(obj, manager.schema)})
+
+    async def get_versions(self, request: web.Request) -> web.Response:
+        versions = await self.call(self.manager(request).get_versions, ids_param(request))
+        return json_response({"versions": versions})
+
+    async def related_choices(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        field = manager.schema.to_field(request.match_info["field"])
+        if field not in manager.related_names:
+            raise web.HTTPNotFound(text=f"'{field}' does not refer to another table.")
+        return json_response({"choices": await self.call(manager.related_choices, field)})
+
+    async def table_changes(self, request: web.Request) -> web.Response:
+        since = request.query.get("since")
+        try:
+            since = datetime.datetime.fromisoformat(since) if since else None
+        except ValueError:
+            raise bad_request(f"'since' must be an ISO timestamp, not '{since}'.") from None
+        changes = await self.call(self.manager(request).table_changes, since)
+        return json_response({"watermark": changes.watermark, "rows": changes.rows, "deleted": changes.deleted, "full": changes.full})
+
+    async def update_rows(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        body = await json_body(request, "changes")
+        changes = {to_int(obj_id, "changes"): updates for obj_id, updates in body["changes"].items()}
+        versions = {to_int(obj_id, "versions"): version for obj_id, version in (body.get("versions") or {}).items()}
+        for updates in changes.values():
+            check_columns(manager, updates)
+        result = await self.call(manager.update_rows, changes, versions)
+        return json_response({"saved": result.saved, "errors": {obj_id: error_data(error) for obj_id, error in result.errors.items()}})
+
+    async def update_many(self, request: web.Request) -> web.Response:
+        manager = self.manager(request)
+        body = await json_body(request, "ids", "updates")
+        check_columns(manager, body["updates"])
+        return json_response({"ids": await self.call(manager.update_many, body["ids"], body["updates"])})
+
+    async def delete_many(self, request: web.Request) -> web.Response:
+        body = await json_body(request, "ids")
+        return json_response({"ids": await self.call(self.manager(request).delete_many, body["ids"])})
+
+    async def duplicate_many(self, request: web.Request) -> web.Response:
+        body = await json_body(request, "ids")
+        manager = self.manager(request)
+        ids = await self.call(manager.duplicate_many, body["ids"], **({"suffix": body["suffix"]} if "suffix" in body else {}))
+        return json_response({"ids": ids})
+
+    async def import_rows(self, request: web.Request) -> web.Response:
+        """
+        Imports one chunk of ``[row_number, record]`` pairs, records keyed by the headers
+        of an import file, see :class:`EquipmentImporter`.
+        """
+        manager = self.manager(request)
+        if not isinstance(manager, EquipmentManager):
+            raise web.HTTPNotFound(text="Only equipment can be imported.")
+        try:
+            chunk = [(to_int(row_number, "rows"), dict(record)) for row_number, record in (await json_body(request, "rows"))["rows"]]
+        except (TypeError, ValueError):
+            raise bad_request("'rows' must be a list of [row_number, record] pairs.") from None
+        ids, errors = await self.call(self.import_chunk, manager, chunk)
+        return json_response({"ids": ids, "errors": [[error.row_number, error.message] for error in errors]})
+
+    def import_chunk(self, manager: EquipmentManager, chunk: list[tuple[int, dict]]):
+        importer = EquipmentImporter(manager)
+        with importer.open_session() as session:
+            return importer.import_chunk(session, chunk)
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves the application's tables over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="Manager calls that run at once, defaults to the connection pool size.")
+    parser.add_argument("--token", help="The token clients must send, defaults to $SADIEWARE_SERVICE_TOKEN. Required beyond localhost.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    token = args.token or load_database_config()["service_token"] or None
+    # The service reads and writes every table, it is only reachable from other hosts with a token
+    if token is None and not is_loopback(args.host):
+        parser.error(f"--token or SADIEWARE_SERVICE_TOKEN is required to listen on {args.host}.")
+
+    # The service always connects to the database itself, whatever SADIEWARE_SERVICE_URL says
+    managers = list(create_managers())
+    service = ManagerService(
+        managers, create_global_search(managers), create_equipment_summary(managers[0]), max_workers=args.workers, token=token
+    )
+    logger.info("Serving %s", get_engine().url.render_as_string(hide_password=True))
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
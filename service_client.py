@@ -0,0 +1,340 @@
+import datetime
+import http.client
+import json
+import threading
+from contextlib import nullcontext
+from typing import Iterator
+from urllib.parse import urlencode, urlsplit
+from sqlalchemy import DateTime, inspect
+from db_import import EquipmentImporter, ImportRowError
+from db_managers import *
+from db_search import SearchResult
+
+
+class ServiceError(Exception):
+    """
+    Raised when the service cannot be reached or fails a request for a reason other than
+    a validation error.
+    """
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+def to_error(data: dict) -> ValidationError:
+    """
+    Rebuilds the ValidationError, ConflictError or BatchValidationError the service described.
+    """
+    if data.get("conflict"):
+        return ConflictError(data["error"], current_version=data.get("current_version"))
+    if data.get("errors"):
+        return BatchValidationError([to_error(each) for each in data["errors"]])
+    return ValidationError(data["error"], field=data.get("field"), index=data.get("index"))
+
+
+def to_object(model, data: dict):
+    """
+    Rebuilds a detached model object the service described, with its many-to-one related
+    objects, see :func:`service.object_data`.
+    """
+    mapper = inspect(model)
+    values = {}
+    for attribute in mapper.column_attrs:
+        value = data.get(attribute.key)
+        if value is not None and isinstance(attribute.columns[0].type, DateTime):
+            value = datetime.datetime.fromisoformat(value)
+        values[attribute.key] = value
+    obj = model(**values)
+    for relationship in mapper.relationships:
+        if isinstance(data.get(relationship.key), dict):
+            setattr(obj, relationship.key, to_object(relationship.mapper.class_, data[relationship.key]))
+    return obj
+
+
+class ServiceClient:
+    """
+    Sends requests to the service (see service.py) over keep-alive connections, one per
+    thread, so each database executor thread reuses its connection between requests.
+
+    Args:
+        url (str): The service's base URL, e.g. ``http://localhost:8080``.
+        timeout (float): Seconds to wait for a response.
+        token (str): The shared token the service requires, if any.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0, token: str = None):
+        self.url = url.rstrip("/")
+        parts = urlsplit(self.url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.base_path = parts.path
+        self.timeout = timeout
+        self.token = token
+        self.local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self.connection_class(self.netloc, timeout=self.timeout)
+        return connection
+
+    def request(self, method: str, path: str, params: dict = None, body: dict = None, missing_ok: bool = False):
+        """
+        Sends a request and returns its decoded JSON response.
+
+        Args:
+            missing_ok (bool): Return None if the service answers that the requested row
+                does not exist, for the endpoints of a single row.
+
+        Raises:
+            ValidationError: If the service rejected the request's values, ConflictError
+                for a version conflict.
+            ServiceError: If the service cannot be reached or the request failed otherwise,
+                including 404 Not Found for an unknown route or table.
+        """
+        params = {name: value for name, value in (params or {}).items() if value is not None}
+        target = self.base_path + path + (f"?{urlencode(params)}" if params else "")
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        # A kept-alive connection the service closed meanwhile is reopened once
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, target, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise ServiceError(f"Cannot reach the service at {self.url}: {e}") from e
+        decoded = json.loads(data) if data and response.headers.get_content_type() == "application/json" else {}
+        if response.status == 404 and missing_ok and decoded.get("missing"):
+            return None
+        if response.status in (409, 422):
+            raise to_error(decoded)
+        if response.status >= 400:
+            raise ServiceError(decoded.get("error") or data.decode(errors="replace") or response.reason, response.status)
+        return decoded
+
+
+class RemoteManager(TableManager):
+    """
+    A manager whose table operations are sent to the service instead of run on a database
+    session, so the application can work through the service's shared connection pool.
+
+    It provides the operations of :class:`TableManager`, with the same results and errors
+    as the local manager class it is created from. Objects returned by ``get``, ``get_all``
+    and ``delete`` are detached copies, with their many-to-one related objects. Operations
+    that need a database session, such as ``filter`` and ``batch``, are only available on
+    the local managers.
+
+    Args:
+        client (ServiceClient): The service to send requests to.
+        model (BaseBase): The model of the table.
+        related_names (dict): The ``related_names`` of the model's local manager class.
+    """
+
+    def __init__(self, client: ServiceClient, model: BaseBase, related_names: dict = None):
+        super().__init__(model)
+        self.client = client
+        self.related_names = related_names or {}
+        self.path = f"/tables/{model.__tablename__}"
+
+    def get(self, obj_id):
+        data = self.client.request("GET", f"{self.path}/objects/{obj_id}", missing_ok=True)
+        return to_object(self.model, data["object"]) if data is not None else None
+
+    def get_all(self):
+        return [to_object(self.model, data) for data in self.client.request("GET", f"{self.path}/objects")["objects"]]
+
+    def validate(self, obj, session=None):
+        values = {field: getattr(obj, field) for field in self.schema.editable_fields}
+        self.client.request("POST", f"{self.path}/validate", body={"values": values, "id": getattr(obj, "id", None)})
+
+    def table_data(
+        self, search: str = None, column: str = None, sort_column: str = None, descending: bool = False, limit: int = None
+    ) -> TableData:
+        # The rows of query() are the displayed columns that table_data() selects
+        return TableData(self.schema.labels, self.schema.fields, tuple(self.query(search, column, sort_column, descending, limit)))
+
+    def query(
+        self,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        limit: int = None,
+        offset: int = None,
+        after_id: int = None,
+        equals: dict = None,
+    ) -> list[tuple]:
+        params = {
+            "search": search or None,
+            "column": column,
+            "sort": sort_column,
+            "descending": int(descending),
+            "limit": limit,
+            "offset": offset,
+            "after_id": after_id,
+            "equals": json.dumps(equals) if equals else None,
+        }
+        return [tuple(row) for row in self.client.request("GET", f"{self.path}/rows", params)["rows"]]
+
+    def count(self, search: str = None, column: str = None, equals: dict = None) -> int:
+        params = {"search": search or None, "column": column, "equals": json.dumps(equals) if equals else None}
+        return self.client.request("GET", f"{self.path}/count", params)["count"]
+
+    def get_rows(self, obj_ids) -> list[tuple]:
+        if not obj_ids:
+            return []
+        params = {"ids": ",".join(str(obj_id) for obj_id in obj_ids)}
+        return [tuple(row) for row in self.client.request("GET", f"{self.path}/rows", params)["rows"]]
+
+    def stream_rows(
+        self,
+        search: str = None,
+        column: str = None,
+        sort_column: str = None,
+        descending: bool = False,
+        chunk_size: int = 1000,
+        equals: dict = None,
+    ) -> Iterator[list[tuple]]:
+        """
+        Streams the rows of :meth:`query` a page of ``chunk_size`` rows per request, paging by
+        keyset when sorted by ``id``.
+        """
+        by_id = self.schema.to_field(sort_column or "id") == "id"
+        offset, after_id = 0, None
+        while True:
+            if by_id:
+                rows = self.query(search, column, sort_column, descending, chunk_size, after_id=after_id, equals=equals)
+            else:
+                rows = self.query(search, column, sort_column, descending, chunk_size, offset=offset, equals=equals)
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            offset += len(rows)
+            after_id = rows[-1][0]
+
+    def get_versioned_row(self, obj_id: int) -> tuple:
+        data = self.client.request("GET", f"{self.path}/rows/{obj_id}", missing_ok=True)
+        return (tuple(data["row"]), data["version"]) if data is not None else None
+
+    def get_versions(self, obj_ids) -> dict:
+        params = {"ids": ",".join(str(obj_id) for obj_id in obj_ids)}
+        return {int(obj_id): version for obj_id, version in self.client.request("GET", f"{self.path}/versions", params)["versions"].items()}
+
+    def related_choices(self, field_name: str) -> list[tuple[int, str]]:
+        return [tuple(choice) for choice in self.client.request("GET", f"{self.path}/choices/{field_name}")["choices"]]
+
+    def table_changes(self, since: datetime.datetime = None) -> TableChanges:
+        data = self.client.request("GET", f"{self.path}/changes", {"since": since.isoformat() if since else None})
+        rows = [tuple(row) for row in data["rows"]]
+        return TableChanges(datetime.datetime.fromisoformat(data["watermark"]), rows, data["deleted"], full=data["full"])
+
+    def add(self, obj):
+        values = {field: getattr(obj, field) for field in self.schema.editable_fields}
+        obj.id = self.client.request("POST", f"{self.path}/rows", body={"values": values})["id"]
+        self.emit_change(ChangeEvent.INSERT, [obj.id])
+        return obj
+
+    def update(self, obj_id, updates: dict, version: int = None) -> dict:
+        data = self.client.request("PATCH", f"{self.path}/rows/{obj_id}", body={"updates": updates, "version": version}, missing_ok=True)
+        if data is None:
+            return None
+        self.emit_change(ChangeEvent.UPDATE, [obj_id])
+        return data["record"]
+
+    def update_rows(self, changes: dict, versions: dict = None) -> RowUpdates:
+        data = self.client.request("POST", f"{self.path}/batch/update", body={"changes": changes, "versions": versions or {}})
+        result = RowUpdates()
+        result.saved = {int(obj_id): record for obj_id, record in data["saved"].items()}
+        result.errors = {int(obj_id): to_error(error) for obj_id, error in data["errors"].items()}
+        self.emit_change(ChangeEvent.UPDATE, list(result.saved))
+        return result
+
+    def update_many(self, obj_ids, updates: dict) -> list[int]:
+        updated = self.client.request("POST", f"{self.path}/batch/set", body={"ids": list(obj_ids), "updates": updates})["ids"]
+        self.emit_change(ChangeEvent.UPDATE, updated)
+        return updated
+
+    def delete(self, obj_id):
+        data = self.client.request("DELETE", f"{self.path}/rows/{obj_id}", missing_ok=True)
+        if data is None:
+            return None
+        self.emit_change(ChangeEvent.DELETE, [obj_id])
+        for manager in self.referencing_managers:
+            manager.references_changed(self.model, [obj_id])
+        return to_object(self.model, data["object"])
+
+    def delete_many(self, obj_ids) -> list[int]:
+        deleted = self.client.request("POST", f"{self.path}/batch/delete", body={"ids": list(obj_ids)})["ids"]
+        self.emit_change(ChangeEvent.DELETE, deleted)
+        if deleted:
+            for manager in self.referencing_managers:
+                manager.references_changed(self.model, deleted)
+        return deleted
+
+    def duplicate_many(self, obj_ids, suffix: str = " (copy)") -> list[int]:
+        new_ids = self.client.request("POST", f"{self.path}/batch/duplicate", body={"ids": list(obj_ids), "suffix": suffix})["ids"]
+        self.emit_change(ChangeEvent.INSERT, new_ids)
+        return new_ids
+
+
+class RemoteGlobalSearch:
+    """
+    Runs :class:`GlobalSearch` on the service, with the same results.
+    """
+
+    def __init__(self, client: ServiceClient, models: list):
+        self.client = client
+        self.models = {model.__name__: model for model in models}
+
+    def search(self, text: str, limit: int = 50, offset: int = 0) -> list[SearchResult]:
+        if not text.strip():
+            return []
+        data = self.client.request("GET", "/search", {"text": text, "limit": limit, "offset": offset})
+        return [
+            SearchResult(self.models[result["model"]], result["id"], result["title"], result["detail"], result["rank"])
+            for result in data["results"]
+            if result["model"] in self.models
+        ]
+
+
+class RemoteEquipmentSummary:
+    """
+    Reads :class:`EquipmentSummary` totals from the service.
+    """
+
+    def __init__(self, client: ServiceClient):
+        self.client = client
+
+    def totals(self) -> dict[str, list[tuple[str, int]]]:
+        data = self.client.request("GET", "/summary")["totals"]
+        return {field: [tuple(pair) for pair in pairs] for field, pairs in data.items()}
+
+
+class RemoteEquipmentImporter(EquipmentImporter):
+    """
+    Imports a file through the service, sending it a chunk at a time. The service validates
+    and inserts each chunk the same way :class:`EquipmentImporter` does.
+    """
+
+    def open_session(self):
+        return nullcontext()
+
+    def import_chunk(self, session, chunk: list[tuple[int, dict]]) -> tuple[list[int], list[ImportRowError]]:
+        # Spreadsheet cells may hold numbers and dates, the service reads every value as text
+        rows = [
+            (row_number, {header: None if value is None else str(value) for header, value in record.items()})
+            for row_number, record in chunk
+        ]
+        data = self.manager.client.request("POST", f"{self.manager.path}/import", body={"rows": rows})
+        self.manager.emit_change(ChangeEvent.INSERT, data["ids"])
+        return data["ids"], [ImportRowError(row_number, message) for row_number, message in data["errors"]]
@@ -0,0 +1,129 @@
+import datetime
+import os
+import sqlite3
+import threading
+from db_managers import TableChanges, TableManager
+from search_index import SearchIndex
+
+
+class SnapshotCache:
+    """
+    A local SQLite copy of the rows of the application's tables, so a table paints from disk
+    when it opens and then only fetches the rows changed since it was last synced.
+
+    Each table's rows are stored as the table shows them, with the watermark of its last
+    sync. A snapshot whose fields no longer match the table's is loaded again in full. The
+    cache is shared between threads.
+
+    Args:
+        path (str): The SQLite file, created with its directory if missing. Each database
+            needs a file of its own.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (table_name TEXT PRIMARY KEY, fields TEXT, watermark TEXT)"
+            )
+            self.connection = connection
+        return self.connection
+
+    @staticmethod
+    def _rows_table(table_name: str) -> str:
+        return f'"rows_{table_name}"'
+
+    def _state(self, connection: sqlite3.Connection, table_name: str, fields: list[str]):
+        state = connection.execute("SELECT fields, watermark FROM sync_state WHERE table_name = ?", (table_name,)).fetchone()
+        if state is None or state[0] != ",".join(fields):
+            return None
+        return datetime.datetime.fromisoformat(state[1])
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def load(self, table_name: str, fields: list[str]):
+        """
+        Returns the stored rows of a table in id order and the watermark of their last sync,
+        or None if there is no snapshot of the table with these fields.
+        """
+        with self.lock:
+            connection = self._connect()
+            watermark = self._state(connection, table_name, fields)
+            if watermark is None:
+                return None
+            rows = connection.execute(f"SELECT * FROM {self._rows_table(table_name)} ORDER BY id").fetchall()
+        return rows, watermark
+
+    def watermark(self, table_name: str, fields: list[str]) -> datetime.datetime:
+        """
+        Returns the watermark of a table's last sync, or None if it has no snapshot.
+        """
+        with self.lock:
+            return self._state(self._connect(), table_name, fields)
+
+    def apply(self, table_name: str, fields: list[str], changes: TableChanges):
+        """
+        Stores a sync's changes in one transaction, replacing every row on a full sync.
+        """
+        rows_table = self._rows_table(table_name)
+        columns = ", ".join(f'"{field}"' for field in fields)
+        definitions = ", ".join(f'"{field}" INTEGER PRIMARY KEY' if field == "id" else f'"{field}"' for field in fields)
+        placeholders = ", ".join("?" * len(fields))
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                if changes.full:
+                    connection.execute(f"DROP TABLE IF EXISTS {rows_table}")
+                    connection.execute(f"CREATE TABLE {rows_table} ({definitions})")
+                connection.executemany(f"DELETE FROM {rows_table} WHERE id = ?", [(obj_id,) for obj_id in changes.deleted])
+                connection.executemany(f"INSERT OR REPLACE INTO {rows_table} ({columns}) VALUES ({placeholders})", changes.rows)
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_state (table_name, fields, watermark) VALUES (?, ?, ?)",
+                    (table_name, ",".join(fields), changes.watermark.isoformat()),
+                )
+
+    def sync(self, manager: TableManager) -> TableChanges:
+        """
+        Fetches a table's changes since its last sync, all of its rows if it has no snapshot,
+        and stores them.
+        """
+        table_name, fields = manager.model.__tablename__, manager.schema.fields
+        changes = manager.table_changes(self.watermark(table_name, fields))
+        self.apply(table_name, fields, changes)
+        return changes
+
+
+def load_snapshot_rows(manager: TableManager, snapshot: SnapshotCache, limit: int):
+    """
+    Loads every row of a table in id order together with a search index over them, from the
+    snapshot if there is one and otherwise from the database, storing a new snapshot. Returns
+    None if the table has more than ``limit`` rows.
+
+    Returns:
+        tuple: The rows, the :class:`SearchIndex` and whether the rows are synced. Rows from a
+        snapshot may be stale until :meth:`SnapshotCache.sync` brings it up to date.
+    """
+    stored = snapshot.load(manager.model.__tablename__, manager.schema.fields)
+    if stored is not None:
+        rows, synced = stored[0], False
+    else:
+        if manager.count() > limit:
+            return None
+        rows, synced = snapshot.sync(manager).rows, True
+    if len(rows) > limit:
+        return None
+    columns = {field: manager.schema.field_index[field] for field in manager.schema.editable_fields}
+    return rows, SearchIndex(columns, rows), synced
@@ -0,0 +1,72 @@
+import os
+import time
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from db_classes import *
+from db_managers import AreaCodeManager, DeviceTypeManager, EquipmentManager
+from db_setup import create_schema
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    create_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+@pytest.fixture
+def device_types(session_factory):
+    return DeviceTypeManager(session_factory)
+
+
+@pytest.fixture
+def area_codes(session_factory):
+    return AreaCodeManager(session_factory)
+
+
+@pytest.fixture
+def equipment(session_factory, device_types, area_codes):
+    return EquipmentManager(session_factory)
+
+
+@pytest.fixture
+def plc(device_types):
+    return device_types.add(DeviceType(device_type="PLC", description="Controller"))
+
+
+@pytest.fixture
+def qapp():
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def wait(qapp):
+    """
+    Returns a function that processes Qt events until a condition holds or a timeout passes.
+    """
+
+    def wait(condition, timeout: float = 5.0) -> bool:
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            qapp.processEvents()
+            if condition():
+                return True
+            time.sleep(0.005)
+        return condition()
+
+    return wait
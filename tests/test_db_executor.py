@@ -0,0 +1,50 @@
+import threading
+
+import shiboken6
+
+from qt_table_dialog import BaseDialog
+from qt_workers import DbExecutor, DbTask, db_executor
+
+
+def test_wait_for_done_waits_for_running_tasks(qapp, equipment):
+    executor = DbExecutor()
+    release = threading.Event()
+    finished = []
+    executor.submit(equipment, lambda manager: release.wait(5) and finished.append(True))
+    assert not executor.wait_for_done(50)
+    release.set()
+    assert executor.wait_for_done()
+    assert finished == [True]
+
+
+def test_a_task_whose_signals_were_deleted_finishes_quietly(qapp, equipment):
+    task = DbTask(equipment, lambda manager: 1)
+    shiboken6.delete(task.signals)
+    task.run()
+
+
+def test_a_cancelled_task_delivers_nothing(qapp, wait, equipment):
+    executor = DbExecutor()
+    release = threading.Event()
+    results, done = [], []
+    executor.submit(equipment, lambda manager: release.wait(5), key="slow", on_result=results.append, on_done=lambda: done.append(True))
+    executor.cancel("slow")
+    release.set()
+    assert wait(lambda: done)
+    assert results == []
+
+
+def test_choices_arriving_after_the_dialog_closed_are_dropped(qapp, wait, equipment, plc, monkeypatch):
+    release = threading.Event()
+    original = equipment.related_choices
+    monkeypatch.setattr(equipment, "related_choices", lambda field: release.wait(5) and original(field))
+    dialog = BaseDialog("Equipment", fields={"Device Type": "PLC"}, manager=equipment)
+    combo = dialog.field_widgets["Device Type"]
+    assert (dialog.task_key, "choices", "device_type_id") in db_executor().latest
+    dialog.reject()
+    assert (dialog.task_key, "choices", "device_type_id") not in db_executor().latest
+    shiboken6.delete(dialog)
+    assert not shiboken6.isValid(combo)
+    release.set()
+    assert db_executor().wait_for_done()
+    qapp.processEvents()
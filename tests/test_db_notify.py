@@ -0,0 +1,49 @@
+from db_managers import ChangeEvent
+from db_notify import coalesce_change, group_changes, parse_change
+
+INSERT, UPDATE, DELETE = ChangeEvent.INSERT, ChangeEvent.UPDATE, ChangeEvent.DELETE
+
+
+def coalesce(*changes) -> dict:
+    pending = {}
+    for table, op, row_id in changes:
+        coalesce_change(pending, table, op, row_id)
+    return pending
+
+
+def test_insert_then_updates_is_an_insert():
+    assert coalesce(("equipments", INSERT, 1), ("equipments", UPDATE, 1), ("equipments", UPDATE, 1)) == {("equipments", 1): INSERT}
+
+
+def test_anything_followed_by_a_delete_is_a_delete():
+    assert coalesce(("equipments", INSERT, 1), ("equipments", UPDATE, 1), ("equipments", DELETE, 1)) == {("equipments", 1): DELETE}
+    assert coalesce(("equipments", UPDATE, 2), ("equipments", DELETE, 2)) == {("equipments", 2): DELETE}
+
+
+def test_a_row_deleted_and_inserted_again_is_an_insert():
+    assert coalesce(("equipments", DELETE, 1), ("equipments", INSERT, 1)) == {("equipments", 1): INSERT}
+
+
+def test_rows_and_tables_are_coalesced_apart():
+    pending = coalesce(
+        ("equipments", INSERT, 1),
+        ("equipments", UPDATE, 2),
+        ("equipments", UPDATE, 1),
+        ("area_codes", UPDATE, 1),
+        ("equipments", DELETE, 3),
+        ("equipments", UPDATE, 2),
+    )
+    assert group_changes(pending) == {
+        "equipments": {INSERT: [1], UPDATE: [2], DELETE: [3]},
+        "area_codes": {UPDATE: [1]},
+    }
+
+
+def test_parse_change_reads_the_origin():
+    assert parse_change('{"table": "equipments", "op": "update", "id": 7, "pid": 4242}') == ("equipments", UPDATE, 7, 4242)
+    assert parse_change('{"table": "equipments", "op": "delete", "id": "7"}') == ("equipments", DELETE, 7, None)
+
+
+def test_parse_change_rejects_malformed_payloads():
+    for payload in ["garbage", "[]", "null", '{"table": "equipments", "op": "update"}', '{"table": "equipments", "op": "update", "id": "x"}']:
+        assert parse_change(payload) is None
@@ -0,0 +1,21 @@
+from db_classes import *
+from db_search import GlobalSearch, to_prefix_query
+
+
+def test_prefix_query_requires_every_word_as_a_prefix():
+    assert to_prefix_query("Conv  belt") == "conv:* & belt:*"
+    assert to_prefix_query("pump | !valve") == "pump:* & valve:*"
+    assert to_prefix_query(" & ! ") is None
+
+
+def test_search_filters_on_every_word_across_tables(equipment, device_types, area_codes, plc):
+    area = area_codes.add(AreaCode(area_code="B2", description="Conveyor hall"))
+    equipment.add(Equipment(name="EQ1", application="Conveyor Belt", device_type_id=plc.id, area_code_id=area.id))
+    equipment.add(Equipment(name="EQ2", application="Pump", device_type_id=plc.id))
+    search = GlobalSearch([equipment, device_types, area_codes])
+
+    results = search.search("conveyor")
+    assert [(result.model, result.title) for result in results] == [(AreaCode, "B2"), (Equipment, "EQ1")]
+    assert [result.title for result in search.search("conveyor belt")] == ["EQ1"]
+    assert search.search("   ") == []
+    assert [result.title for result in search.search("eq", limit=1, offset=1)] == ["EQ2"]
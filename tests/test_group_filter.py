@@ -0,0 +1,63 @@
+import pytest
+
+from db_classes import *
+from qt_table import ManagerTableModel
+
+
+@pytest.fixture
+def rows(equipment, area_codes, plc):
+    b2 = area_codes.add(AreaCode(area_code="B2", description="Building 2"))
+    b21 = area_codes.add(AreaCode(area_code="B21", description="Building 21"))
+    for name, area_code, manufacturer in [
+        ("EQ1", b2, "Acme"),
+        ("EQ2", b21, "Acme Corp"),
+        ("EQ3", None, ""),
+        ("EQ4", b2, None),
+    ]:
+        equipment.add(
+            Equipment(
+                name=name,
+                application=f"{name} application",
+                device_type_id=plc.id,
+                area_code_id=area_code.id if area_code else None,
+                manufacturer=manufacturer,
+            )
+        )
+
+
+def names(rows) -> list[str]:
+    return [values[1] for values in rows]
+
+
+def test_query_matches_exact_values(equipment, rows):
+    assert names(equipment.query(equals={"area_code_id": "B2"})) == ["EQ1", "EQ4"]
+    assert names(equipment.query(equals={"Manufacturer": "Acme"})) == ["EQ1"]
+    assert equipment.count(equals={"area_code_id": "B2"}) == 2
+    assert names(list(equipment.stream_rows(equals={"area_code_id": "B21"}))[0]) == ["EQ2"]
+
+
+def test_none_matches_missing_and_empty_values(equipment, rows):
+    assert names(equipment.query(equals={"area_code_id": None})) == ["EQ3"]
+    assert names(equipment.query(equals={"manufacturer": None})) == ["EQ3", "EQ4"]
+    assert equipment.count(search="EQ4", equals={"manufacturer": None}) == 1
+
+
+def test_an_unknown_column_is_rejected(equipment, rows):
+    with pytest.raises(ValueError):
+        equipment.query(equals={"missing": "x"})
+
+
+@pytest.mark.parametrize("local_rows", [0, 100])
+def test_the_table_model_filters_paged_and_loaded_tables_alike(qapp, wait, equipment, rows, local_rows):
+    model = ManagerTableModel(equipment, equipment.schema.labels, local_rows=local_rows)
+    model.reload()
+    assert wait(lambda: model.rowCount() == 4 and not model.is_busy())
+
+    model.set_filter("", equals={"area_code_id": "B2"})
+    assert wait(lambda: model.rowCount() == 2 and not model.is_busy())
+    assert [model.cached_values(row)[1] for row in range(2)] == ["EQ1", "EQ4"]
+    assert model.row_matches(model.cached_values(0))
+
+    model.set_filter("", equals={"manufacturer": None})
+    assert wait(lambda: model.rowCount() == 2 and not model.is_busy())
+    assert [model.cached_values(row)[1] for row in range(2)] == ["EQ3", "EQ4"]
@@ -0,0 +1,39 @@
+from db_classes import *
+from db_import import EquipmentImporter
+from db_managers import ChangeEvent
+
+
+def write_csv(path, rows):
+    path.write_text("Name,Application,Device Type\n" + "".join(f"{name},{application},PLC\n" for name, application in rows))
+    return str(path)
+
+
+def test_import_reports_invalid_rows_and_inserts_the_rest(tmp_path, equipment, plc):
+    events = []
+    equipment.subscribe(events.append)
+    path = write_csv(tmp_path / "equipment.csv", [("EQ1", "Pump"), ("EQ2", "Pump"), ("EQ3", "Fan")])
+    result = EquipmentImporter(equipment).run(path)
+    assert result.rows_imported == 2
+    assert [error.row_number for error in result.errors] == [3]
+    assert [(event.op, len(event.ids)) for event in events] == [(ChangeEvent.INSERT, 2)]
+    assert sorted(row[1] for row in events[0].rows.values()) == ["EQ1", "EQ3"]
+
+
+def test_rows_rejected_by_the_database_are_reported_one_by_one(equipment, plc, session_factory):
+    equipment.add(Equipment(name="EQ1", application="Pump", device_type_id=plc.id))
+    events = []
+    equipment.subscribe(events.append)
+    importer = EquipmentImporter(equipment)
+    # Validated rows that another client made conflicting before the insert
+    records = [
+        (2, {"name": "EQ2", "application": "Fan", "device_type_id": plc.id}),
+        (3, {"name": "EQ1", "application": "Valve", "device_type_id": plc.id}),
+        (4, {"name": "EQ4", "application": "Motor", "device_type_id": plc.id}),
+    ]
+    errors = []
+    with session_factory() as session:
+        ids = importer.insert_chunk(session, records, errors)
+    assert [error.row_number for error in errors] == [3]
+    assert errors[0].message.startswith("Rejected by the database")
+    assert sorted(row[1] for row in equipment.get_rows(ids)) == ["EQ2", "EQ4"]
+    assert [(event.op, sorted(event.ids)) for event in events] == [(ChangeEvent.INSERT, sorted(ids))]
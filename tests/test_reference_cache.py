@@ -0,0 +1,67 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from db_classes import *
+from db_managers import AreaCodeManager, EquipmentManager
+from db_setup import create_schema
+
+
+def test_cache_picks_up_a_rename_from_another_session(engine, device_types, equipment, plc):
+    cache = device_types.cache
+    cache.check_interval = 0
+    assert cache.choices() == [(plc.id, "PLC")]
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE device_types SET device_type = 'HMI' WHERE id = :id"), {"id": plc.id})
+
+    assert cache.get_by_name("PLC") is None
+    assert cache.get_by_name("HMI").id == plc.id
+    assert cache.choices() == [(plc.id, "HMI")]
+    assert equipment.related_choices("device_type_id") == [(plc.id, "HMI")]
+
+
+def test_cache_picks_up_a_rename_after_its_check_interval(session_factory, device_types, plc):
+    cache = device_types.cache
+    assert cache.get(plc.id).device_type == "PLC"
+
+    with session_factory() as session:
+        session.get(type(plc), plc.id).device_type = "HMI"
+        session.commit()
+
+    # Served from memory until the next version check
+    assert cache.get(plc.id).device_type == "PLC"
+    cache.check_interval = 0
+    assert cache.get(plc.id).device_type == "HMI"
+
+
+def test_raw_updates_bump_the_row_version(engine, plc):
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE device_types SET description = 'x' WHERE id = :id"), {"id": plc.id})
+        version = connection.execute(text("SELECT version FROM device_types WHERE id = :id"), {"id": plc.id}).scalar()
+    assert version == 2
+
+
+def test_manager_updates_bump_the_row_version_once(device_types, plc):
+    assert device_types.update(plc.id, {"description": "PLC controller"}, version=1)["version"] == 2
+
+
+def test_managers_of_different_databases_have_their_own_caches(tmp_path, session_factory, area_codes, equipment):
+    other_engine = create_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    create_schema(other_engine)
+    other_factory = sessionmaker(bind=other_engine, expire_on_commit=False)
+    try:
+        other_area_codes = AreaCodeManager(other_factory)
+        other_equipment = EquipmentManager(other_factory)
+        north = area_codes.add(AreaCode(area_code="N1", description="North"))
+        south = other_area_codes.add(AreaCode(area_code="B2", description="South"))
+
+        assert other_area_codes.cache is not area_codes.cache
+        assert other_area_codes.cache.session_factory is other_factory
+        assert [obj.area_code for obj in other_area_codes.get_all()] == ["B2"]
+        assert other_area_codes.get_by_name("N1") is None
+        assert other_equipment.related_choices("area_code_id") == [(south.id, "B2")]
+        assert equipment.related_choices("area_code_id") == [(north.id, "N1")]
+        # Managers of the same database share one cache
+        assert AreaCodeManager(session_factory).cache is area_codes.cache
+    finally:
+        other_engine.dispose()
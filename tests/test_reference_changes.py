@@ -0,0 +1,55 @@
+import pytest
+
+from db_classes import *
+from db_managers import ChangeEvent
+
+
+@pytest.fixture
+def events(equipment, device_types, area_codes):
+    """
+    Follows the reference managers and records the equipment change events.
+    """
+    equipment.follow_references(device_types, area_codes)
+    received = []
+    equipment.subscribe(received.append)
+    return received
+
+
+@pytest.fixture
+def rows(equipment, plc, area_codes):
+    north = area_codes.add(AreaCode(area_code="N1", description="North"))
+    south = area_codes.add(AreaCode(area_code="S1", description="South"))
+    ids = [
+        equipment.add(Equipment(name=f"EQ{index}", application=f"Pump {index}", device_type_id=plc.id, area_code_id=area.id)).id
+        for index, area in enumerate([north, north, south])
+    ]
+    return ids, north, south
+
+
+def test_renaming_a_reference_updates_the_rows_that_refer_to_it(equipment, area_codes, rows, events):
+    ids, north, _ = rows
+    area_codes.update(north.id, {"area_code": "N2"})
+    assert [(event.op, sorted(event.ids)) for event in events] == [(ChangeEvent.UPDATE, ids[:2])]
+    area_index = equipment.schema.field_index["area_code_id"]
+    assert {row[area_index] for row in events[0].rows.values()} == {"N2"}
+
+
+def test_deleting_a_reference_updates_the_rows_whose_keys_were_cleared(equipment, area_codes, rows, events):
+    ids, north, south = rows
+    area_codes.delete(south.id)
+    area_codes.delete_many([north.id])
+    assert [(event.op, sorted(event.ids)) for event in events] == [(ChangeEvent.UPDATE, ids[2:]), (ChangeEvent.UPDATE, ids[:2])]
+    area_index = equipment.schema.field_index["area_code_id"]
+    assert all(row[area_index] is None for row in equipment.get_rows(ids))
+
+
+def test_new_references_update_nothing(area_codes, rows, events):
+    area_codes.add(AreaCode(area_code="E1", description="East"))
+    assert events == []
+
+
+def test_unfollowed_references_are_not_reported(equipment, area_codes, rows):
+    received = []
+    equipment.subscribe(received.append)
+    area_codes.update(rows[1].id, {"area_code": "N2"})
+    assert received == []
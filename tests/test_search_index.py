@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from search_index import SearchIndex
+
+COLUMNS = {"Name": 1, "Vendor": 2}
+WORDS = ["pump", "valve", "Conveyor", "belt", "PLC", "drive", "panel", "filter"]
+
+
+def brute_force(rows, text, column=None):
+    text = text.lower()
+    positions = [COLUMNS[column]] if column else list(COLUMNS.values())
+    return {row[0] for row in rows if any(text in str(row[position] or "").lower() for position in positions)}
+
+
+@pytest.fixture
+def rows():
+    rng = random.Random(7)
+    return [
+        (obj_id, " ".join(rng.sample(WORDS, 3)) + f" {obj_id}", rng.choice([None, "Acme", "Grainger", "Wesco"]))
+        for obj_id in range(1, 301)
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "p", "pu", "pump", "PUMP", "conveyor belt", "belt 1", "acme", "zzz", "e 2"])
+@pytest.mark.parametrize("column", [None, "Name", "Vendor"])
+def test_search_matches_a_substring_scan(rows, text, column):
+    assert SearchIndex(COLUMNS, rows).search(text, column) == brute_force(rows, text, column)
+
+
+def test_search_does_not_match_across_columns(rows):
+    index = SearchIndex(COLUMNS, [(1, "pump", "Acme")])
+    assert index.search("pumpacme") == set()
+    assert index.search("pump") == {1}
+
+
+def test_extending_a_search_narrows_its_matches(rows):
+    index = SearchIndex(COLUMNS, rows)
+    for text in ["p", "pu", "pum", "pump", "pump ", "pump v"]:
+        assert index.search(text) == brute_force(rows, text)
+    # Shortening the search widens it again
+    assert index.search("pu") == brute_force(rows, "pu")
+
+
+def test_updated_and_removed_rows_are_searched_by_their_current_values(rows):
+    index = SearchIndex(COLUMNS, rows)
+    index.search("pump")
+    index.update((1, "brand new name", "Acme"))
+    index.remove(2)
+    rows = [(1, "brand new name", "Acme")] + [row for row in rows if row[0] not in (1, 2)]
+    assert len(index) == len(rows)
+    assert 2 not in index
+    for text in ["pump", "brand", "new", "Acme", ""]:
+        assert index.search(text) == brute_force(rows, text)
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+from db_classes import *
+from db_managers import BatchValidationError, BaseManager, ChangeEvent, ConflictError, EquipmentManager, TableManager, ValidationError
+from service import ManagerService
+from service_client import RemoteManager, ServiceClient, ServiceError
+
+
+@pytest.fixture
+def serve(equipment, device_types, area_codes):
+    """
+    Returns a function that starts the service on a free port in a background thread, and
+    returns its URL.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runners = []
+
+    def serve(token: str = None) -> str:
+        async def start():
+            runner = web.AppRunner(ManagerService([equipment, device_types, area_codes], max_workers=2, token=token).create_app())
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            runners.append(runner)
+            return runner.addresses[0][1]
+
+        port = asyncio.run_coroutine_threadsafe(start(), loop).result(timeout=10)
+        return f"http://127.0.0.1:{port}"
+
+    yield serve
+    for runner in runners:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(timeout=10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
+
+
+@pytest.fixture
+def remote(serve):
+    return RemoteManager(ServiceClient(serve()), Equipment, EquipmentManager.related_names)
+
+
+@pytest.fixture
+def obj_id(equipment, plc):
+    return equipment.add(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id)).id
+
+
+def test_a_stale_version_is_a_conflict(remote, equipment, obj_id):
+    assert remote.update(obj_id, {"vendor": "Acme"}, version=1)["version"] == 2
+    with pytest.raises(ConflictError) as raised:
+        remote.update(obj_id, {"vendor": "Wesco"}, version=1)
+    assert raised.value.current_version == 2
+    assert equipment.get(obj_id).vendor == "Acme"
+
+
+def test_update_rows_reports_conflicts_per_row(remote, equipment, plc, obj_id):
+    other = equipment.add(Equipment(name="EQ2", application="Pump", device_type_id=plc.id)).id
+    result = remote.update_rows({obj_id: {"vendor": "Acme"}, other: {"vendor": "Acme"}}, {obj_id: 5, other: 1})
+    assert set(result.saved) == {other}
+    assert isinstance(result.errors[obj_id], ConflictError)
+    assert result.errors[obj_id].current_version == 1
+
+
+def test_validation_errors_are_raised_as_sent(remote, plc, obj_id):
+    with pytest.raises(ValidationError) as raised:
+        remote.add(Equipment(name="EQ1", application="Other", device_type_id=plc.id))
+    assert raised.value.field == "name"
+    with pytest.raises(BatchValidationError):
+        remote.add(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id))
+
+
+def test_a_missing_row_is_none_but_an_unknown_table_raises(remote, serve):
+    assert remote.get(999) is None
+    assert remote.update(999, {"vendor": "Acme"}) is None
+    assert remote.delete(999) is None
+    unknown = RemoteManager(remote.client, Equipment)
+    unknown.path = "/tables/unknown"
+    with pytest.raises(ServiceError) as raised:
+        unknown.get(1)
+    assert raised.value.status == 404
+
+
+def test_a_token_is_required_when_set(serve, obj_id):
+    url = serve(token="secret")
+    assert ServiceClient(url).request("GET", "/health") == {"status": "ok"}
+    with pytest.raises(ServiceError) as raised:
+        RemoteManager(ServiceClient(url, token="wrong"), Equipment).count()
+    assert raised.value.status == 401
+    assert RemoteManager(ServiceClient(url, token="secret"), Equipment).count() == 1
+
+
+def test_exact_values_are_matched_through_the_service(remote, equipment, plc, obj_id):
+    equipment.add(Equipment(name="EQ2", application="Mixer", device_type_id=plc.id, vendor="Acme Corp"))
+    assert [row[1] for row in remote.query(equals={"vendor": None})] == ["EQ1"]
+    assert remote.count(equals={"vendor": "Acme"}) == 0
+    assert remote.count(equals={"vendor": "Acme Corp"}) == 1
+
+
+def test_requests_that_cannot_be_parsed_are_bad_requests(remote, obj_id):
+    for method, path, params, body in [
+        ("GET", "/rows", {"limit": "ten"}, None),
+        ("GET", "/rows", {"sort": "missing"}, None),
+        ("GET", "/count", {"equals": "{"}, None),
+        ("GET", "/rows/abc", None, None),
+        ("PATCH", f"/rows/{obj_id}", None, {"version": 1}),
+        ("POST", "/batch/set", None, {"ids": [obj_id], "updates": {"missing": 1}}),
+    ]:
+        with pytest.raises(ServiceError) as raised:
+            remote.client.request(method, remote.path + path, params, body)
+        assert raised.value.status == 400, path
+
+
+def test_other_failures_are_logged_server_errors(remote, equipment, monkeypatch, caplog):
+    def fail(*args, **kwargs):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(equipment, "count", fail)
+    with pytest.raises(ServiceError) as raised:
+        remote.count()
+    assert raised.value.status == 500
+    assert "broken" not in str(raised.value)
+    assert any(record.exc_info and "/count" in record.getMessage() for record in caplog.records)
+
+
+def test_remote_managers_reload_rows_that_refer_to_changed_rows(remote, serve, plc):
+    assert isinstance(remote, TableManager) and not isinstance(remote, BaseManager)
+    device_types = RemoteManager(remote.client, DeviceType)
+    remote.follow_references(device_types)
+    events = []
+    remote.subscribe(events.append)
+    device_types.update(plc.id, {"description": "Controllers"})
+    assert [event.op for event in events] == [ChangeEvent.RELOAD]
+
+
+def test_delete_returns_the_deleted_object(remote, equipment, plc, obj_id):
+    deleted = remote.delete(obj_id)
+    assert (deleted.id, deleted.name, deleted.device_type.device_type) == (obj_id, "EQ1", "PLC")
+    other = equipment.add(Equipment(name="EQ2", application="Mixer", device_type_id=plc.id))
+    local = equipment.delete(other.id)
+    assert (local.name, local.device_type.device_type) == ("EQ2", "PLC")
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import select
+
+from db_classes import *
+from db_summary import EquipmentSummary, rebuild_summary
+
+
+def read_counts(connection) -> dict:
+    counts = EquipmentCount.__table__
+    rows = connection.execute(select(counts.c.dimension, counts.c.value, counts.c.count).where(counts.c.count != 0))
+    return {(dimension, value): count for dimension, value, count in rows}
+
+
+def assert_counts_match_rebuild(engine):
+    """
+    Checks the counts kept by the triggers against counting the equipment from scratch.
+    """
+    with engine.connect() as connection:
+        kept = read_counts(connection)
+        rebuild_summary(connection)
+        rebuilt = read_counts(connection)
+        connection.rollback()
+    assert kept == rebuilt
+
+
+@pytest.fixture
+def b2(area_codes):
+    return area_codes.add(AreaCode(area_code="B2", description="Building 2"))
+
+
+@pytest.fixture
+def b3(area_codes):
+    return area_codes.add(AreaCode(area_code="B3", description="Building 3"))
+
+
+@pytest.fixture
+def rows(equipment, plc, b2) -> list[int]:
+    return [
+        equipment.add(
+            Equipment(name=f"EQ{number}", application=f"App {number}", device_type_id=plc.id, area_code_id=b2.id, vendor="Acme")
+        ).id
+        for number in range(4)
+    ]
+
+
+def test_counts_follow_adds_and_updates(engine, equipment, rows, b3):
+    assert_counts_match_rebuild(engine)
+    # Moving a row to another area code takes it out of the old count
+    equipment.update(rows[0], {"area_code_id": b3.id, "manufacturer": "Siemens"})
+    assert_counts_match_rebuild(engine)
+    equipment.update_many(rows[1:3], {"vendor": "Wesco", "area_code_id": None})
+    assert_counts_match_rebuild(engine)
+    with engine.connect() as connection:
+        counts = read_counts(connection)
+    assert counts[("area_code_id", str(b3.id))] == 1
+    assert counts[("vendor", "Wesco")] == 2
+    assert counts[("vendor", "Acme")] == 2
+
+
+def test_counts_follow_deletes_and_duplicates(engine, equipment, area_codes, rows, b2):
+    equipment.duplicate_many(rows[:2])
+    assert_counts_match_rebuild(engine)
+    equipment.delete(rows[0])
+    equipment.delete_many(rows[1:3])
+    assert_counts_match_rebuild(engine)
+    # Deleting an area code clears it from its equipment
+    area_codes.delete(b2.id)
+    assert_counts_match_rebuild(engine)
+    with engine.connect() as connection:
+        assert ("area_code_id", str(b2.id)) not in read_counts(connection)
+
+
+def test_totals_give_related_rows_by_name(equipment, rows, b3):
+    equipment.update(rows[0], {"area_code_id": b3.id, "vendor": ""})
+    totals = EquipmentSummary(equipment).totals()
+    assert totals["area_code_id"] == [("B2", 3), ("B3", 1)]
+    assert totals["device_type_id"] == [("PLC", 4)]
+    assert totals["vendor"] == [("Acme", 3), (None, 1)]
+    assert totals["manufacturer"] == [(None, 4)]
@@ -0,0 +1,59 @@
+import datetime
+
+import pytest
+from sqlalchemy import event, insert, select
+
+import db_managers
+from db_classes import *
+from db_managers import DELETED_ROW_RETENTION, SYNC_OVERLAP
+
+
+@pytest.fixture(autouse=True)
+def prune_times():
+    db_managers._last_pruned.clear()
+    yield
+    db_managers._last_pruned.clear()
+
+
+@pytest.fixture
+def rows(equipment, plc):
+    return [equipment.add(Equipment(name=f"EQ{index}", application=f"Pump {index}", device_type_id=plc.id)).id for index in range(3)]
+
+
+def test_a_recent_watermark_gets_the_deletes_since(equipment, rows):
+    since = equipment.table_changes().watermark
+    equipment.delete(rows[0])
+    changes = equipment.table_changes(since)
+    assert not changes.full
+    assert changes.deleted == [rows[0]]
+
+
+def test_a_watermark_older_than_the_retention_gets_every_row(equipment, rows):
+    watermark = equipment.table_changes().watermark
+    equipment.delete(rows[0])
+    changes = equipment.table_changes(watermark - DELETED_ROW_RETENTION)
+    assert changes.full
+    assert [row[0] for row in changes.rows] == rows[1:]
+    assert changes.deleted == []
+
+
+def test_deleting_prunes_expired_tombstones(engine, equipment, rows, session_factory):
+    with session_factory() as session:
+        now = session.execute(select(func.now())).scalar()
+        session.execute(
+            insert(DeletedRow),
+            [
+                {"table_name": "equipments", "row_id": 100, "deleted_at": now - DELETED_ROW_RETENTION - SYNC_OVERLAP},
+                {"table_name": "area_codes", "row_id": 100, "deleted_at": now - DELETED_ROW_RETENTION - SYNC_OVERLAP},
+            ],
+        )
+        session.commit()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    equipment.delete_many(rows[:2])
+    equipment.delete(rows[2])
+    # Pruned once per interval
+    assert len([statement for statement in statements if statement.startswith("DELETE FROM deleted_rows")]) == 1
+    with session_factory() as session:
+        remaining = session.execute(select(DeletedRow.table_name, DeletedRow.row_id).order_by(DeletedRow.id)).all()
+    assert remaining == [("area_codes", 100), ("equipments", rows[0]), ("equipments", rows[1]), ("equipments", rows[2])]
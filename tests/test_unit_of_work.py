@@ -0,0 +1,59 @@
+import pytest
+
+from db_classes import *
+from db_managers import ChangeEvent, UnitOfWork, ValidationError, current_unit_of_work
+
+
+@pytest.fixture
+def work(session_factory):
+    return lambda: UnitOfWork(session_factory)
+
+
+def names(manager) -> list[str]:
+    return sorted(obj.area_code for obj in manager.get_all())
+
+
+def test_writes_commit_together_and_publish_once(work, device_types, area_codes):
+    events = []
+    area_codes.subscribe(events.append)
+    with work():
+        device_types.add(DeviceType(device_type="PLC", description="Controller"))
+        area_codes.add(AreaCode(area_code="A1", description="Area"))
+        area_codes.add(AreaCode(area_code="A2", description="Area"))
+        assert events == []
+    assert [(event.op, len(event.ids)) for event in events] == [(ChangeEvent.INSERT, 2)]
+    assert names(area_codes) == ["A1", "A2"]
+    assert current_unit_of_work() is None
+
+
+def test_an_exception_rolls_everything_back(work, device_types, area_codes):
+    events = []
+    area_codes.subscribe(events.append)
+    with pytest.raises(RuntimeError):
+        with work():
+            area_codes.add(AreaCode(area_code="A1", description="Area"))
+            raise RuntimeError("stop")
+    assert names(area_codes) == [] and events == []
+
+
+def test_a_failed_savepoint_only_rolls_back_its_own_writes(work, area_codes):
+    events = []
+    area_codes.subscribe(events.append)
+    with work() as unit:
+        area_codes.add(AreaCode(area_code="A1", description="Area"))
+        with pytest.raises(ValidationError):
+            with unit.savepoint():
+                area_codes.add(AreaCode(area_code="A2", description="Area"))
+                area_codes.add(AreaCode(area_code="A1", description="Area"))
+        with unit.savepoint():
+            area_codes.add(AreaCode(area_code="A3", description="Area"))
+    assert names(area_codes) == ["A1", "A3"]
+    # The events of the rolled back savepoint are dropped with it
+    assert [len(event.ids) for event in events] == [2]
+
+
+def test_units_of_work_do_not_nest(work):
+    with work():
+        with pytest.raises(RuntimeError):
+            with work():
+                pass
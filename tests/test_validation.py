@@ -0,0 +1,59 @@
+from db_classes import *
+from db_managers import BatchValidationError, ValidationError
+
+import pytest
+
+
+def errors_by_index(errors) -> dict:
+    return {(error.index, error.field) for error in errors}
+
+
+def test_uniqueness_is_checked_within_the_batch_and_against_the_database(equipment, plc):
+    equipment.add(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id))
+    batch = [
+        Equipment(name="EQ1", application="New 1", device_type_id=plc.id),
+        Equipment(name="EQ2", application="Pump", device_type_id=plc.id),
+        Equipment(name="EQ2", application="Pump", device_type_id=plc.id),
+        Equipment(name="EQ3", application="Valve", device_type_id=plc.id),
+    ]
+    errors = equipment.validate_many(batch)
+    assert errors_by_index(errors) == {(0, "name"), (2, "name"), (2, "application")}
+    assert [error.index for error in errors] == sorted(error.index for error in errors)
+
+
+def test_a_row_does_not_conflict_with_itself(equipment, plc):
+    obj = equipment.add(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id))
+    assert equipment.validate_many([{"id": obj.id, "name": "EQ1", "application": "Conveyor", "device_type_id": plc.id}]) == []
+
+
+def test_missing_values_and_references_are_reported(equipment, plc):
+    errors = equipment.validate_many(
+        [
+            {"name": None, "application": "Conveyor", "device_type_id": plc.id},
+            {"name": "EQ2", "application": "Pump", "device_type_id": plc.id + 100},
+        ]
+    )
+    assert errors_by_index(errors) == {(0, "name"), (1, "device_type_id")}
+
+
+def test_validate_raises_one_error_or_a_batch_of_them(equipment, plc):
+    equipment.add(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id))
+    with pytest.raises(ValidationError) as raised:
+        equipment.validate(Equipment(name="EQ1", application="Other", device_type_id=plc.id))
+    assert not isinstance(raised.value, BatchValidationError)
+    with pytest.raises(BatchValidationError) as raised:
+        equipment.validate(Equipment(name="EQ1", application="Conveyor", device_type_id=plc.id))
+    assert {error.field for error in raised.value.errors} == {"name", "application"}
+
+
+def test_duplicates_get_the_suffix_on_unique_fields(equipment, plc):
+    ids = [equipment.add(Equipment(name=f"EQ{index}", application=f"Pump {index}", device_type_id=plc.id)).id for index in range(2)]
+    copies = equipment.duplicate_many(ids)
+    name_index, application_index = equipment.schema.field_index["name"], equipment.schema.field_index["application"]
+    rows = {row[0]: row for row in equipment.get_rows(copies)}
+    assert [(rows[obj_id][name_index], rows[obj_id][application_index]) for obj_id in copies] == [
+        ("EQ0 (copy)", "Pump 0 (copy)"),
+        ("EQ1 (copy)", "Pump 1 (copy)"),
+    ]
+    with pytest.raises(ValidationError):
+        equipment.duplicate_many(ids[:1])
@@ -0,0 +1,89 @@
+from sqlalchemy import text
+
+from db_classes import *
+from db_managers import ConflictError
+from qt_workers import WriteBehindQueue
+
+
+def add_equipment(equipment, plc, count: int = 2) -> list[int]:
+    return [
+        equipment.add(Equipment(name=f"EQ{number}", application=f"App {number}", device_type_id=plc.id)).id
+        for number in range(count)
+    ]
+
+
+def record_batches(manager) -> list[dict]:
+    batches = []
+    update_rows = manager.update_rows
+
+    def recording(changes, versions=None):
+        batches.append({obj_id: dict(fields) for obj_id, fields in changes.items()})
+        return update_rows(changes, versions)
+
+    manager.update_rows = recording
+    return batches
+
+
+def outcomes(queue):
+    saved, failed = {}, {}
+    queue.saved.connect(lambda obj_id, record: saved.__setitem__(obj_id, record))
+    queue.failed.connect(lambda obj_id, error: failed.__setitem__(obj_id, error))
+    return saved, failed
+
+
+def test_edits_to_the_same_row_are_merged_into_one_update(equipment, plc, wait):
+    first, second = add_equipment(equipment, plc)
+    batches = record_batches(equipment)
+    queue = WriteBehindQueue(equipment, interval=50)
+    saved, failed = outcomes(queue)
+
+    queue.edit(first, "vendor", "Acme")
+    queue.edit(first, "vendor", "Wesco")
+    queue.edit(first, "manufacturer", "Omron")
+    queue.edit(second, "vendor", "Grainger")
+    assert queue.pending_fields(first) == {"vendor", "manufacturer"}
+    assert wait(lambda: not queue.has_pending())
+
+    assert batches == [{first: {"vendor": "Wesco", "manufacturer": "Omron"}, second: {"vendor": "Grainger"}}]
+    assert set(saved) == {first, second} and not failed
+    assert equipment.get(first).vendor == "Wesco"
+    assert saved[first]["version"] == 2
+
+
+def test_edits_made_while_saving_go_into_the_next_batch(equipment, plc, wait):
+    (obj_id,) = add_equipment(equipment, plc, 1)
+    batches = record_batches(equipment)
+    queue = WriteBehindQueue(equipment, interval=50)
+    saved, failed = outcomes(queue)
+
+    queue.edit(obj_id, "vendor", "Acme")
+    queue.flush()
+    queue.edit(obj_id, "manufacturer", "Omron")
+    assert queue.pending_fields(obj_id) == {"vendor", "manufacturer"}
+    assert wait(lambda: not queue.has_pending())
+
+    assert batches == [{obj_id: {"vendor": "Acme"}}, {obj_id: {"manufacturer": "Omron"}}]
+    assert not failed
+    obj = equipment.get(obj_id)
+    assert (obj.vendor, obj.manufacturer, obj.version) == ("Acme", "Omron", 3)
+
+
+def test_a_row_changed_meanwhile_fails_with_a_conflict(engine, equipment, plc, wait):
+    first, second = add_equipment(equipment, plc)
+    queue = WriteBehindQueue(equipment, interval=50)
+    saved, failed = outcomes(queue)
+
+    queue.track(first)
+    assert wait(lambda: first in queue.versions)
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE equipments SET vendor = 'Other client' WHERE id = :id"), {"id": first})
+    queue.edit(first, "vendor", "Acme")
+    queue.edit(second, "vendor", "Acme")
+    assert wait(lambda: not queue.has_pending())
+
+    assert isinstance(failed[first], ConflictError)
+    assert failed[first].current_version == 2
+    assert set(saved) == {second}
+    assert equipment.get(first).vendor == "Other client"
+    # The version is read again when the row is next edited
+    assert first not in queue.versions